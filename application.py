@@ -1,9 +1,9 @@
 import os
 import config
-print(os.environ)
 # API
-from views import create_app
+from views import create_app, start_background_services
 
+start_background_services()
 application = create_app()
 
 if __name__ == '__main__':
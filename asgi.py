@@ -0,0 +1,7 @@
+import config
+# API, async serving mode: uvicorn asgi:application
+from views import create_app, start_background_services
+from views.asgi import create_asgi_app
+
+start_background_services()
+application = create_asgi_app(create_app())
@@ -0,0 +1,40 @@
+"""
+Microbenchmark: USSD request parsing, lxml single pass parser vs the previous BeautifulSoup parser
+
+Usage: python -m benchmarks.bench_request_parser [iterations]
+"""
+import sys
+import timeit
+from bs4 import BeautifulSoup
+from resources.utilities.request_handler import parse_request
+
+REQUEST_BODY = b"<msg><msisdn>26657123456</msisdn><sessionid>1234567890</sessionid><phase>2</phase>" \
+               b"<request type='2'>1</request></msg>"
+
+
+def parse_request_bs4(xml_post_data: bytes):
+    """The BeautifulSoup parser XMLRequestParser used before"""
+    request_data = BeautifulSoup(str(xml_post_data.decode("UTF-8")), features="xml")
+    return {
+        "msisdn": request_data.find("msisdn").text,
+        "session_id": request_data.find("sessionid").text,
+        "request_phase": request_data.find("phase").text,
+        "request_type": request_data.find("request")["type"],
+        "request_input": request_data.find("request").text
+    }
+
+
+def run(iterations: int = 20000):
+    assert parse_request(REQUEST_BODY).to_dict() == parse_request_bs4(REQUEST_BODY)
+
+    __results = {}
+    for __name, __parser in (("beautifulsoup", parse_request_bs4), ("lxml", parse_request)):
+        __elapsed = min(timeit.repeat(lambda: __parser(REQUEST_BODY), number=iterations, repeat=3))
+        __results[__name] = iterations / __elapsed
+        print(f"{__name:>14}: {__results[__name]:>12,.0f} requests/sec  ({__elapsed / iterations * 1e6:.1f} us/request)")
+    print(f"{'speedup':>14}: {__results['lxml'] / __results['beautifulsoup']:.1f}x")
+    return __results
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
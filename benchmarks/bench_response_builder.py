@@ -0,0 +1,40 @@
+"""
+Benchmark: USSD response rendering, precompiled XMLResponseBuilder vs the previous str.replace builder
+
+Usage: python -m benchmarks.bench_response_builder [iterations]
+"""
+import sys
+import uuid
+import timeit
+from resources.static.response_templates import RESPONSE_MESSAGE_TEMPLATE
+from resources.utilities.response_handler import XMLResponseBuilder
+
+SESSION_ID = "1234567890"
+MESSAGE = "Transaction history\n1. Airtime transfers\n2. Bundle purchases\n3. Call records"
+
+
+def render_replace(session_id: str, message: str, response_type: int):
+    """The chained str.replace rendering XMLResponseBuilder used before (no escaping)"""
+    return RESPONSE_MESSAGE_TEMPLATE.replace("{SESSION_ID}", session_id) \
+        .replace("{RESPONSE_TYPE}", str(response_type)).replace("{MESSAGE}", message) \
+        .replace("{PREMIUM_REFERENCE}", str(uuid.uuid4())).encode("utf-8")
+
+
+def run(iterations: int = 50000):
+    __candidates = (
+        ("str.replace", lambda: render_replace(SESSION_ID, MESSAGE, 2)),
+        ("precompiled", lambda: XMLResponseBuilder(SESSION_ID, MESSAGE, 2).get_response_bytes()),
+        ("+monotonic", lambda: XMLResponseBuilder(SESSION_ID, MESSAGE, 2,
+                                                  reference_mode="monotonic").get_response_bytes()),
+    )
+
+    __results = {}
+    for __name, __render in __candidates:
+        __elapsed = min(timeit.repeat(__render, number=iterations, repeat=3))
+        __results[__name] = iterations / __elapsed
+        print(f"{__name:>12}: {__results[__name]:>12,.0f} responses/sec  ({__elapsed / iterations * 1e6:.2f} us/response)")
+    return __results
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
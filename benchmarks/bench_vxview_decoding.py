@@ -0,0 +1,61 @@
+"""
+Benchmark: VXView getTariffType response decoding, compiled XPath decoder vs the previous BeautifulSoup decoding
+
+Usage: python -m benchmarks.bench_vxview_decoding [iterations]
+"""
+import sys
+import timeit
+import tracemalloc
+from xml.sax.saxutils import escape
+from bs4 import BeautifulSoup
+from controllers.integration.vxview.soap import tariff_type_decoder
+
+TARIFF_RESULT = "<getTariffTypeResult><Code>SystemAPI-Success</Code><RatePlanUID>1</RatePlanUID>" \
+                "<RatePlanName>Prepaid Plan</RatePlanName><PlatformID>1</PlatformID><PackageType>PREPAID</PackageType>" \
+                "<TariffType>Prepaid</TariffType><AccountTypeName>Consumer</AccountTypeName>" \
+                "<SubscriberUid>42</SubscriberUid><VoiceOOB>0</VoiceOOB><DataOOB>0</DataOOB><SmsOOB>0</SmsOOB>" \
+                "<ActivationDate>2020-01-01</ActivationDate></getTariffTypeResult>"
+
+RESPONSE_BODY = ("<soap:Envelope xmlns:soap='http://schemas.xmlsoap.org/soap/envelope/'><soap:Body>"
+                 "<ns2:getTariffTypeResponse xmlns:ns2='http://service.api.system.vasx.com/'>"
+                 f"<return>{escape(TARIFF_RESULT)}</return></ns2:getTariffTypeResponse></soap:Body></soap:Envelope>"
+                 ).encode("utf-8")
+
+
+def decode_bs4(body: bytes):
+    """The unescape + BeautifulSoup + find() decoding SystemAPIIntegrationController used before"""
+    __tariff = BeautifulSoup(body.decode("utf-8").replace("&lt;", "<").replace("&gt;", ">").strip(), features='xml')
+    return {"code": __tariff.find("Code").text,
+            "rateplan_uid": __tariff.find("RatePlanUID").get_text(),
+            "rateplan_name": __tariff.find("RatePlanName").get_text(),
+            "platform_id": __tariff.find("PlatformID").get_text(),
+            "package_type": __tariff.find("PackageType").get_text(),
+            "tariff_type": __tariff.find("TariffType").get_text(),
+            "account_type_name": __tariff.find("AccountTypeName").get_text(),
+            "subscriber_uid": __tariff.find("SubscriberUid").get_text(),
+            "voice_oob": __tariff.find("VoiceOOB").get_text(),
+            "data_oob": __tariff.find("DataOOB").get_text(),
+            "sms_oob": __tariff.find("SmsOOB").get_text(),
+            "activation_date": __tariff.find("ActivationDate").get_text()}
+
+
+def peak_allocation(decode):
+    tracemalloc.start()
+    decode(RESPONSE_BODY)
+    __peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return __peak
+
+
+def run(iterations: int = 5000):
+    __record = tariff_type_decoder.decode(RESPONSE_BODY)
+    assert dict(__record.to_dict(), code=__record.code) == decode_bs4(RESPONSE_BODY)
+
+    for __name, __decode in (("beautifulsoup", decode_bs4), ("xpath", tariff_type_decoder.decode)):
+        __elapsed = min(timeit.repeat(lambda: __decode(RESPONSE_BODY), number=iterations, repeat=3))
+        print(f"{__name:>14}: {iterations / __elapsed:>10,.0f} responses/sec  "
+              f"({__elapsed / iterations * 1e6:.1f} us/response, peak {peak_allocation(__decode) / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,274 @@
+"""
+SQLite stand-in for cx_Oracle, for load testing without an Exadata.
+
+The module exposes the part of the cx_Oracle API the application uses (makedsn, SessionPool, connections and
+cursors). Tables are created from db_script.sql, mis_mirror.sql and migrations/ with the Oracle dialect translated
+to SQLite, then seeded with synthetic CDRs for a configurable number of subscribers.
+"""
+import os
+import re
+import sys
+import time
+import queue
+import random
+import sqlite3
+import datetime
+import itertools
+import threading
+
+SPOOL_ATTRVAL_TIMEDWAIT = 3
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCHEMA_SCRIPTS = ("db_script.sql", "mis_mirror.sql", os.path.join("migrations", "001_cdr_msisdn_recordtimestamp_indexes.sql"))
+
+# set by install(), used by every SessionPool created afterwards
+DATABASE_PATH = None
+QUERY_LATENCY = 0.0
+
+
+class DatabaseError(Exception):
+    pass
+
+
+# Oracle -> SQLite dialect rewrites, applied once per distinct statement
+DIALECT_REWRITES = (
+    (re.compile(r"\bVARCHAR2\s*\(\s*\d+\s*\)", re.I), "TEXT"),
+    (re.compile(r"\bNUMBER\s*\(\s*\d+\s*(,\s*\d+\s*)?\)", re.I), "NUMERIC"),
+    (re.compile(r"\bCLOB\b", re.I), "TEXT"),
+    (re.compile(r"\b(SYSTIMESTAMP|SYSDATE)\b", re.I), "CURRENT_TIMESTAMP"),
+    (re.compile(r"\bFETCH\s+FIRST\s+(:\w+|\d+)\s+ROWS\s+ONLY\b", re.I), r"LIMIT \1"),
+    (re.compile(r"\bCHR\s*\(", re.I), "CHAR("),
+    (re.compile(r"\b(\w+)\.NEXTVAL\b", re.I), r"NEXTVAL('\1')"),
+    (re.compile(r"\)\s*ONLINE\s*$", re.I), ")"),
+)
+_translations = {}
+
+
+def translate(sql: str):
+    """
+    Rewrite an Oracle statement for SQLite
+    :return: str
+    """
+    __translated = _translations.get(sql)
+    if __translated is None:
+        __translated = sql
+        for __pattern, __replacement in DIALECT_REWRITES:
+            __translated = __pattern.sub(__replacement, __translated)
+        _translations[sql] = __translated
+    return __translated
+
+
+# Oracle datetime format elements used by the seed scripts -> strptime directives
+DATETIME_FORMATS = (("YYYY", "%Y"), ("MM", "%m"), ("DD", "%d"), ("HH24", "%H"), ("HH", "%I"), ("MI", "%M"),
+                    ("SS", "%S"), ("AM", "%p"))
+
+
+def to_timestamp(value: str, oracle_format: str):
+    __format = oracle_format
+    for __element, __directive in DATETIME_FORMATS:
+        __format = __format.replace(__element, __directive)
+    return datetime.datetime.strptime(value, __format).strftime("%Y-%m-%d %H:%M:%S")
+
+
+_sequences = {}
+_sequence_lock = threading.Lock()
+
+
+def nextval(sequence: str):
+    with _sequence_lock:
+        _sequences.setdefault(sequence, itertools.count(1))
+        return next(_sequences[sequence])
+
+
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.datetime.fromisoformat(value.decode()))
+
+
+def connect_sqlite(path: str):
+    __conn = sqlite3.connect(path, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+    __conn.create_function("TO_TIMESTAMP", 2, to_timestamp)
+    __conn.create_function("NEXTVAL", 1, nextval)
+    __conn.execute("PRAGMA journal_mode=WAL")
+    __conn.execute("PRAGMA synchronous=NORMAL")
+    return __conn
+
+
+def script_statements(path: str):
+    """Statements of an Oracle SQL script, without the DROP/sequence/COMMIT housekeeping"""
+    with open(path, encoding="utf-8") as script:
+        __script = "\n".join(line for line in script.read().splitlines() if not line.strip().startswith("--"))
+    for __statement in __script.split(";"):
+        __statement = __statement.strip()
+        if not __statement or re.match(r"(DROP|COMMIT|CREATE\s+SEQUENCE)\b", __statement, re.I):
+            continue
+        yield __statement
+
+
+def create_database(path: str, subscribers: int = 1000, rows_per_subscriber: int = 20, seed: int = 1):
+    """
+    Build the load test database: application schema, menu states and synthetic CDRs per subscriber
+    :return: list of seeded MSISDNs
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    __conn = connect_sqlite(path)
+    for __script in SCHEMA_SCRIPTS:
+        for __statement in script_statements(os.path.join(REPOSITORY_ROOT, __script)):
+            __conn.execute(translate(__statement))
+
+    __random = random.Random(seed)
+    __msisdns = [f"2665{8000000 + __index:07d}" for __index in range(subscribers)]
+    __now = datetime.datetime.now().replace(microsecond=0)
+    __airtime, __bundles, __calls = [], [], []
+    for __msisdn in __msisdns:
+        for _ in range(rows_per_subscriber):
+            __timestamp = (__now - datetime.timedelta(minutes=__random.randint(1, 60 * 24 * 90))).strftime("%Y-%m-%d %H:%M:%S")
+            __other_party = f"2665{__random.randint(0, 9999999):07d}"
+            __airtime.append((__timestamp, __msisdn, __other_party, __random.randint(1, 200)))
+            __bundles.append((__timestamp, __msisdn, __random.choice((None, __other_party)),
+                              "New Daily Data Bundles SELF 250MB", "DATA", "DAILY", __random.randint(1, 200)))
+            __calls.append((__timestamp, __msisdn, __other_party, "CCS - VOICE_MOC", __random.uniform(0.1, 30),
+                            __random.uniform(0, 500)))
+    __conn.executemany("INSERT INTO AIRTIME_TRANSFER VALUES (?, ?, ?, ?)", __airtime)
+    __conn.executemany("INSERT INTO BUNDLE_PURCHASE VALUES (?, ?, ?, ?, ?, ?, ?)", __bundles)
+    __conn.executemany("INSERT INTO CALL_RECORDS VALUES (?, ?, ?, ?, ?, ?)", __calls)
+    __conn.commit()
+    __conn.close()
+    return __msisdns
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.__connection = connection
+        self.__cursor = connection.sqlite.cursor()
+        self.arraysize = 100
+        self.prefetchrows = 2
+
+    @property
+    def description(self):
+        return self.__cursor.description
+
+    @property
+    def rowcount(self):
+        return self.__cursor.rowcount
+
+    def execute(self, statement: str, parameters=None, **kwargs):
+        if QUERY_LATENCY:
+            time.sleep(QUERY_LATENCY)
+        try:
+            self.__cursor.execute(translate(statement), parameters or kwargs or ())
+        except sqlite3.Error as e:
+            raise DatabaseError(str(e))
+        return self if self.__cursor.description else None
+
+    def executemany(self, statement: str, parameters: list, batcherrors: bool = False):
+        if QUERY_LATENCY:
+            time.sleep(QUERY_LATENCY)
+        try:
+            self.__cursor.executemany(translate(statement), parameters)
+        except sqlite3.Error as e:
+            raise DatabaseError(str(e))
+
+    def getbatcherrors(self):
+        # SQLite fails the whole executemany instead of reporting rows
+        return []
+
+    def fetchone(self):
+        return self.__cursor.fetchone()
+
+    def fetchmany(self, size: int = None):
+        return self.__cursor.fetchmany(size or self.arraysize)
+
+    def fetchall(self):
+        return self.__cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self.__cursor)
+
+    def close(self):
+        self.__cursor.close()
+
+
+class Connection:
+    def __init__(self, pool, path: str):
+        self.pool = pool
+        self.sqlite = connect_sqlite(path)
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        self.sqlite.commit()
+
+    def rollback(self):
+        self.sqlite.rollback()
+
+    def close(self):
+        self.pool.release(self)
+
+
+class SessionPool:
+    """Bounded pool of SQLite connections with the cx_Oracle SessionPool acquire/release/statistics interface"""
+
+    def __init__(self, user=None, password=None, dsn=None, min: int = 1, max: int = 10, increment: int = 1,
+                 threaded: bool = True, getmode: int = SPOOL_ATTRVAL_TIMEDWAIT, wait_timeout: int = 5000,
+                 database: str = None, **kwargs):
+        self.database = database or DATABASE_PATH
+        if not self.database:
+            raise DatabaseError("fake_oracle.install() has not been called")
+        self.max = max
+        self.wait_timeout = wait_timeout
+        self.__idle = queue.LifoQueue()
+        self.__lock = threading.Lock()
+        self.opened = 0
+        self.busy = 0
+        for _ in range(min):
+            self.__idle.put(self.__open())
+
+    def __open(self):
+        with self.__lock:
+            self.opened += 1
+        return Connection(self, self.database)
+
+    def acquire(self):
+        try:
+            __conn = self.__idle.get_nowait()
+        except queue.Empty:
+            with self.__lock:
+                __grow = self.opened < self.max
+            if __grow:
+                __conn = self.__open()
+            else:
+                try:
+                    __conn = self.__idle.get(timeout=self.wait_timeout / 1000)
+                except queue.Empty:
+                    raise DatabaseError("ORA-24459: OCISessionGet() timed out waiting for pool to create new connections")
+        with self.__lock:
+            self.busy += 1
+        return __conn
+
+    def release(self, connection):
+        connection.rollback()
+        with self.__lock:
+            self.busy -= 1
+        self.__idle.put(connection)
+
+    def close(self, force: bool = False):
+        while True:
+            try:
+                self.__idle.get_nowait().sqlite.close()
+            except queue.Empty:
+                return
+
+
+def makedsn(host, port, sid=None, service_name=None):
+    return f"{host}:{port}/{service_name or sid}"
+
+
+def install(database_path: str, query_latency: float = 0.0):
+    """
+    Make `import cx_Oracle` resolve to this module, backed by the given SQLite database
+    :param query_latency: seconds added to every execute, to stand in for the network round trip
+    """
+    global DATABASE_PATH, QUERY_LATENCY
+    DATABASE_PATH = database_path
+    QUERY_LATENCY = query_latency
+    sys.modules["cx_Oracle"] = sys.modules[__name__]
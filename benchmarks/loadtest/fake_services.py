@@ -0,0 +1,112 @@
+"""
+HTTP stand-ins for VXView SystemAPI (SOAP) and BulkSMS with tunable latency
+"""
+import re
+import json
+import time
+import itertools
+import threading
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+MSISDN_PATTERN = re.compile(rb"<MSISDN>(\d*)</MSISDN>")
+
+TARIFF_TYPE_RESULT = "<getTariffTypeResult><Code>SystemAPI-Success</Code><RatePlanUID>1</RatePlanUID>" \
+                     "<RatePlanName>Prepaid Plan</RatePlanName><PlatformID>1</PlatformID>" \
+                     "<PackageType>PREPAID</PackageType><TariffType>{tariff_type}</TariffType>" \
+                     "<AccountTypeName>Consumer</AccountTypeName><SubscriberUid>{msisdn}</SubscriberUid>" \
+                     "<VoiceOOB>0</VoiceOOB><DataOOB>0</DataOOB><SmsOOB>0</SmsOOB>" \
+                     "<ActivationDate>2020-01-01</ActivationDate></getTariffTypeResult>"
+
+SUBSCRIBER_INFO_RESULT = "<getSubscriberInfoResult><Code>SystemAPI-Success</Code><SubscriberUID>{msisdn}</SubscriberUID>" \
+                         "<IMSI>65101{msisdn}</IMSI><AccountNumber>ACC{msisdn}</AccountNumber>" \
+                         "<AccountType>Prepaid</AccountType><SubscriberName>Load</SubscriberName>" \
+                         "<Surname>Test</Surname><IDNumber>0</IDNumber><ICCID>89266{msisdn}</ICCID>" \
+                         "</getSubscriberInfoResult>"
+
+SOAP_ENVELOPE = "<soap:Envelope xmlns:soap='http://schemas.xmlsoap.org/soap/envelope/'><soap:Body>" \
+                "<ns2:{operation}Response xmlns:ns2='http://service.api.system.vasx.com/'><return>{result}</return>" \
+                "</ns2:{operation}Response></soap:Body></soap:Envelope>"
+
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    # keep-alive, like the real services
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def reply(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class VXViewHandler(FakeServiceHandler):
+    """SystemAPI getTariffType/getSubscriberInfo, every subscriber is prepaid unless listed in postpaid_msisdns"""
+
+    def do_POST(self):
+        __body = self.read_body()
+        time.sleep(self.server.latency)
+        __match = MSISDN_PATTERN.search(__body)
+        __msisdn = __match.group(1).decode() if __match else ""
+        self.server.count()
+
+        if b"getSubscriberInfo" in __body:
+            __operation, __result = "getSubscriberInfo", SUBSCRIBER_INFO_RESULT.format(msisdn=__msisdn)
+        else:
+            __tariff_type = "Postpaid" if __msisdn in self.server.postpaid_msisdns else "Prepaid"
+            __operation, __result = "getTariffType", TARIFF_TYPE_RESULT.format(msisdn=__msisdn, tariff_type=__tariff_type)
+        self.reply(200, SOAP_ENVELOPE.format(operation=__operation, result=escape(__result)).encode("utf-8"),
+                   "text/xml; charset=utf-8")
+
+
+class BulkSMSHandler(FakeServiceHandler):
+    """BulkSMS /messages: accepts a single message or a list and answers with one entry per recipient"""
+
+    def do_POST(self):
+        __payload = json.loads(self.read_body() or b"{}")
+        time.sleep(self.server.latency)
+        __messages = __payload if isinstance(__payload, list) else [__payload]
+        self.server.count(len(__messages))
+        __result = [{"id": str(next(self.server.message_ids)), "to": __message.get("to"), "type": "SENT",
+                     "status": {"type": "ACCEPTED"}} for __message in __messages]
+        self.reply(201, json.dumps(__result).encode("utf-8"), "application/json")
+
+
+class FakeService(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), handler)
+        self.latency = latency
+        self.postpaid_msisdns = set()
+        self.message_ids = itertools.count(1)
+        self.requests = 0
+        self.__lock = threading.Lock()
+
+    def count(self, requests: int = 1):
+        with self.__lock:
+            self.requests += requests
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name=f"fake-{self.RequestHandlerClass.__name__}",
+                         daemon=True).start()
+        return self
+
+
+def start_vxview(latency: float = 0.0):
+    return FakeService(VXViewHandler, latency=latency).start()
+
+
+def start_bulksms(latency: float = 0.0):
+    return FakeService(BulkSMSHandler, latency=latency).start()
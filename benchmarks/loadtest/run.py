@@ -0,0 +1,215 @@
+"""
+USSD load test: replays dial flows against the application running on local stand-ins and reports latency
+percentiles and throughput per scenario.
+
+Scenarios: dial (new session only), airtime / bundle / calls (new session, then menu selection 1 / 2 / 3)
+
+Usage: python -m benchmarks.loadtest.run [--concurrency 20] [--flows 200] [--mode wsgi|asgi]
+       [--vxview-latency 0.02] [--sms-latency 0.05] [--db-latency 0] [--scenarios dial,airtime,bundle,calls]
+       [--url http://host:port]  (load an already running server instead of starting one)
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import threading
+import itertools
+import subprocess
+import http.client
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.loadtest import fake_oracle
+from resources.static.response_templates import APPLICATION_ERRORED
+
+SCENARIOS = {
+    "dial": [],
+    "airtime": ["1"],
+    "bundle": ["2"],
+    "calls": ["3"],
+}
+DIAL_STRING = "*120*5#"
+NEW_SESSION_REQUEST = "<msg><msisdn>{msisdn}</msisdn><sessionid>{session_id}</sessionid><phase>1</phase>" \
+                      "<request type='1'>{user_input}</request></msg>"
+MENU_SELECTION_REQUEST = "<msg><msisdn>{msisdn}</msisdn><sessionid>{session_id}</sessionid><phase>2</phase>" \
+                         "<request type='2'>{user_input}</request></msg>"
+ERROR_MARKER = APPLICATION_ERRORED["data"]["message"].encode("utf-8")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20, help="simultaneous gateway connections")
+    parser.add_argument("--flows", type=int, default=200, help="dial flows per scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default="wsgi")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--url", help="target an already running server, no stand-ins are started")
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--rows-per-subscriber", type=int, default=20)
+    parser.add_argument("--db-latency", type=float, default=0.0)
+    parser.add_argument("--vxview-latency", type=float, default=0.02)
+    parser.add_argument("--sms-latency", type=float, default=0.05)
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def percentile(sorted_values: list, percent: float):
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+class GatewayClient:
+    """Keep-alive HTTP client per load thread, like a USSD gateway connection"""
+
+    def __init__(self, url: str):
+        self.__address = urllib.parse.urlsplit(url)
+        self.__local = threading.local()
+
+    def __connection(self):
+        if getattr(self.__local, "connection", None) is None:
+            self.__local.connection = http.client.HTTPConnection(self.__address.hostname, self.__address.port,
+                                                                 timeout=30)
+        return self.__local.connection
+
+    def post(self, body: bytes):
+        """
+        :return: (latency seconds, ok)
+        """
+        __start = time.perf_counter()
+        try:
+            __connection = self.__connection()
+            __connection.request("POST", "/", body=body, headers={"Content-Type": "application/xml"})
+            __response = __connection.getresponse()
+            __body = __response.read()
+            __ok = __response.status == 200 and b"<response type=" in __body and ERROR_MARKER not in __body
+        except (OSError, http.client.HTTPException):
+            self.__local.connection = None
+            __ok = False
+        return time.perf_counter() - __start, __ok
+
+
+def run_scenario(client: GatewayClient, name: str, msisdns: list, session_ids, flows: int, concurrency: int):
+    __latencies, __errors = [], 0
+    __lock = threading.Lock()
+
+    def flow(_):
+        nonlocal __errors
+        __msisdn, __session_id = random.choice(msisdns), next(session_ids)
+        __requests = [NEW_SESSION_REQUEST.format(msisdn=__msisdn, session_id=__session_id, user_input=DIAL_STRING)]
+        __requests += [MENU_SELECTION_REQUEST.format(msisdn=__msisdn, session_id=__session_id, user_input=__selection)
+                       for __selection in SCENARIOS[name]]
+        for __request in __requests:
+            __latency, __ok = client.post(__request.encode("utf-8"))
+            with __lock:
+                __latencies.append(__latency)
+                __errors += 0 if __ok else 1
+
+    __start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(flow, range(flows)))
+    __elapsed = time.perf_counter() - __start
+
+    __latencies.sort()
+    return {"scenario": name, "requests": len(__latencies), "errors": __errors, "seconds": round(__elapsed, 3),
+            "requests_per_sec": round(len(__latencies) / __elapsed, 1),
+            "p50_ms": round(percentile(__latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(__latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(__latencies, 99) * 1000, 1),
+            "max_ms": round(__latencies[-1] * 1000, 1) if __latencies else 0.0}
+
+
+def start_server(args, database: str, log_file):
+    __command = [sys.executable, "-m", "benchmarks.loadtest.server", "--port", str(args.port), "--mode", args.mode,
+                 "--database", database, "--db-latency", str(args.db_latency),
+                 "--vxview-latency", str(args.vxview_latency), "--sms-latency", str(args.sms_latency)]
+    __server = subprocess.Popen(__command, cwd=fake_oracle.REPOSITORY_ROOT, stdout=subprocess.DEVNULL, stderr=log_file)
+    __url = f"http://127.0.0.1:{args.port}"
+    __deadline = time.monotonic() + 30
+    while time.monotonic() < __deadline:
+        if __server.poll() is not None:
+            raise RuntimeError(f"Load test server exited with {__server.returncode}, see {log_file.name}")
+        try:
+            urllib.request.urlopen(f"{__url}/app/health", timeout=1).read()
+            return __server, __url
+        except OSError:
+            time.sleep(0.2)
+    __server.terminate()
+    raise RuntimeError(f"Load test server did not start, see {log_file.name}")
+
+
+def fetch_json(url: str):
+    try:
+        # the admin endpoints check the token when the server has one configured
+        __headers = {"X-Admin-Token": os.environ["ADMIN_API_TOKEN"]} if os.environ.get("ADMIN_API_TOKEN") else {}
+        return json.loads(urllib.request.urlopen(urllib.request.Request(url, headers=__headers), timeout=5).read())
+    except (OSError, ValueError):
+        return None
+
+
+def print_report(results: list):
+    print(f"{'scenario':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'max ms':>10}")
+    for __result in results:
+        print(f"{__result['scenario']:<10}{__result['requests']:>10}{__result['errors']:>8}"
+              f"{__result['requests_per_sec']:>10}{__result['p50_ms']:>10}{__result['p95_ms']:>10}"
+              f"{__result['p99_ms']:>10}{__result['max_ms']:>10}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    __scenarios = [__name.strip() for __name in args.scenarios.split(",") if __name.strip()]
+    __unknown = set(__scenarios) - set(SCENARIOS)
+    if __unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(__unknown))}")
+
+    __server = None
+    __workdir = tempfile.mkdtemp(prefix="cdc_loadtest_")
+    if args.url:
+        __url = args.url.rstrip("/")
+        __msisdns = [f"2665{8000000 + __index:07d}" for __index in range(args.subscribers)]
+    else:
+        __database = os.path.join(__workdir, "cdc.sqlite")
+        __msisdns = fake_oracle.create_database(__database, subscribers=args.subscribers,
+                                                rows_per_subscriber=args.rows_per_subscriber)
+        __log_file = open(os.path.join(__workdir, "server.log"), "wb")
+        __server, __url = start_server(args, __database, __log_file)
+
+    try:
+        __client = GatewayClient(__url)
+        # SESSION_UID is written unquoted, keep session ids numeric and unique per run
+        __session_ids = itertools.count(int(time.time()) * 1000000)
+        print(f"Load test against {__url} ({args.mode}), concurrency {args.concurrency}, {args.flows} flows per "
+              f"scenario, VXView {args.vxview_latency}s, BulkSMS {args.sms_latency}s, DB {args.db_latency}s")
+        __results = [run_scenario(__client, __name, __msisdns, __session_ids, args.flows, args.concurrency)
+                     for __name in __scenarios]
+        print_report(__results)
+
+        # SMS are sent in the background, give the dispatcher a moment before reading its counters
+        time.sleep(min(5.0, args.sms_latency * 20))
+        __report = {"results": __results, "stand_ins": fetch_json(f"{__url}/loadtest/stats"),
+                    "sms_dispatcher": fetch_json(f"{__url}/app/admin/sms-dispatcher")}
+        if __report["stand_ins"]:
+            print(f"stand-ins: {__report['stand_ins']}")
+        if __report["sms_dispatcher"]:
+            __dispatch = __report["sms_dispatcher"]["data"]
+            print(f"sms dispatcher: completed {__dispatch.get('completed')}, failed {__dispatch.get('failed')}, "
+                  f"queue depth {__dispatch.get('queue_depth')}, latency avg {__dispatch.get('latency_avg', 0):.3f}s")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as json_file:
+                json.dump(__report, json_file, indent=2)
+        return 1 if any(__result["errors"] for __result in __results) else 0
+    finally:
+        if __server is not None:
+            __server.terminate()
+            __server.wait(timeout=10)
+            print(f"server log: {__log_file.name}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Load test server process: the application under a real WSGI (or ASGI) server, wired to the local stand-ins
+
+Usage: python -m benchmarks.loadtest.server --port 8099 --database /tmp/cdc_loadtest.sqlite [--mode asgi]
+Started by benchmarks.loadtest.run, which waits for /app/health before sending load.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+from benchmarks.loadtest import fake_oracle
+from benchmarks.loadtest.fake_services import start_vxview, start_bulksms
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default="wsgi")
+    parser.add_argument("--database", required=True, help="SQLite database built by fake_oracle.create_database")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="seconds added to every database execute")
+    parser.add_argument("--vxview-latency", type=float, default=0.02, help="seconds per VXView SOAP call")
+    parser.add_argument("--sms-latency", type=float, default=0.05, help="seconds per BulkSMS call")
+    parser.add_argument("--postpaid", default="", help="comma separated MSISDNs VXView reports as postpaid")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    vxview = start_vxview(latency=args.vxview_latency)
+    vxview.postpaid_msisdns.update(__msisdn for __msisdn in args.postpaid.split(",") if __msisdn)
+    bulksms = start_bulksms(latency=args.sms_latency)
+
+    # the application reads its configuration at import time
+    os.environ.update({
+        "EXADATA_DB_USERNAME": "loadtest", "EXADATA_DB_PASSWORD": "loadtest", "EXADATA_DB_SERVICE_NAME": "loadtest",
+        "EXADATA_DB_PORT": "1521", "EXADATA_DB_HOSTNAME": "localhost",
+        "VXVIEW_SYSTEM_API_ENDPOINT": vxview.url, "VXVIEW_SYSTEM_API_SESSION_ID": "loadtest",
+        "BULKSMS_API_URL": bulksms.url, "BULKSMS_TOKEN_ID": "loadtest", "BULKSMS_TOKEN_SECRET": "loadtest",
+        "SMS_SIMULATION_MODE": "false",
+    })
+    fake_oracle.install(args.database, query_latency=args.db_latency)
+
+    from views import create_app, start_background_services
+    start_background_services()
+    app = create_app()
+
+    @app.route("/loadtest/stats", methods=["GET"])
+    def loadtest_stats():
+        """Requests seen by the stand-ins, read by the runner after each scenario"""
+        return json.dumps({"vxview_requests": vxview.requests, "bulksms_messages": bulksms.requests})
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    if args.mode == "asgi":
+        import uvicorn
+        from views.asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(app), host=args.host, port=args.port, log_level="warning")
+    else:
+        from werkzeug.serving import make_server
+        make_server(args.host, args.port, app, threaded=True).serve_forever()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Decode VXView SystemAPI SOAP responses into typed records:
+parse the body once, then collect every field of an operation with a single compiled XPath
+"""
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from lxml import etree
+
+SYSTEM_API_SUCCESS = "SystemAPI-Success"
+
+
+@dataclass(frozen=True)
+class SubscriberInfo:
+    code: str = None
+    subscriber_uid: str = None
+    imsi: str = None
+    account_number: str = None
+    account_type: str = None
+    name: str = None
+    surname: str = None
+    id_number: str = None
+    iccid: str = None
+
+    @property
+    def success(self):
+        return self.code == SYSTEM_API_SUCCESS
+
+    def to_dict(self):
+        __data = asdict(self)
+        del __data["code"]
+        return __data
+
+
+@dataclass(frozen=True)
+class TariffType:
+    code: str = None
+    rateplan_uid: str = None
+    rateplan_name: str = None
+    platform_id: str = None
+    package_type: str = None
+    tariff_type: str = None
+    account_type_name: str = None
+    subscriber_uid: str = None
+    voice_oob: str = None
+    data_oob: str = None
+    sms_oob: str = None
+    activation_date: str = None
+
+    @property
+    def success(self):
+        return self.code == SYSTEM_API_SUCCESS
+
+    def to_dict(self):
+        __data = asdict(self)
+        del __data["code"]
+        return __data
+
+
+class SOAPDecoder:
+    """
+    Decoder for one SystemAPI operation.
+
+    VXView returns the operation result as escaped XML inside the SOAP body. The envelope is parsed once and, when
+    the fields are not in the envelope itself, the embedded document is parsed from the element text (lxml has
+    already unescaped it). Missing elements are left as None on the record.
+    """
+
+    def __init__(self, record_type, elements: dict):
+        """
+        :param record_type: record dataclass
+        :param elements: response element local name -> record field
+        """
+        self.record_type = record_type
+        self.elements = elements
+        self.__expression = "//*[" + " or ".join(f"local-name()='{__name}'" for __name in elements) + "]"
+        # lxml parsers and XPath evaluators must not be shared between threads
+        self.__local = threading.local()
+
+    def __compiled(self):
+        if not hasattr(self.__local, "xpath"):
+            self.__local.parser = etree.XMLParser(resolve_entities=False, no_network=True, load_dtd=False,
+                                                  remove_comments=True)
+            self.__local.xpath = etree.XPath(self.__expression)
+        return self.__local.parser, self.__local.xpath
+
+    def __extract(self, root, xpath):
+        __values = {}
+        for __element in xpath(root):
+            __field = self.elements[etree.QName(__element).localname]
+            if __field not in __values:
+                __values[__field] = (__element.text or "").strip()
+        return __values
+
+    def decode(self, body: bytes):
+        """
+        :param body: raw SOAP response body
+        :return: record, None if the body is not XML
+        """
+        __parser, __xpath = self.__compiled()
+        try:
+            __root = etree.fromstring(body, __parser)
+            __values = self.__extract(__root, __xpath)
+            if "code" not in __values:
+                for __text in __root.itertext():
+                    __text = __text.strip()
+                    if __text.startswith("<"):
+                        __values = self.__extract(etree.fromstring(__text.encode("utf-8"), __parser), __xpath)
+                        break
+        except etree.XMLSyntaxError as e:
+            logging.error(f"Undecodable VXView {self.record_type.__name__} response: {str(e)}")
+            return None
+        return self.record_type(**__values)
+
+
+subscriber_info_decoder = SOAPDecoder(SubscriberInfo, {
+    "Code": "code", "SubscriberUID": "subscriber_uid", "IMSI": "imsi", "AccountNumber": "account_number",
+    "AccountType": "account_type", "SubscriberName": "name", "Surname": "surname", "IDNumber": "id_number",
+    "ICCID": "iccid"})
+
+tariff_type_decoder = SOAPDecoder(TariffType, {
+    "Code": "code", "RatePlanUID": "rateplan_uid", "RatePlanName": "rateplan_name", "PlatformID": "platform_id",
+    "PackageType": "package_type", "TariffType": "tariff_type", "AccountTypeName": "account_type_name",
+    "SubscriberUid": "subscriber_uid", "VoiceOOB": "voice_oob", "DataOOB": "data_oob", "SmsOOB": "sms_oob",
+    "ActivationDate": "activation_date"})
@@ -1,9 +1,27 @@
-from bs4 import BeautifulSoup
 import os
-import requests
 import logging
 from resources.static.response_templates import INPUT_INCOMPLETE, EXECUTION_FAIL
 from resources.static.vxview_integration.system_api_templates import GET_SUBSCRIBER_INFO, GET_TARIFF_TYPE
+from resources.utilities.cache import TTLCache
+from resources.utilities.http_pool import HTTPSessionPool
+from resources.utilities.tracing import traced
+from controllers.integration.vxview.soap import subscriber_info_decoder, tariff_type_decoder
+
+vxview_logger = logging.getLogger('vxview')
+
+# keep-alive connections to VXView shared by every request in the process
+vxview_http_pool = HTTPSessionPool(name="VXView SystemAPI",
+                                   pool_size=int(os.environ.get("VXVIEW_HTTP_POOL_SIZE", 20)),
+                                   connect_timeout=float(os.environ.get("VXVIEW_HTTP_CONNECT_TIMEOUT", 3)),
+                                   read_timeout=float(os.environ.get("VXVIEW_HTTP_READ_TIMEOUT", 10)),
+                                   retries=int(os.environ.get("VXVIEW_HTTP_RETRIES", 2)),
+                                   backoff=float(os.environ.get("VXVIEW_HTTP_BACKOFF", 0.2)),
+                                   verify=False)
+
+# tariff type per msisdn, failures reported by VXView are cached for a shorter period
+tariff_type_cache = TTLCache(max_size=int(os.environ.get("VXVIEW_TARIFF_CACHE_SIZE", 50000)),
+                             ttl=float(os.environ.get("VXVIEW_TARIFF_CACHE_TTL", 300)),
+                             negative_ttl=float(os.environ.get("VXVIEW_TARIFF_CACHE_NEGATIVE_TTL", 30)))
 
 
 class SystemAPIIntegrationController:
@@ -16,13 +34,18 @@ class SystemAPIIntegrationController:
             "Content-Type": "text/xml"
         }
 
-    def __call_api(self, payload: str):
-        __response = requests.post(url=os.environ["VXVIEW_SYSTEM_API_ENDPOINT"], headers=self.__headers, data=payload,
-                                   verify=False)
+    @traced("SystemAPIIntegrationController.call_api")
+    def __call_api(self, payload: str, decoder, idempotent: bool = False):
+        """
+        POST a SystemAPI request and decode the response
+        :return: decoded record, None if VXView did not return a decodable response
+        """
+        __response = vxview_http_pool.post(url=os.environ["VXVIEW_SYSTEM_API_ENDPOINT"], idempotent=idempotent,
+                                           headers=self.__headers, data=payload)
 
         if __response.status_code == 200:
-            __response = __response.text.replace("&lt;", "<").replace("&gt;", ">").strip()
-            return BeautifulSoup(__response, features='xml')
+            return decoder.decode(__response.content)
+        logging.error(f"VXView returned HTTP {__response.status_code}")
         return None
 
     def get_subscriber_info(self):
@@ -31,29 +54,16 @@ class SystemAPIIntegrationController:
 
         __payload = GET_SUBSCRIBER_INFO.replace("{SESSIONID}", self.__vxview_session_uid).replace("{MSISDN}",
                                                                                                   self.__msisdn)
-        print(
-            f"\n---\n{SystemAPIIntegrationController.get_subscriber_info.__qualname__} [__payload]\n{__payload}\n---"
-        )
-
-        __profile = self.__call_api(payload=__payload)
-        __code = __profile.find("Code").text
-
-        print(
-            f"\n---\n{SystemAPIIntegrationController.get_subscriber_info.__qualname__} [__profile_code] -- {__code}\n---"
-        )
-
-        if __profile and __code == "SystemAPI-Success":
-            return {
-                "success": True,
-                "data": {"subscriber_uid": __profile.find("SubscriberUID").get_text(),
-                         "imsi": __profile.find("IMSI").get_text(),
-                         "account_number": __profile.find("AccountNumber").get_text(),
-                         "account_type": __profile.find("AccountType").get_text(),
-                         "name": __profile.find("SubscriberName").get_text(),
-                         "surname": __profile.find("Surname").get_text(),
-                         "id_number": __profile.find("IDNumber").get_text(),
-                         "iccid": __profile.find("ICCID").get_text()}
-            }
+        vxview_logger.debug("%s [payload] %s", SystemAPIIntegrationController.get_subscriber_info.__qualname__,
+                            __payload)
+
+        __profile = self.__call_api(payload=__payload, decoder=subscriber_info_decoder, idempotent=True)
+
+        vxview_logger.debug("%s [profile_code] %s", SystemAPIIntegrationController.get_subscriber_info.__qualname__,
+                            __profile.code if __profile else None)
+
+        if __profile and __profile.success:
+            return {"success": True, "data": __profile.to_dict()}
         logging.error("Subscriber profile not returned from VXView")
         return EXECUTION_FAIL
 
@@ -61,34 +71,25 @@ class SystemAPIIntegrationController:
         if not self.__vxview_session_uid or not self.__msisdn:
             return INPUT_INCOMPLETE
 
+        __cached = tariff_type_cache.get(self.__msisdn)
+        if __cached is not None:
+            return __cached
+
         __payload = GET_TARIFF_TYPE.replace("{SESSIONID}", self.__vxview_session_uid).replace("{MSISDN}",
                                                                                               self.__msisdn)
-        print(
-            f"\n---\n{SystemAPIIntegrationController.get_tariff_type.__qualname__} [__payload]\n{__payload}\n---"
-        )
+        vxview_logger.debug("%s [payload] %s", SystemAPIIntegrationController.get_tariff_type.__qualname__,
+                            __payload)
 
-        __tariff = self.__call_api(payload=__payload)
-        __code = __tariff.find("Code").text
+        __tariff = self.__call_api(payload=__payload, decoder=tariff_type_decoder, idempotent=True)
         
-        print(
-            f"\n---\n{SystemAPIIntegrationController.get_tariff_type.__qualname__} [__tariff_code] -- {__code}\n---"
-        )
-
-        if __tariff and __code == "SystemAPI-Success":
-            return {
-                "success": True,
-                "data": {"rateplan_uid": __tariff.find("RatePlanUID").get_text(),
-                         "rateplan_name": __tariff.find("RatePlanName").get_text(),
-                         "platform_id": __tariff.find("PlatformID").get_text(),
-                         "package_type": __tariff.find("PackageType").get_text(),
-                         "tariff_type": __tariff.find("TariffType").get_text(),
-                         "account_type_name": __tariff.find("AccountTypeName").get_text(),
-                         "subscriber_uid": __tariff.find("SubscriberUid").get_text(),
-                         "voice_oob": __tariff.find("VoiceOOB").get_text(),
-                         "data_oob": __tariff.find("DataOOB").get_text(),
-                         "sms_oob": __tariff.find("SmsOOB").get_text(),
-                         "activation_date": __tariff.find("ActivationDate").get_text(),
-                         }
-            }
+        vxview_logger.debug("%s [tariff_code] %s", SystemAPIIntegrationController.get_tariff_type.__qualname__,
+                            __tariff.code if __tariff else None)
+
+        if __tariff and __tariff.success and __tariff.tariff_type:
+            __tariff_type = {"success": True, "data": __tariff.to_dict()}
+            tariff_type_cache.set(self.__msisdn, __tariff_type)
+            return __tariff_type
         logging.error("Subscriber tariff data not returned from VxView")
+        if __tariff and __tariff.code:
+            tariff_type_cache.set_negative(self.__msisdn, EXECUTION_FAIL)
         return EXECUTION_FAIL
@@ -2,46 +2,62 @@
 Manage ussd_session:
 Process requests and provide responses
 """
-import os
 # custom
 from models.ussd_session import USSDSession
 from models.ussd_session import USSDSessionState
 from resources.static.response_templates import REQUEST_INPUT_INCOMPLETE, APPLICATION_ERRORED, SERVICE_NOT_ALLOWED
-from resources.utilities.request_handler import XMLRequestParser
+from resources.utilities.request_handler import XMLRequestParser, USSDRequest
 from resources.utilities.response_handler import XMLResponseBuilder
 from controllers.integration.vxview.systemapi import SystemAPIIntegrationController
+from resources.utilities.sms_dispatcher import sms_dispatcher
+from resources.utilities.metrics import observe_phase, count_menu_selection
+from resources.utilities.tracing import traced
 import logging
 
 from models.cdc_transactions import CDCTransactions
 
-# Configure logging
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'logs')
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-# Set up logger for SMS service
+# written to logs/ussd_session.log, see resources/utilities/structured_logging.py
 ussd_logger = logging.getLogger('USSD')
-ussd_logger.setLevel(logging.INFO)
 
-# Create file handler
-file_handler = logging.FileHandler(os.path.join(log_dir, 'ussd_session.log'))
-file_handler.setLevel(logging.INFO)
+# menu selection -> (CDCTransactions lookup, SMS title, description)
+TRANSACTION_HISTORY_SELECTIONS = {
+    "1": ("get_airtime_transfers", "AIRTIME TRANSFERS: ", "airtime transfers"),
+    "2": ("get_bundle_purchases", "BUNDLE PURCHASE: ", "bundle purchases"),
+    "3": ("get_call_records", "CALL RECORDS: ", "call records"),
+}
+
+
+# sent instead of the history when the subscriber has none, the USSD reply no longer waits for the lookup
+NO_RECENT_TRANSACTIONS_MESSAGE = "You have no recent transactions for this request"
+
+
+def send_transaction_history(msisdn: str, request_input: str, session_uid: str):
+    """SMS dispatch job: look up the selected transaction history and send it to the subscriber"""
+    __lookup, __title, __description = TRANSACTION_HISTORY_SELECTIONS[request_input]
+    __items = getattr(CDCTransactions(), __lookup)(msisdn)
+    if not __items:
+        ussd_logger.info(f"No {__description} for {msisdn}, with session id {session_uid}")
+        __items = [{"message": NO_RECENT_TRANSACTIONS_MESSAGE}]
+    result = CDCTransactions().send_sms(msisdn, __title, __items)
+    if not result["success"]:
+        ussd_logger.error(f"Failed to send SMS for {__description} to {msisdn}, with session id {session_uid}, message: {result['message']}")
+    else:
+        ussd_logger.info(f"Successfully sent SMS for {__description} to {msisdn}, with session id {session_uid}")
+    return result
+
 
-# Create formatter
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
+sms_dispatcher.register("transaction_history", send_transaction_history)
 
-# Add handler to logger
-ussd_logger.addHandler(file_handler)
 
 class USSDSessionController:
-    def __init__(self, request_data: bytes = None):
+    def __init__(self, request_data: bytes = None, request: USSDRequest = None):
         super().__init__()
 
-        if request_data:
-            __request = XMLRequestParser(xml_post_data=request_data)
-            self.__request_data = __request.get_request_data()
-            
+        # callers that already parsed the body pass the USSDRequest to avoid parsing it again
+        self.__request_data = request
+        if self.__request_data is None and request_data:
+            self.__request_data = XMLRequestParser(xml_post_data=request_data).get_request_data()
+
         self.logger = ussd_logger
 
     def process_request(self):
@@ -54,29 +70,12 @@ class USSDSessionController:
             return REQUEST_INPUT_INCOMPLETE
 
         # get subscriber tariff type
+        __rejected = self.check_tariff_type(self.get_tariff_type())
+        if __rejected:
+            return __rejected
 
-        __tariff_type = SystemAPIIntegrationController(msisdn=self.__request_data["msisdn"]).get_tariff_type()
-        print(f"Tarrif Type: {__tariff_type}")
-        
-        if not __tariff_type["success"]:
-            
-            # operation failed
-            self.logger.error(f"Failed to get tariff type: {__tariff_type['data']['message']}")
-            __response_xml = XMLResponseBuilder(session_id=self.__request_data["session_id"],
-                                                response_type=3,
-                                                message=APPLICATION_ERRORED["data"]["message"])
-            return __response_xml.get_response_body()
-
-        if __tariff_type['data']['tariff_type'] != "Prepaid":
-            self.logger.error(f"Service not allowed for {__tariff_type['data']['tariff_type']} users")
-            __response_xml = XMLResponseBuilder(session_id=self.__request_data["session_id"],
-                                                response_type=3,
-                                                message=SERVICE_NOT_ALLOWED['data']['message'])
-            return __response_xml.get_response_body()
         # create ussd_session instance
-        __session = USSDSession(session_uid=self.__request_data["session_id"], msisdn=self.__request_data["msisdn"],
-                                user_input=self.__request_data["request_input"])
-        print(f"__Session Data: {__session.__dict__}")
+        __session = self.create_session()
         
         # register new ussd_session
         if self.__request_data["request_type"] == "1":
@@ -90,17 +89,61 @@ class USSDSessionController:
             return self.handle_active_session(__session)
 
         else:
+            return self.handle_unknown_request()
+
+    @traced("USSDSessionController.get_tariff_type")
+    def get_tariff_type(self):
+        with observe_phase("tariff_lookup"):
+            __tariff_type = SystemAPIIntegrationController(msisdn=self.__request_data["msisdn"]).get_tariff_type()
+        self.logger.debug("Tariff type: %s", __tariff_type)
+        return __tariff_type
+
+    def check_tariff_type(self, tariff_type: dict):
+        """
+        Only prepaid subscribers may use the service
+        :return: rejection response body, None if the subscriber is allowed
+        """
+        __tariff_type = tariff_type
+        if not __tariff_type["success"]:
+            
             # operation failed
-            __failure_message = APPLICATION_ERRORED["data"]["message"]
+            self.logger.error(f"Failed to get tariff type: {__tariff_type['data']['message']}")
+            count_menu_selection(self.__request_data["request_input"], "tariff_lookup_failed")
+            __response_xml = XMLResponseBuilder(session_id=self.__request_data["session_id"],
+                                                response_type=3,
+                                                message=APPLICATION_ERRORED["data"]["message"])
+            return __response_xml.get_response_bytes()
+
+        if __tariff_type['data']['tariff_type'] != "Prepaid":
+            self.logger.error(f"Service not allowed for {__tariff_type['data']['tariff_type']} users")
+            count_menu_selection(self.__request_data["request_input"], "not_allowed")
             __response_xml = XMLResponseBuilder(session_id=self.__request_data["session_id"],
                                                 response_type=3,
-                                                message=__failure_message)
-            return __response_xml.get_response_body()
+                                                message=SERVICE_NOT_ALLOWED['data']['message'])
+            return __response_xml.get_response_bytes()
+        return None
 
+    def create_session(self):
+        __session = USSDSession(session_uid=self.__request_data["session_id"], msisdn=self.__request_data["msisdn"],
+                                user_input=self.__request_data["request_input"])
+        self.logger.debug("Session data: %s", __session)
+        return __session
 
-    def handle_new_session(self, session:USSDSession):
+    def handle_unknown_request(self):
+        # operation failed
+        __failure_message = APPLICATION_ERRORED["data"]["message"]
+        __response_xml = XMLResponseBuilder(session_id=self.__request_data["session_id"],
+                                            response_type=3,
+                                            message=__failure_message)
+        return __response_xml.get_response_bytes()
+
+    def handle_new_session(self, session:USSDSession, next_state: dict = None):
+        """
+        :param next_state: state resolved ahead of time from INIT (see USSDSession.get_initial_state), looked up
+                           after initializing the session when not given
+        """
         if session.initialize()["success"]:
-            __next_state = session.get_next_state()
+            __next_state = next_state or session.get_next_state()
 
             if __next_state["success"]:
                 # ussd_string = self.__request_data["request_input"]
@@ -120,7 +163,8 @@ class USSDSessionController:
                                                           next_state_phase=__next_state["data"]["next_state_phase"])
                 if __set_next_state["success"]:
                     self.logger.info(f"Successfully set next state for session {session.session_uid}")
-                    return __response_xml.get_response_body()
+                    count_menu_selection("new_session", "navigated")
+                    return __response_xml.get_response_bytes()
                 self.logger.error(f"Failed to set next state for session {session.session_uid}")
 
         # operation failed
@@ -129,13 +173,17 @@ class USSDSessionController:
                                             response_type=3,
                                             message=APPLICATION_ERRORED["data"]["message"])
         self.logger.error(f"Failed to initialize session {session.session_uid}")
-        return __response_xml.get_response_body()
+        count_menu_selection("new_session", "state_failed")
+        return __response_xml.get_response_bytes()
     
     
-    def handle_active_session(self, session:USSDSession):        
+    def handle_active_session(self, session:USSDSession, next_state: dict = None):
+        """
+        :param next_state: state already resolved by the caller, looked up here when not given
+        """
         # get next state
-        __next_state = session.get_next_state()
-        print(f"NEXT STATE: \n{__next_state}")
+        __next_state = next_state or session.get_next_state()
+        self.logger.debug("Next state: %s", __next_state)
 
         # get next state operation failed
         if not __next_state["success"]:
@@ -143,39 +191,26 @@ class USSDSessionController:
                                                 response_type=3,
                                                 message=APPLICATION_ERRORED["data"]["message"])
             self.logger.error(f"Failed to get next state for session {session.session_uid}")
-            return __response_xml.get_response_body()
+            count_menu_selection(self.__request_data["request_input"], "state_failed")
+            return __response_xml.get_response_bytes()
 
         # gather inputs
         __input_required = True if __next_state["data"]["next_state_input_required"] == "Y" else False
         response_message = __next_state["data"]["next_state_message"]
 
         # Add logic for things to do before responding to customer / next state
-        # 1. Logic for Airtime transfer
-        if self.__request_data["request_input"] == "1":
-            airtime_transfers = CDCTransactions().get_airtime_transfers(self.__request_data["msisdn"])
-            result = CDCTransactions().send_sms(self.__request_data["msisdn"], "AIRTIME TRANSFERS: ", airtime_transfers)
-            if not result["success"]:
-                self.logger.error(f"Failed to send SMS for airtime transfers to {self.__request_data['msisdn']}, with session id {session.session_uid}, message: {result['message']}")
-                response_message = result['message']
-            self.logger.info(f"Successfully sent SMS for airtime transfers to {self.__request_data['msisdn']}, with session id {session.session_uid}")
-                
-        # 2. Logic for Bundle purchase
-        elif self.__request_data["request_input"] == "2":
-            bundle_purchases = CDCTransactions().get_bundle_purchases(self.__request_data["msisdn"])
-            result = CDCTransactions().send_sms(self.__request_data["msisdn"], "BUNDLE PURCHASE: ", bundle_purchases)
-            if not result["success"]:
-                self.logger.error(f"Failed to send SMS for bundle purchases to {self.__request_data['msisdn']}, with session id {session.session_uid}, message: {result['message']}")
-                response_message = result['message']
-            self.logger.info(f"Successfully sent SMS for bundle purchases to {self.__request_data['msisdn']}, with session id {session.session_uid}")
-                 
-        # 3. Logic for Call data records
-        elif self.__request_data["request_input"] == "3":
-            call_records = CDCTransactions().get_call_records(self.__request_data["msisdn"])
-            result = CDCTransactions().send_sms(self.__request_data["msisdn"], "CALL RECORDS: ", call_records)
-            if not result["success"]:
-                self.logger.error(f"Failed to send SMS for call records to {self.__request_data['msisdn']}, with session id {session.session_uid}, message: {result['message']}")
-                response_message = result['message']
-            self.logger.info(f"Successfully sent SMS for call records to {self.__request_data['msisdn']}, with session id {session.session_uid}")
+        # 1. Airtime transfer, 2. Bundle purchase, 3. Call data records
+        # the history is looked up and sent by SMS in the background, the reply does not wait for it
+        __outcome = "navigated"
+        if self.__request_data["request_input"] in TRANSACTION_HISTORY_SELECTIONS:
+            __outcome = "sms_queued"
+            __accepted = sms_dispatcher.submit("transaction_history", msisdn=self.__request_data["msisdn"],
+                                               request_input=self.__request_data["request_input"],
+                                               session_uid=session.session_uid)
+            if not __accepted:
+                self.logger.error(f"SMS dispatch queue full, could not queue transaction history for {self.__request_data['msisdn']}, with session id {session.session_uid}")
+                response_message = APPLICATION_ERRORED["data"]["message"]
+                __outcome = "sms_rejected"
                         
         
         # Ensure proper error handling
@@ -193,7 +228,9 @@ class USSDSessionController:
                                                     next_state_phase=__next_state["data"][
                                                         "next_state_phase"])
         if __set_next_state["success"]:
-            return __response_xml.get_response_body()
+            count_menu_selection(self.__request_data["request_input"], __outcome)
+            return __response_xml.get_response_bytes()
+        count_menu_selection(self.__request_data["request_input"], "state_failed")
         
 
 
@@ -0,0 +1,61 @@
+"""
+Async USSD request processing for the ASGI serving mode:
+the VXView tariff check and the session/state lookup run concurrently, the blocking drivers run on a bounded
+thread pool so the event loop is never blocked
+"""
+import os
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from controllers.ussd_session import USSDSessionController
+from resources.utilities.request_handler import USSDRequest
+
+# cx_Oracle and requests have no asyncio API, their calls are offloaded to this pool
+ussd_io_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("USSD_ASYNC_IO_THREADS", 64)),
+                                      thread_name_prefix="ussd-io")
+
+
+async def run_blocking(func, *args, **kwargs):
+    # run_in_executor does not carry context variables over, the request's log context goes with the call
+    __call = partial(contextvars.copy_context().run, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(ussd_io_executor, __call)
+
+
+class AsyncUSSDSessionController:
+    def __init__(self, request: USSDRequest):
+        super().__init__()
+        self.__request_data = request
+        self.__controller = USSDSessionController(request=request)
+
+    async def process_request(self):
+        __session = self.__controller.create_session()
+
+        # resolve the next state while VXView is checked, nothing is written before the tariff check passes
+        if self.__request_data.request_type == "1":
+            __state_lookup = __session.get_initial_state
+        elif self.__request_data.request_phase == "2":
+            __state_lookup = __session.get_next_state
+        else:
+            __state_lookup = None
+
+        if __state_lookup:
+            __tariff_type, __next_state = await asyncio.gather(run_blocking(self.__controller.get_tariff_type),
+                                                               run_blocking(__state_lookup))
+        else:
+            __tariff_type, __next_state = await run_blocking(self.__controller.get_tariff_type), None
+
+        __rejected = self.__controller.check_tariff_type(__tariff_type)
+        if __rejected:
+            return __rejected
+
+        if self.__request_data.request_type == "1":
+            self.__controller.logger.info("=" * 80)
+            self.__controller.logger.info(f"New session request from {self.__request_data.msisdn} with session id {self.__request_data.session_id}")
+            return await run_blocking(self.__controller.handle_new_session, __session,
+                                      next_state=__next_state if __next_state["success"] else None)
+
+        elif self.__request_data.request_phase == "2":
+            return await run_blocking(self.__controller.handle_active_session, __session, next_state=__next_state)
+
+        return self.__controller.handle_unknown_request()
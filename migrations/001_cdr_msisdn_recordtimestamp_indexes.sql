@@ -0,0 +1,15 @@
+-- Composite indexes for the CDC "last 5 transactions" lookups (models/cdc_transactions)
+-- The queries filter on OC_SERVED_MSISDN_NORM and read the newest OC_RECORDTIMESTAMP first, so a
+-- (MSISDN, TIMESTAMP DESC) index lets Oracle stop after the first rows instead of sorting every CDR of the subscriber.
+-- ONLINE keeps the mirrored tables available to the MIS load while the indexes build.
+
+CREATE INDEX IDX_AT_MSISDN_TS ON AIRTIME_TRANSFER (OC_SERVED_MSISDN_NORM, OC_RECORDTIMESTAMP DESC) ONLINE;
+
+CREATE INDEX IDX_BP_MSISDN_TS ON BUNDLE_PURCHASE (OC_SERVED_MSISDN_NORM, OC_RECORDTIMESTAMP DESC) ONLINE;
+
+CREATE INDEX IDX_CR_MSISDN_TS ON CALL_RECORDS (OC_SERVED_MSISDN_NORM, OC_RECORDTIMESTAMP DESC) ONLINE;
+
+-- Rollback
+-- DROP INDEX IDX_AT_MSISDN_TS;
+-- DROP INDEX IDX_BP_MSISDN_TS;
+-- DROP INDEX IDX_CR_MSISDN_TS;
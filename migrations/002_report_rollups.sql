@@ -0,0 +1,45 @@
+-- Rollups of TRANSACTION_REQUESTS for the reports (reports/rollups.py)
+-- The report queries group and COUNT(DISTINCT MSISDN) raw requests over their whole date range. These tables hold
+-- the same figures per hour / per day and request type, maintained incrementally from a watermark, so a report reads
+-- at most one row per subscriber per day instead of every request.
+
+-- Requests per hour and request type. PROCESSED_COUNT / PROCESSING_SECONDS give the average processing time and are
+-- rolled up by PROCESSED_ON, so requests processed after their hour was rolled up are still counted.
+CREATE TABLE REPORT_ROLLUP_HOURLY (
+    ROLLUP_HOUR DATE NOT NULL,
+    REQUEST_TYPE VARCHAR2(20) NOT NULL,
+    REQUEST_COUNT NUMBER(12) DEFAULT 0 NOT NULL,
+    PROCESSED_COUNT NUMBER(12) DEFAULT 0 NOT NULL,
+    PROCESSING_SECONDS NUMBER(18, 3) DEFAULT 0 NOT NULL,
+    CONSTRAINT PK_REPORT_ROLLUP_HOURLY PRIMARY KEY (ROLLUP_HOUR, REQUEST_TYPE)
+);
+
+-- Distinct subscribers per day and request type, with their request count. Unique users over any range are
+-- COUNT(DISTINCT MSISDN) of this table, top users and first usage read it instead of the raw requests.
+CREATE TABLE REPORT_ROLLUP_DAILY_USERS (
+    ROLLUP_DAY DATE NOT NULL,
+    REQUEST_TYPE VARCHAR2(20) NOT NULL,
+    MSISDN VARCHAR2(15) NOT NULL,
+    REQUEST_COUNT NUMBER(12) DEFAULT 0 NOT NULL,
+    FIRST_REQUEST_ON TIMESTAMP,
+    LAST_REQUEST_ON TIMESTAMP,
+    CONSTRAINT PK_REPORT_ROLLUP_DAILY_USERS PRIMARY KEY (ROLLUP_DAY, REQUEST_TYPE, MSISDN)
+);
+
+CREATE INDEX IDX_RRDU_MSISDN_DAY ON REPORT_ROLLUP_DAILY_USERS (MSISDN, ROLLUP_DAY);
+
+-- Everything before HIGH_WATERMARK has been rolled up. NULL until the first refresh backfills from the oldest request.
+CREATE TABLE REPORT_ROLLUP_WATERMARK (
+    ROLLUP_NAME VARCHAR2(64) PRIMARY KEY,
+    HIGH_WATERMARK DATE,
+    UPDATED_ON TIMESTAMP DEFAULT SYSTIMESTAMP
+);
+
+INSERT INTO REPORT_ROLLUP_WATERMARK (ROLLUP_NAME, HIGH_WATERMARK) VALUES ('TRANSACTION_REQUESTS', NULL);
+
+COMMIT;
+
+-- Rollback
+-- DROP TABLE REPORT_ROLLUP_WATERMARK;
+-- DROP TABLE REPORT_ROLLUP_DAILY_USERS;
+-- DROP TABLE REPORT_ROLLUP_HOURLY;
@@ -0,0 +1,20 @@
+-- HyperLogLog sketches of the subscribers per day and request type (reports/hyperloglog.py), maintained with the
+-- other report rollups by reports/rollups.py. Approximate report mode merges them for any range instead of
+-- counting distinct MSISDNs.
+
+CREATE TABLE REPORT_ROLLUP_DAILY_SKETCH (
+    ROLLUP_DAY DATE NOT NULL,
+    REQUEST_TYPE VARCHAR2(20) NOT NULL,
+    SKETCH BLOB NOT NULL,
+    CONSTRAINT PK_REPORT_ROLLUP_DAILY_SKETCH PRIMARY KEY (ROLLUP_DAY, REQUEST_TYPE)
+);
+
+-- The rollups are derived data: start them over so the next refresh backfills the sketches with everything else
+TRUNCATE TABLE REPORT_ROLLUP_HOURLY;
+TRUNCATE TABLE REPORT_ROLLUP_DAILY_USERS;
+UPDATE REPORT_ROLLUP_WATERMARK SET HIGH_WATERMARK = NULL, UPDATED_ON = SYSTIMESTAMP WHERE ROLLUP_NAME = 'TRANSACTION_REQUESTS';
+
+COMMIT;
+
+-- Rollback
+-- DROP TABLE REPORT_ROLLUP_DAILY_SKETCH;
@@ -0,0 +1,43 @@
+-- Load watermark of the mirrored CDR tables for the recent-transactions cache (models/cdc_transactions)
+-- The MIS load is the only writer of AIRTIME_TRANSFER, BUNDLE_PURCHASE and CALL_RECORDS. A statement-level trigger per
+-- table (fired once per load statement, not per row) moves LOADED_ON forward in the load's own transaction, so the
+-- application sees the new watermark exactly when it can see the new CDRs and drops the results it cached before.
+-- A TRUNCATE fires no DML trigger, the inserts that follow it do.
+
+CREATE TABLE CDR_MIRROR_LOAD_WATERMARK (
+    TABLE_NAME VARCHAR2(30) PRIMARY KEY,
+    LOADED_ON TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL
+);
+
+INSERT INTO CDR_MIRROR_LOAD_WATERMARK (TABLE_NAME) VALUES ('AIRTIME_TRANSFER');
+INSERT INTO CDR_MIRROR_LOAD_WATERMARK (TABLE_NAME) VALUES ('BUNDLE_PURCHASE');
+INSERT INTO CDR_MIRROR_LOAD_WATERMARK (TABLE_NAME) VALUES ('CALL_RECORDS');
+
+COMMIT;
+
+CREATE OR REPLACE TRIGGER TRG_AT_MIRROR_LOAD
+AFTER INSERT OR UPDATE OR DELETE ON AIRTIME_TRANSFER
+BEGIN
+    UPDATE CDR_MIRROR_LOAD_WATERMARK SET LOADED_ON = SYSTIMESTAMP WHERE TABLE_NAME = 'AIRTIME_TRANSFER';
+END;
+/
+
+CREATE OR REPLACE TRIGGER TRG_BP_MIRROR_LOAD
+AFTER INSERT OR UPDATE OR DELETE ON BUNDLE_PURCHASE
+BEGIN
+    UPDATE CDR_MIRROR_LOAD_WATERMARK SET LOADED_ON = SYSTIMESTAMP WHERE TABLE_NAME = 'BUNDLE_PURCHASE';
+END;
+/
+
+CREATE OR REPLACE TRIGGER TRG_CR_MIRROR_LOAD
+AFTER INSERT OR UPDATE OR DELETE ON CALL_RECORDS
+BEGIN
+    UPDATE CDR_MIRROR_LOAD_WATERMARK SET LOADED_ON = SYSTIMESTAMP WHERE TABLE_NAME = 'CALL_RECORDS';
+END;
+/
+
+-- Rollback
+-- DROP TRIGGER TRG_CR_MIRROR_LOAD;
+-- DROP TRIGGER TRG_BP_MIRROR_LOAD;
+-- DROP TRIGGER TRG_AT_MIRROR_LOAD;
+-- DROP TABLE CDR_MIRROR_LOAD_WATERMARK;
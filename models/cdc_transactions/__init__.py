@@ -1,11 +1,29 @@
 import json
 import os
+import time
 import logging
 from resources.utilities.database.oracle import exadata_db
-from resources.utilities.sms_service import sms_service
-from resources.static.response_templates import EXECUTION_FAIL
+from resources.utilities.database import access as db_access
+from resources.utilities.database.profiler import ProfiledCursor
+from resources.utilities.database.mirror_watermark import MirrorLoadWatermark
+from resources.utilities.cache import TTLCache
+from resources.utilities.single_flight import SingleFlight
+from resources.utilities.sms_service import sms_service, sms_batch_sender
 import uuid
 from resources.utilities.sms_service import sms_logger
+from resources.utilities.metrics import observe_phase
+from resources.utilities.tracing import traced, sql_statement
+
+# SMS items of the last lookup per (msisdn, request type), valid while the mirrored table has not been loaded since
+recent_transactions_cache = TTLCache(max_size=int(os.environ.get("CDC_TRANSACTIONS_CACHE_SIZE", 50000)),
+                                     ttl=float(os.environ.get("CDC_TRANSACTIONS_CACHE_TTL", 900)),
+                                     negative_ttl=float(os.environ.get("CDC_TRANSACTIONS_CACHE_NEGATIVE_TTL", 300)))
+cdr_mirror_watermark = MirrorLoadWatermark(poll_seconds=float(os.environ.get("CDR_MIRROR_WATERMARK_POLL", 30)))
+# concurrent identical lookups (gateway retries, double submits) share one query
+transaction_lookups = SingleFlight(timeout=float(os.environ.get("CDC_LOOKUP_COALESCE_TIMEOUT", 30)))
+# (msisdn, SMS text) sent recently, an identical SMS within the window is not sent again
+sms_dedup_window = TTLCache(max_size=int(os.environ.get("SMS_DEDUP_SIZE", 50000)),
+                            ttl=float(os.environ.get("SMS_DEDUP_WINDOW", 60)))
 
 
 class CDCTransactions:
@@ -18,209 +36,208 @@ class CDCTransactions:
     cdc_transactions_file (str): Path to the JSON file containing transaction data.
     """
 
-    def get_airtime_transfers(self, msisdn: str):
-        try:
-            # Record the request
-            request_id = str(uuid.uuid4())
-            insert_query = """
-                INSERT INTO TRANSACTION_REQUESTS 
-                (REQUEST_UID, MSISDN, REQUEST_TYPE, CREATED_ON) 
-                VALUES 
-                (:request_id, :msisdn, 'AIRTIME_TRANSFER', SYSTIMESTAMP)
-            """
-            params = {
-                'request_id': request_id,
-                'msisdn': msisdn
-            }
-            self.execute_query(insert_query, params=params, fetch_data=False)
-            
-            # Query to get the last 5 airtime transfers
-            query = """
-                SELECT *
-                FROM (
-                    SELECT * 
-                    FROM AIRTIME_TRANSFER 
-                    WHERE OC_SERVED_MSISDN_NORM = :msisdn
-                    ORDER BY OC_RECORDTIMESTAMP DESC
-                )
-                WHERE ROWNUM <= 5
-            """
-            params = {
-                'msisdn': msisdn
-            }
-            
-            # Execute query and get results directly
-            airtime_transfers = self.execute_query(query, params=params, fetch_data=True)
-            
-            if not airtime_transfers:
-                return []
+    INSERT_REQUEST_QUERY = """
+        INSERT INTO TRANSACTION_REQUESTS 
+        (REQUEST_UID, MSISDN, REQUEST_TYPE, CREATED_ON) 
+        VALUES 
+        (:request_id, :msisdn, :request_type, SYSTIMESTAMP)
+    """
+
+    UPDATE_REQUEST_QUERY = """
+        UPDATE TRANSACTION_REQUESTS
+        SET RESPONSE_TEXT = :sms_message,
+            PROCESSED_ON = SYSTIMESTAMP
+        WHERE REQUEST_UID = :request_id
+    """
 
-            # Format results for SMS
-            sms_items = []
-            for i, item in enumerate(airtime_transfers):
-                timestamp = item["OC_RECORDTIMESTAMP"].strftime("%d/%m/%Y %H:%M")
-                transfered_to = self.mask_phone_number(item["OC_OTHERPARTY_NORM"])
-                amount = f"M{item['OC_ACCOUNT_CHARGE']:.2f}"
-                message = f"{i+1}) {timestamp} {transfered_to} {amount}"
-                sms_items.append({"message": message})
+    INSERT_PROCESSED_REQUEST_QUERY = """
+        INSERT INTO TRANSACTION_REQUESTS 
+        (REQUEST_UID, MSISDN, REQUEST_TYPE, CREATED_ON, RESPONSE_TEXT, PROCESSED_ON) 
+        VALUES 
+        (:request_id, :msisdn, :request_type, SYSTIMESTAMP, :sms_message, SYSTIMESTAMP)
+    """
 
-            # Update transaction record with response
-            if sms_items:
-                sms_message = "\n".join([item["message"] for item in sms_items])
-                update_query = """
-                    UPDATE TRANSACTION_REQUESTS
-                    SET RESPONSE_TEXT = :sms_message,
-                        PROCESSED_ON = SYSTIMESTAMP
-                    WHERE REQUEST_UID = :request_id
-                """
-                params = {
-                    'request_id': request_id,
-                    'sms_message': sms_message
-                }
-                self.execute_query(update_query, params=params, fetch_data=False)
-                
-            return sms_items
+    # Last transactions per subscriber, projected to the columns each SMS formatter uses.
+    # Served by the (OC_SERVED_MSISDN_NORM, OC_RECORDTIMESTAMP DESC) indexes, see migrations/
+    TRANSACTION_LIMIT = 5
+
+    AIRTIME_TRANSFER_QUERY = """
+        SELECT OC_RECORDTIMESTAMP, OC_OTHERPARTY_NORM, OC_ACCOUNT_CHARGE
+        FROM AIRTIME_TRANSFER
+        WHERE OC_SERVED_MSISDN_NORM = :msisdn
+        ORDER BY OC_RECORDTIMESTAMP DESC
+        FETCH FIRST :row_limit ROWS ONLY
+    """
+
+    BUNDLE_PURCHASE_QUERY = """
+        SELECT OC_RECORDTIMESTAMP, OC_OTHERPARTY_NORM, EVENT, OC_ACCOUNT_CHARGE
+        FROM BUNDLE_PURCHASE
+        WHERE OC_SERVED_MSISDN_NORM = :msisdn
+        ORDER BY OC_RECORDTIMESTAMP DESC
+        FETCH FIRST :row_limit ROWS ONLY
+    """
+
+    CALL_RECORDS_QUERY = """
+        SELECT OC_RECORDTIMESTAMP, OC_OTHERPARTY_NORM, OC_TOTAL_USED_DURATION, OC_ACCOUNT_BALANCE_AFTER
+        FROM CALL_RECORDS
+        WHERE OC_SERVED_MSISDN_NORM = :msisdn
+        ORDER BY OC_RECORDTIMESTAMP DESC
+        FETCH FIRST :row_limit ROWS ONLY
+    """
+
+    def get_airtime_transfers(self, msisdn: str):
+        try:
+            return self.lookup_transactions(msisdn, 'AIRTIME_TRANSFER', self.AIRTIME_TRANSFER_QUERY, self.format_airtime_transfers)
         except Exception as e:
             logging.exception(e, exc_info=True)
-            print(EXECUTION_FAIL)
             return []
     
     def get_bundle_purchases(self, msisdn: str):
         try:
-            request_id = str(uuid.uuid4())
-            insert_query = """
-                INSERT INTO TRANSACTION_REQUESTS 
-                (REQUEST_UID, MSISDN, REQUEST_TYPE, CREATED_ON) 
-                VALUES 
-                (:request_id, :msisdn, 'BUNDLE_PURCHASE', SYSTIMESTAMP)
-            """
-            params = {
-                'request_id': request_id,
-                'msisdn': msisdn
-            }
-            self.execute_query(insert_query, params=params, fetch_data=False)
-        
-            # Query to get the last 5 bundle purchases for the given MSISDN
-            query = """
-                SELECT *
-                FROM (
-                    SELECT * 
-                    FROM BUNDLE_PURCHASE 
-                    WHERE OC_SERVED_MSISDN_NORM = :msisdn
-                    ORDER BY OC_RECORDTIMESTAMP DESC
-                )
-                WHERE ROWNUM <= 5
-            """
-            params = {
-                'msisdn': msisdn
-            }
-
-            bundle_purchase = self.execute_query(query, params=params, fetch_data=True)
-
-            if not bundle_purchase:
-                return []
-
-            sms_items = []
-            for i, item in enumerate(bundle_purchase):
-                timestamp = item["OC_RECORDTIMESTAMP"].strftime("%d/%m/%Y %H:%M")
-                other_party = self.mask_phone_number(item["OC_OTHERPARTY_NORM"])
-                event = item["EVENT"]
-                amount = f"M{item['OC_ACCOUNT_CHARGE']:.2f}"
-                # Format message differently based on whether other_party exists
-                if other_party and other_party.strip():
-                    # Mask the phone number only if it exists
-                    masked_party = self.mask_phone_number(other_party)
-                    message = f"{i+1}) {masked_party}: {timestamp} {event} {amount}"
-                else:
-                    message = f"{i+1}) {timestamp} {event} {amount}"
-                sms_items.append({"message": message})
-
-            # If successful, update the record with response
-            if sms_items:
-                sms_message = "\n".join([item["message"] for item in sms_items])
-                update_query = """
-                    UPDATE TRANSACTION_REQUESTS
-                    SET RESPONSE_TEXT = :sms_message,
-                        PROCESSED_ON = SYSTIMESTAMP
-                    WHERE REQUEST_UID = :request_id
-                """
-                params = {
-                    'request_id': request_id,
-                    'sms_message': sms_message
-                }
-                self.execute_query(update_query, params=params, fetch_data=False)
-        
-            return sms_items
+            return self.lookup_transactions(msisdn, 'BUNDLE_PURCHASE', self.BUNDLE_PURCHASE_QUERY, self.format_bundle_purchases)
         except Exception as e:
             logging.exception(e, exc_info=True)
-            print(EXECUTION_FAIL)
             return []
 
     def get_call_records(self, msisdn: str):
         try:
-            request_id = str(uuid.uuid4())
-            insert_query = """
-                INSERT INTO TRANSACTION_REQUESTS 
-                (REQUEST_UID, MSISDN, REQUEST_TYPE, CREATED_ON) 
-                VALUES 
-                (:request_id, :msisdn, 'CALL_RECORDS', SYSTIMESTAMP)
-            """
-            params = {
-                'request_id': request_id,
-                'msisdn': msisdn
-            }
-            self.execute_query(insert_query, params=params, fetch_data=False)
-            
-            # Query to get the last 5 call records for the given MSISDN
-            query = """
-                SELECT *
-                FROM (
-                    SELECT * 
-                    FROM CALL_RECORDS 
-                    WHERE OC_SERVED_MSISDN_NORM = :msisdn
-                    ORDER BY OC_RECORDTIMESTAMP DESC
-                )
-                WHERE ROWNUM <= 5
-            """
-            params = {
-                'msisdn': msisdn
-            }
-            
-            call_records = self.execute_query(query, params=params, fetch_data=True)
-
-            if not call_records:
-                return []
-
-            sms_items = []
-            for i, item in enumerate(call_records):
-                timestamp = item["OC_RECORDTIMESTAMP"].strftime("%d/%m/%Y %H:%M")
-                other_party = self.mask_phone_number(item["OC_OTHERPARTY_NORM"])
-                call_duration = self.format_time_duration(item["OC_TOTAL_USED_DURATION"])
-                account_balance_after = self.format_time_duration(item['OC_ACCOUNT_BALANCE_AFTER'])
-                message = f"{i+1}) {other_party}: {call_duration}, Balance: {account_balance_after}, Date: {timestamp}"
-                sms_items.append({"message": message})
-
-                # If successful, update the record with response
-            if sms_items:
-                sms_message = "\n".join([item["message"] for item in sms_items])
-                update_query = """
-                    UPDATE TRANSACTION_REQUESTS
-                    SET RESPONSE_TEXT = :sms_message,
-                        PROCESSED_ON = SYSTIMESTAMP
-                    WHERE REQUEST_UID = :request_id
-                """
-                params = {
-                    'request_id': request_id,
-                    'sms_message': sms_message
-                }
-                self.execute_query(update_query, params=params, fetch_data=False)
-                
-            return sms_items
+            return self.lookup_transactions(msisdn, 'CALL_RECORDS', self.CALL_RECORDS_QUERY, self.format_call_records)
         except Exception as e:
             logging.exception(e, exc_info=True)
-            print(EXECUTION_FAIL)
             return []
 
+    @observe_phase("cdc_query")
+    @traced("CDCTransactions.lookup_transactions")
+    def lookup_transactions(self, msisdn: str, request_type: str, query: str, formatter):
+        """
+        Record the request, fetch the transactions and store the response on one pooled connection with one commit.
+        A repeated request is answered from recent_transactions_cache until the mirrored table is loaded again, and
+        a request arriving while the same lookup is running waits for its result; only the request record is
+        written then.
+        
+        Args:
+            msisdn (str): Subscriber number
+            request_type (str): TRANSACTION_REQUESTS.REQUEST_TYPE
+            query (str): SELECT with :msisdn and :row_limit binds returning the transactions
+            formatter: Turns the fetched rows into SMS items
+        
+        Returns:
+            List of SMS items, empty when there are no transactions
+        """
+        cache_key = (msisdn, request_type)
+        watermark = cdr_mirror_watermark.get(request_type)
+        if watermark is not None:
+            cached = recent_transactions_cache.get(cache_key)
+            if cached is not None:
+                cached_watermark, sms_items = cached
+                if cached_watermark == watermark:
+                    self.record_processed_request(msisdn, request_type, sms_items)
+                    return list(sms_items)
+                # the table was loaded since, there may be newer transactions
+                recent_transactions_cache.invalidate(cache_key)
+
+        sms_items, shared = transaction_lookups.do(cache_key, self.query_transactions, msisdn, request_type, query,
+                                                   formatter)
+        if shared:
+            self.record_processed_request(msisdn, request_type, sms_items)
+            return list(sms_items)
+        if watermark is not None:
+            if sms_items:
+                recent_transactions_cache.set(cache_key, (watermark, list(sms_items)))
+            else:
+                recent_transactions_cache.set_negative(cache_key, (watermark, []))
+        return sms_items
+
+    def query_transactions(self, msisdn: str, request_type: str, query: str, formatter):
+        """Run the lookup against Exadata, see lookup_transactions"""
+        request_id = str(uuid.uuid4())
+        __start = time.perf_counter()
+        with exadata_db.connection() as conn:
+            cursor = ProfiledCursor(conn.cursor(), acquire_seconds=time.perf_counter() - __start)
+            try:
+                # Record the request
+                cursor.execute(self.INSERT_REQUEST_QUERY,
+                               {'request_id': request_id, 'msisdn': msisdn, 'request_type': request_type})
+
+                # fetch the whole top-N in the execute round trip, +1 lets the driver see the end of the rows
+                cursor.arraysize = self.TRANSACTION_LIMIT + 1
+                cursor.prefetchrows = self.TRANSACTION_LIMIT + 1
+                cursor.execute(query, {'msisdn': msisdn, 'row_limit': self.TRANSACTION_LIMIT})
+                columns = [desc[0] for desc in cursor.description]
+                transactions = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+                # Format results for SMS
+                sms_items = formatter(transactions) if transactions else []
+
+                # Update transaction record with response
+                if sms_items:
+                    sms_message = "\n".join([item["message"] for item in sms_items])
+                    cursor.execute(self.UPDATE_REQUEST_QUERY, {'request_id': request_id, 'sms_message': sms_message})
+
+                conn.commit()
+                return sms_items
+            except Exception as e:
+                # Roll back any changes if there was an error
+                conn.rollback()
+                logging.error(f"Database error: {str(e)}")
+                raise
+            finally:
+                cursor.close()
+
+    def record_processed_request(self, msisdn: str, request_type: str, sms_items: list):
+        """Write the request record of a request answered without querying the transactions"""
+        sms_message = "\n".join([item["message"] for item in sms_items]) if sms_items else None
+        if sms_message:
+            db_access.execute_query(self.INSERT_PROCESSED_REQUEST_QUERY,
+                                    {'request_id': str(uuid.uuid4()), 'msisdn': msisdn, 'request_type': request_type,
+                                     'sms_message': sms_message}, commit=True)
+        else:
+            db_access.execute_query(self.INSERT_REQUEST_QUERY,
+                                    {'request_id': str(uuid.uuid4()), 'msisdn': msisdn, 'request_type': request_type},
+                                    commit=True)
+
+    @classmethod
+    def format_airtime_transfers(cls, airtime_transfers: list):
+        sms_items = []
+        for i, item in enumerate(airtime_transfers):
+            timestamp = item["OC_RECORDTIMESTAMP"].strftime("%d/%m/%Y %H:%M")
+            transfered_to = cls.mask_phone_number(item["OC_OTHERPARTY_NORM"])
+            amount = f"M{item['OC_ACCOUNT_CHARGE']:.2f}"
+            message = f"{i+1}) {timestamp} {transfered_to} {amount}"
+            sms_items.append({"message": message})
+        return sms_items
+
+    @classmethod
+    def format_bundle_purchases(cls, bundle_purchase: list):
+        sms_items = []
+        for i, item in enumerate(bundle_purchase):
+            timestamp = item["OC_RECORDTIMESTAMP"].strftime("%d/%m/%Y %H:%M")
+            other_party = cls.mask_phone_number(item["OC_OTHERPARTY_NORM"])
+            event = item["EVENT"]
+            amount = f"M{item['OC_ACCOUNT_CHARGE']:.2f}"
+            # Format message differently based on whether other_party exists
+            if other_party and other_party.strip():
+                # Mask the phone number only if it exists
+                masked_party = cls.mask_phone_number(other_party)
+                message = f"{i+1}) {masked_party}: {timestamp} {event} {amount}"
+            else:
+                message = f"{i+1}) {timestamp} {event} {amount}"
+            sms_items.append({"message": message})
+        return sms_items
+
+    @classmethod
+    def format_call_records(cls, call_records: list):
+        sms_items = []
+        for i, item in enumerate(call_records):
+            timestamp = item["OC_RECORDTIMESTAMP"].strftime("%d/%m/%Y %H:%M")
+            other_party = cls.mask_phone_number(item["OC_OTHERPARTY_NORM"])
+            call_duration = cls.format_time_duration(item["OC_TOTAL_USED_DURATION"])
+            account_balance_after = cls.format_time_duration(item['OC_ACCOUNT_BALANCE_AFTER'])
+            message = f"{i+1}) {other_party}: {call_duration}, Balance: {account_balance_after}, Date: {timestamp}"
+            sms_items.append({"message": message})
+        return sms_items
+
+    @observe_phase("sms_send")
     def send_sms(self, msisdn: str, title: str, sms_items: list):
         if not sms_items:
             sms_logger.warning("You have no recent transactions for this request")
@@ -241,20 +258,36 @@ class CDCTransactions:
                     "message": "Empty or invalid MSISDN provided"
                 }
                 
-            # Send the SMS
-            result = sms_service.send_message(
-                to=msisdn,
-                body=sms_message
-            )
+            # An identical SMS was just sent to the subscriber, e.g. for a retried or double submitted request
+            dedup_key = (msisdn, sms_message)
+            if not sms_dedup_window.add(dedup_key):
+                sms_logger.info(f"Duplicate SMS to {msisdn} suppressed")
+                return {
+                    "success": True,
+                    "message": "Duplicate SMS to " + msisdn + " suppressed"
+                }
+
+            # Send the SMS, coalesced with other outgoing messages in batch mode
+            sender = sms_batch_sender or sms_service
+            try:
+                result = sender.send_message(
+                    to=msisdn,
+                    body=sms_message
+                )
+            except Exception:
+                sms_dedup_window.invalidate(dedup_key)
+                raise
             
              # Log the result
-            if isinstance(result, dict) and result == {'success': True}:
+            if isinstance(result, dict) and result.get('success') is True:
                 sms_logger.info(f"Successfully sent SMS to {msisdn}")
                 return{
                     "success": True,
                     "message": "Successfully sent SMS to " +  msisdn
                 }
             else:
+                # not sent, a retry must not be suppressed
+                sms_dedup_window.invalidate(dedup_key)
                 sms_logger.error(f"Failed to send SMS: {result.get('error', 'Unknown error')}")
                 return {
                     "success": False,
@@ -308,6 +341,7 @@ class CDCTransactions:
             return f"{seconds}sec"
     
     @staticmethod
+    @traced("CDCTransactions.execute_query", attributes=sql_statement)
     def execute_query(query, params=None, fetch_data=False):
         """
         Execute a SQL query and handle committing or fetching data as appropriate.
@@ -321,36 +355,9 @@ class CDCTransactions:
             If fetch_data is True: List of dictionaries with the query results
             If fetch_data is False: True for successful execution
         """
-        conn = None
-        cursor = None
-        try:
-            conn = exadata_db.get_connection_handle()
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            if fetch_data:
-                # For SELECT queries - fetch data and return as list of dictionaries
-                columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
-                result = [dict(zip(columns, row)) for row in rows]
-                return result
-            else:
-                # For INSERT/UPDATE/DELETE queries - commit the transaction
-                conn.commit()
-                return True
-                
-        except Exception as e:
-            # Roll back any changes if there was an error
-            if conn:
-                conn.rollback()
-            logging.error(f"Database error: {str(e)}")
-            raise
-        finally:
-            # Clean up resources
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
+        if fetch_data:
+            # For SELECT queries - fetch data and return as list of dictionaries
+            return db_access.execute_query(query, params, fetch=db_access.FETCH_ALL)
+        # For INSERT/UPDATE/DELETE queries - commit the transaction
+        db_access.execute_query(query, params, commit=True)
+        return True
\ No newline at end of file
@@ -6,7 +6,12 @@ import logging
 from dataclasses import dataclass
 from resources.static.response_templates import EXECUTION_SUCCESS, EXECUTION_FAIL
 from models.ussd_session_state import USSDSessionState
-from resources.utilities.database.oracle import exadata_db
+from resources.utilities.database import access as db_access
+from resources.utilities.session_store import session_store, session_write_behind
+from resources.utilities.metrics import observe_phase
+from resources.utilities.tracing import traced, sql_statement
+
+session_logger = logging.getLogger('ussd_session')
 
 
 @dataclass
@@ -19,14 +24,21 @@ class USSDSession:
     session_last_update: str = None
     terminate_session: bool = False
 
+    @observe_phase("session_db")
     def initialize(self):
+        if session_store is not None:
+            # fast path: keep the session in the store, CDC_USSD_SESSION is written behind
+            __record = {"session_uid": self.session_uid, "current_state": "INIT", "current_state_alias": "N.A",
+                        "current_state_phase": 0, "msisdn": self.msisdn, "user_input": self.user_input}
+            session_store.set(self.session_uid, __record)
+            session_write_behind.enqueue_insert(__record)
+            return EXECUTION_SUCCESS
+
         query = f"INSERT INTO CDC_USSD_SESSION VALUES({self.session_uid}, 'INIT', 'N.A', 0,'{self.msisdn}', '{self.user_input}', SYSDATE, SYSDATE)"
-        print(
-            f"\n---\n{USSDSession.initialize.__qualname__} [query]\n{query}"
-        )
+        session_logger.debug("%s [query] %s", USSDSession.initialize.__qualname__, query)
         try:
             result = self.execute_query(query, "commit")
-            print(f"{result}\n---")
+            session_logger.debug("%s [result] %s", USSDSession.initialize.__qualname__, result)
             return result
         except Exception as e:
             logging.exception(e, exc_info=True)
@@ -38,18 +50,22 @@ class USSDSession:
         # return next state
         pass
 
+    @observe_phase("session_db")
     def get_current_state(self):
+        if session_store is not None:
+            __record = session_store.get(self.session_uid)
+            if __record:
+                return {"success": True, "data": __record}
+
         query = f"SELECT SESSION_UID, CURRENT_STATE, CURRENT_STATE_ALIAS, CURRENT_STATE_PHASE, MSISDN, USER_INPUT FROM CDC_USSD_SESSION WHERE SESSION_UID='{self.session_uid}'"
-        print(
-            f"\n---\n{USSDSession.get_current_state.__qualname__} [query]\n{query}"
-        )
+        session_logger.debug("%s [query] %s", USSDSession.get_current_state.__qualname__, query)
         try:
             result = self.execute_query(query, "fetch")
         except Exception as e:
             logging.exception(e, exc_info=True)
             return EXECUTION_FAIL
         if result:
-            print(f"{result}\n---")
+            session_logger.debug("%s [result] %s", USSDSession.get_current_state.__qualname__, result)
             return {"success": True, "data": {
                 "session_uid": result[0],
                 "current_state": result[1],
@@ -63,33 +79,36 @@ class USSDSession:
         __next_state = USSDSessionState(session_uid=self.session_uid, user_selection=self.user_input).get_next_state(session_current_state=self.get_current_state())
         return __next_state
 
+    def get_initial_state(self):
+        """Next state of a session that is about to be initialized, resolved without reading the session back"""
+        __current_state = {"success": True, "data": {"session_uid": self.session_uid, "current_state": "INIT"}}
+        return USSDSessionState(session_uid=self.session_uid, user_selection=self.user_input).get_next_state(session_current_state=__current_state)
+
+    @observe_phase("session_db")
     def set_next_state(self, next_state: str, next_state_alias: str, next_state_phase: int = 0):
+        if session_store is not None:
+            __record = session_store.get(self.session_uid) or {"session_uid": self.session_uid, "msisdn": self.msisdn,
+                                                                "user_input": self.user_input}
+            __record.update(current_state=next_state, current_state_alias=next_state_alias,
+                            current_state_phase=next_state_phase)
+            session_store.set(self.session_uid, __record)
+            session_write_behind.enqueue_update(__record)
+            return EXECUTION_SUCCESS
+
         query = f"UPDATE CDC_USSD_SESSION SET CURRENT_STATE='{next_state}', CURRENT_STATE_ALIAS='{next_state_alias}', CURRENT_STATE_PHASE='{next_state_phase}' WHERE SESSION_UID='{self.session_uid}'"
-        print(
-            f"\n---\n{USSDSession.set_next_state.__qualname__} [query]\n{query}"
-        )
+        session_logger.debug("%s [query] %s", USSDSession.set_next_state.__qualname__, query)
         try:
             result = self.execute_query(query, "commit")
-            print(f"{result}\n---")
+            session_logger.debug("%s [result] %s", USSDSession.set_next_state.__qualname__, result)
             return result
         except Exception as e:
             logging.exception(e, exc_info=True)
             return EXECUTION_FAIL
     
     @staticmethod
+    @traced("USSDSession.execute_query", attributes=sql_statement)
     def execute_query(query, operation):
-        conn = exadata_db.get_connection_handle()
-        cursor = conn.cursor()
-        cursor.execute(query)
         if operation == "fetch":
-            result = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            return result
+            return db_access.execute_query(query, fetch=db_access.FETCH_ONE)
         elif operation == "commit":
-            if cursor.rowcount:
-                cursor.execute("commit")
-                cursor.close()
-                conn.close()
-                return EXECUTION_SUCCESS
-            return EXECUTION_FAIL
+            return EXECUTION_SUCCESS if db_access.execute_query(query, commit=True) else EXECUTION_FAIL
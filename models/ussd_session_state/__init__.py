@@ -2,10 +2,113 @@
 Based on current ussd_session_state uid and user selection/input; you transition to the next state
 """
 # import cx_Oracle
+import os
+import time
 import logging
+import threading
 from dataclasses import dataclass
 from resources.static.response_templates import EXECUTION_FAIL
 from resources.utilities.database.oracle import exadata_db
+from resources.utilities.database import access as db_access
+from resources.utilities.database.profiler import ProfiledCursor
+from resources.utilities.metrics import observe_phase
+from resources.utilities.tracing import traced, sql_statement
+
+state_logger = logging.getLogger('ussd_session_state')
+
+
+class USSDStateMachine:
+    """
+    In-memory copy of the CDC_USSD_SESSION_STATE menu graph.
+
+    Transitions are compiled into a dict keyed by (CURRENT_STATE, NEXT_STATE_USER_SELECTION) so that resolving the
+    next state is a single lookup. The first row (by SESSION_STATE_UID) of every state is kept as its default
+    transition, used where no selection applies (e.g. INIT). The table is refreshed once it is older than ttl seconds.
+    """
+    LOAD_QUERY = "SELECT CURRENT_STATE, NEXT_STATE_USER_SELECTION, NEXT_STATE, NEXT_STATE_MESSAGE, " \
+                 "NEXT_STATE_INPUT_REQUIRED, NEXT_STATE_ALIAS, NEXT_STATE_PHASE FROM CDC_USSD_SESSION_STATE " \
+                 "ORDER BY SESSION_STATE_UID"
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl if ttl is not None else int(os.environ.get("USSD_STATE_MACHINE_TTL", 300))
+        self.__transitions = {}
+        self.__defaults = {}
+        self.__loaded_at = None
+        self.__refresh_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return bool(self.__transitions)
+
+    @staticmethod
+    def normalize_selection(user_selection):
+        """NEXT_STATE_USER_SELECTION is numeric, match user input the way Oracle would ('01' == 1)"""
+        __selection = str(user_selection).strip()
+        try:
+            return str(int(__selection))
+        except ValueError:
+            return __selection
+
+    def load(self):
+        """
+        (Re)load the menu graph from the database and swap it in
+        :return: number of transitions loaded
+        """
+        with exadata_db.connection() as conn:
+            cursor = ProfiledCursor(conn.cursor())
+            try:
+                cursor.execute(self.LOAD_QUERY)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+
+        __transitions = {}
+        __defaults = {}
+        for row in rows:
+            __current_state, __selection, __next_state = row[0], row[1], tuple(row[2:7])
+            __transitions[(__current_state, self.normalize_selection(__selection))] = __next_state
+            __defaults.setdefault(__current_state, __next_state)
+
+        # swap references so concurrent readers always see a complete table
+        self.__transitions, self.__defaults = __transitions, __defaults
+        self.__loaded_at = time.monotonic()
+        logging.info(f"USSD state machine loaded with {len(__transitions)} transitions")
+        return len(__transitions)
+
+    def refresh_if_stale(self):
+        """Reload the table once the TTL has passed. Only one thread reloads, the rest keep using the current table"""
+        if self.__loaded_at is not None and time.monotonic() - self.__loaded_at < self.ttl:
+            return
+        if not self.__refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.load()
+        except Exception as e:
+            # keep serving the current table, retry after another TTL
+            self.__loaded_at = time.monotonic()
+            logging.exception(e, exc_info=True)
+        finally:
+            self.__refresh_lock.release()
+
+    def resolve(self, current_state: str, user_selection=None):
+        """
+        Resolve a transition without database work
+        :return: (NEXT_STATE, NEXT_STATE_MESSAGE, NEXT_STATE_INPUT_REQUIRED, NEXT_STATE_ALIAS, NEXT_STATE_PHASE) or None
+        """
+        if user_selection is None:
+            return self.__defaults.get(current_state)
+        return self.__transitions.get((current_state, self.normalize_selection(user_selection)))
+
+    def get_stats(self):
+        return {
+            "transitions": len(self.__transitions),
+            "states": len(self.__defaults),
+            "ttl": self.ttl,
+            "age": time.monotonic() - self.__loaded_at if self.__loaded_at is not None else None
+        }
+
+
+ussd_state_machine = USSDStateMachine()
 
 
 @dataclass
@@ -20,35 +123,24 @@ class USSDSessionState:
     next_state_alias: str = None
     next_state_phase: str = None
 
+    @observe_phase("state_resolution")
     def get_next_state(self, session_current_state: object):
         __current_state = session_current_state
-        print(f"\n---\n Current State:: {USSDSessionState.get_next_state.__qualname__}\n{__current_state}\n---")
+        state_logger.debug("%s [current state] %s", USSDSessionState.get_next_state.__qualname__, __current_state)
 
         if not __current_state["success"]:
             return EXECUTION_FAIL
 
-        if __current_state["data"]["current_state"] == 'INIT':
-            query = f"SELECT NEXT_STATE, NEXT_STATE_MESSAGE, NEXT_STATE_INPUT_REQUIRED, NEXT_STATE_ALIAS, NEXT_STATE_PHASE FROM CDC_USSD_SESSION_STATE \
-            WHERE CURRENT_STATE='{__current_state['data']['current_state']}'"
-            print(
-                f"\n---\n{USSDSessionState.get_next_state.__qualname__} [query]\n{query}"
-            )
-        
-        # menu with no constant state and phase transitions
-        else:
-            query = f"SELECT NEXT_STATE, NEXT_STATE_MESSAGE, NEXT_STATE_INPUT_REQUIRED, NEXT_STATE_ALIAS, NEXT_STATE_PHASE FROM CDC_USSD_SESSION_STATE \
-            WHERE CURRENT_STATE='{__current_state['data']['current_state']}' AND NEXT_STATE_USER_SELECTION='{self.user_selection}'"
-            print(
-                f"\n---\n{USSDSessionState.get_next_state.__qualname__} [query]\n{query}"
-            )
-            
+        __state = __current_state["data"]["current_state"]
+        __selection = None if __state == 'INIT' else self.user_selection
+
         try:
-            result = self.execute_query(query)
+            result = self.__resolve(__state, __selection)
         except Exception as e:
             logging.exception(e, exc_info=True)
             return EXECUTION_FAIL
         if result:
-            print(f"{result}\n---")
+            state_logger.debug("%s [result] %s", USSDSessionState.get_next_state.__qualname__, result)
             return {
                 "success": True,
                 "data": {
@@ -62,19 +154,15 @@ class USSDSessionState:
             }
         return EXECUTION_FAIL
 
+    @observe_phase("state_resolution")
     def get_custom_state(self, current_state):
-            query = f"SELECT NEXT_STATE, NEXT_STATE_MESSAGE, NEXT_STATE_INPUT_REQUIRED, NEXT_STATE_ALIAS, NEXT_STATE_PHASE FROM CDC_USSD_SESSION_STATE \
-                WHERE CURRENT_STATE='{current_state}'"
-            print(
-                f"\n---\n{USSDSessionState.get_custom_state.__qualname__} [query]\n{query}"
-            )
             try:
-                result = self.execute_query(query)
+                result = self.__resolve(current_state)
             except Exception as e:
                 logging.exception(e, exc_info=True)
                 return EXECUTION_FAIL
             if result:
-                print(f"{result}\n---")
+                state_logger.debug("%s [result] %s", USSDSessionState.get_custom_state.__qualname__, result)
                 return {
                     "success": True,
                     "data": {
@@ -87,12 +175,24 @@ class USSDSessionState:
                 }
             return EXECUTION_FAIL
     
+    def __resolve(self, current_state, user_selection=None):
+        ussd_state_machine.refresh_if_stale()
+        if ussd_state_machine.loaded:
+            return ussd_state_machine.resolve(current_state, user_selection)
+        return self.execute_query(self.__state_query(current_state, user_selection))
+
+    @staticmethod
+    def __state_query(current_state, user_selection=None):
+        """fallback used until the state machine has been loaded"""
+        query = f"SELECT NEXT_STATE, NEXT_STATE_MESSAGE, NEXT_STATE_INPUT_REQUIRED, NEXT_STATE_ALIAS, NEXT_STATE_PHASE FROM CDC_USSD_SESSION_STATE \
+            WHERE CURRENT_STATE='{current_state}'"
+        # menu with no constant state and phase transitions
+        if user_selection is not None:
+            query += f" AND NEXT_STATE_USER_SELECTION='{user_selection}'"
+        state_logger.debug("%s [query] %s", USSDSessionState.__qualname__, query)
+        return query
+
     @staticmethod
+    @traced("USSDSessionState.execute_query", attributes=sql_statement)
     def execute_query(query):
-        conn = exadata_db.get_connection_handle()
-        cursor = conn.cursor()
-        cursor.execute(query)
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        return result
\ No newline at end of file
+        return db_access.execute_query(query, fetch=db_access.FETCH_ONE)
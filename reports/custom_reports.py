@@ -1,16 +1,128 @@
 from datetime import datetime
 from .utils import ReportingBase
+from .queries import ReportQuery, date_range
 
 class CustomReports(ReportingBase):
-    def __init__(self, start_date=None, end_date=None):
+    TRANSACTION_SUMMARY_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(:start_date, 'YYYY-MM-DD') || ' to ' || TO_CHAR(:end_date, 'YYYY-MM-DD') as DATE_RANGE,
+            COUNT(*) as TOTAL_REQUESTS,
+            COUNT(DISTINCT MSISDN) as TOTAL_UNIQUE_USERS,
+            COUNT(DISTINCT TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as DAYS_WITH_ACTIVITY
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON", include_end=True)}
+    """)
+
+    TRANSACTION_SUMMARY_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(:start_date, 'YYYY-MM-DD') || ' to ' || TO_CHAR(:end_date, 'YYYY-MM-DD') as DATE_RANGE,
+            SUM(REQUEST_COUNT) as TOTAL_REQUESTS,
+            COUNT(DISTINCT MSISDN) as TOTAL_UNIQUE_USERS,
+            COUNT(DISTINCT ROLLUP_DAY) as DAYS_WITH_ACTIVITY
+        FROM REPORT_ROLLUP_DAILY_USERS
+        WHERE {date_range("ROLLUP_DAY", include_end=True)}
+    """)
+
+    # Unique users come from the daily sketches, see get_transaction_summary
+    TRANSACTION_SUMMARY_APPROXIMATE_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(:start_date, 'YYYY-MM-DD') || ' to ' || TO_CHAR(:end_date, 'YYYY-MM-DD') as DATE_RANGE,
+            NVL(SUM(REQUEST_COUNT), 0) as TOTAL_REQUESTS,
+            COUNT(DISTINCT TRUNC(ROLLUP_HOUR)) as DAYS_WITH_ACTIVITY
+        FROM REPORT_ROLLUP_HOURLY
+        WHERE {date_range("ROLLUP_HOUR", include_end=True)}
+        AND REQUEST_COUNT > 0
+    """)
+
+    REQUEST_TYPE_BREAKDOWN_QUERY = ReportQuery(f"""
+        SELECT
+            REQUEST_TYPE,
+            COUNT(*) as REQUEST_COUNT,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS,
+            ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(), 2) as PERCENTAGE
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON", include_end=True)}
+        GROUP BY REQUEST_TYPE
+        ORDER BY REQUEST_COUNT DESC
+    """)
+
+    REQUEST_TYPE_BREAKDOWN_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            REQUEST_TYPE,
+            SUM(REQUEST_COUNT) as REQUEST_COUNT,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS,
+            ROUND(SUM(REQUEST_COUNT) * 100.0 / SUM(SUM(REQUEST_COUNT)) OVER(), 2) as PERCENTAGE
+        FROM REPORT_ROLLUP_DAILY_USERS
+        WHERE {date_range("ROLLUP_DAY", include_end=True)}
+        GROUP BY REQUEST_TYPE
+        ORDER BY REQUEST_COUNT DESC
+    """)
+
+    REQUEST_TYPE_BREAKDOWN_APPROXIMATE_QUERY = ReportQuery(f"""
+        SELECT
+            REQUEST_TYPE,
+            SUM(REQUEST_COUNT) as REQUEST_COUNT,
+            ROUND(SUM(REQUEST_COUNT) * 100.0 / SUM(SUM(REQUEST_COUNT)) OVER(), 2) as PERCENTAGE
+        FROM REPORT_ROLLUP_HOURLY
+        WHERE {date_range("ROLLUP_HOUR", include_end=True)}
+        AND REQUEST_COUNT > 0
+        GROUP BY REQUEST_TYPE
+        ORDER BY REQUEST_COUNT DESC
+    """)
+
+    DAILY_ACTIVITY_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(CREATED_ON, 'YYYY-MM-DD') as ACTIVITY_DATE,
+            COUNT(*) as TOTAL_REQUESTS,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS,
+            SUM(CASE WHEN REQUEST_TYPE = 'AIRTIME_TRANSFER' THEN 1 ELSE 0 END) as AIRTIME_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'BUNDLE_PURCHASE' THEN 1 ELSE 0 END) as BUNDLE_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'CALL_RECORDS' THEN 1 ELSE 0 END) as CALL_RECORD_REQUESTS
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON", include_end=True)}
+        GROUP BY TO_CHAR(CREATED_ON, 'YYYY-MM-DD')
+        ORDER BY ACTIVITY_DATE
+    """)
+
+    DAILY_ACTIVITY_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(ROLLUP_DAY, 'YYYY-MM-DD') as ACTIVITY_DATE,
+            SUM(REQUEST_COUNT) as TOTAL_REQUESTS,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS,
+            SUM(CASE WHEN REQUEST_TYPE = 'AIRTIME_TRANSFER' THEN REQUEST_COUNT ELSE 0 END) as AIRTIME_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'BUNDLE_PURCHASE' THEN REQUEST_COUNT ELSE 0 END) as BUNDLE_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'CALL_RECORDS' THEN REQUEST_COUNT ELSE 0 END) as CALL_RECORD_REQUESTS
+        FROM REPORT_ROLLUP_DAILY_USERS
+        WHERE {date_range("ROLLUP_DAY", include_end=True)}
+        GROUP BY TO_CHAR(ROLLUP_DAY, 'YYYY-MM-DD')
+        ORDER BY ACTIVITY_DATE
+    """)
+
+    DAILY_ACTIVITY_APPROXIMATE_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(ROLLUP_HOUR, 'YYYY-MM-DD') as ACTIVITY_DATE,
+            SUM(REQUEST_COUNT) as TOTAL_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'AIRTIME_TRANSFER' THEN REQUEST_COUNT ELSE 0 END) as AIRTIME_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'BUNDLE_PURCHASE' THEN REQUEST_COUNT ELSE 0 END) as BUNDLE_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'CALL_RECORDS' THEN REQUEST_COUNT ELSE 0 END) as CALL_RECORD_REQUESTS
+        FROM REPORT_ROLLUP_HOURLY
+        WHERE {date_range("ROLLUP_HOUR", include_end=True)}
+        AND REQUEST_COUNT > 0
+        GROUP BY TO_CHAR(ROLLUP_HOUR, 'YYYY-MM-DD')
+        ORDER BY ACTIVITY_DATE
+    """)
+
+    def __init__(self, start_date=None, end_date=None, use_rollups=None, approximate=None):
         """
         Initialize custom report with specific date range
         
         Args:
             start_date: Start date for reporting (inclusive)
             end_date: End date for reporting (exclusive)
+            use_rollups: Read the report rollups instead of raw requests, defaults to REPORT_USE_ROLLUPS
+            approximate: Estimate unique users from the daily sketches, defaults to REPORT_APPROXIMATE_USERS
         """
-        super().__init__()
+        super().__init__(use_rollups, approximate)
         
         if not start_date:
             raise ValueError("Start date is required for custom reports")
@@ -32,49 +144,46 @@ class CustomReports(ReportingBase):
     
     def get_transaction_summary(self):
         """Generate transaction summary for the custom date range"""
-        query = f"""
-            SELECT
-                TO_CHAR(TO_DATE('{self.start_date.strftime("%Y-%m-%d")}', 'YYYY-MM-DD'), 'YYYY-MM-DD') || ' to ' ||
-                TO_CHAR(TO_DATE('{self.end_date.strftime("%Y-%m-%d")}', 'YYYY-MM-DD'), 'YYYY-MM-DD') as DATE_RANGE,
-                COUNT(*) as TOTAL_REQUESTS,
-                COUNT(DISTINCT MSISDN) as TOTAL_UNIQUE_USERS,
-                COUNT(DISTINCT TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as DAYS_WITH_ACTIVITY
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON <= TO_TIMESTAMP('{self.end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-        """
-        return self.execute_query(query)
+        if not self.approximate:
+            return self.run_query(self.TRANSACTION_SUMMARY_ROLLUP_QUERY if self.use_rollups
+                                  else self.TRANSACTION_SUMMARY_QUERY)
+
+        unique_users = self.estimate_unique_users(self.start_date, self.end_date, include_end=True)
+        return [{
+            "DATE_RANGE": row["DATE_RANGE"],
+            "TOTAL_REQUESTS": row["TOTAL_REQUESTS"],
+            "TOTAL_UNIQUE_USERS": unique_users.get(None, 0),
+            "DAYS_WITH_ACTIVITY": row["DAYS_WITH_ACTIVITY"]
+        } for row in self.run_query(self.TRANSACTION_SUMMARY_APPROXIMATE_QUERY)]
     
     def get_request_type_breakdown(self):
         """Get breakdown of request types for the custom date range"""
-        query = f"""
-            SELECT
-                REQUEST_TYPE,
-                COUNT(*) as REQUEST_COUNT,
-                COUNT(DISTINCT MSISDN) as UNIQUE_USERS,
-                ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER(), 2) as PERCENTAGE
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON <= TO_TIMESTAMP('{self.end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            GROUP BY REQUEST_TYPE
-            ORDER BY REQUEST_COUNT DESC
-        """
-        return self.execute_query(query)
+        if not self.approximate:
+            return self.run_query(self.REQUEST_TYPE_BREAKDOWN_ROLLUP_QUERY if self.use_rollups
+                                  else self.REQUEST_TYPE_BREAKDOWN_QUERY)
+
+        unique_users = self.estimate_unique_users(self.start_date, self.end_date, include_end=True,
+                                                  group_by=lambda rollup_day, request_type: request_type)
+        return [{
+            "REQUEST_TYPE": row["REQUEST_TYPE"],
+            "REQUEST_COUNT": row["REQUEST_COUNT"],
+            "UNIQUE_USERS": unique_users.get(row["REQUEST_TYPE"], 0),
+            "PERCENTAGE": row["PERCENTAGE"]
+        } for row in self.run_query(self.REQUEST_TYPE_BREAKDOWN_APPROXIMATE_QUERY)]
     
     def get_daily_activity(self):
         """Get daily activity for the custom date range"""
-        query = f"""
-            SELECT
-                TO_CHAR(CREATED_ON, 'YYYY-MM-DD') as ACTIVITY_DATE,
-                COUNT(*) as TOTAL_REQUESTS,
-                COUNT(DISTINCT MSISDN) as UNIQUE_USERS,
-                SUM(CASE WHEN REQUEST_TYPE = 'AIRTIME_TRANSFER' THEN 1 ELSE 0 END) as AIRTIME_REQUESTS,
-                SUM(CASE WHEN REQUEST_TYPE = 'BUNDLE_PURCHASE' THEN 1 ELSE 0 END) as BUNDLE_REQUESTS,
-                SUM(CASE WHEN REQUEST_TYPE = 'CALL_RECORDS' THEN 1 ELSE 0 END) as CALL_RECORD_REQUESTS
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON <= TO_TIMESTAMP('{self.end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            GROUP BY TO_CHAR(CREATED_ON, 'YYYY-MM-DD')
-            ORDER BY ACTIVITY_DATE
-        """
-        return self.execute_query(query)
\ No newline at end of file
+        if not self.approximate:
+            return self.run_query(self.DAILY_ACTIVITY_ROLLUP_QUERY if self.use_rollups
+                                  else self.DAILY_ACTIVITY_QUERY)
+
+        unique_users = self.estimate_unique_users(self.start_date, self.end_date, include_end=True,
+                                                  group_by=lambda rollup_day, request_type: rollup_day.strftime("%Y-%m-%d"))
+        return [{
+            "ACTIVITY_DATE": row["ACTIVITY_DATE"],
+            "TOTAL_REQUESTS": row["TOTAL_REQUESTS"],
+            "UNIQUE_USERS": unique_users.get(row["ACTIVITY_DATE"], 0),
+            "AIRTIME_REQUESTS": row["AIRTIME_REQUESTS"],
+            "BUNDLE_REQUESTS": row["BUNDLE_REQUESTS"],
+            "CALL_RECORD_REQUESTS": row["CALL_RECORD_REQUESTS"]
+        } for row in self.run_query(self.DAILY_ACTIVITY_APPROXIMATE_QUERY)]
@@ -1,58 +1,83 @@
 from datetime import datetime
 from .utils import ReportingBase
+from .queries import ReportQuery, date_range
 
 class DailyReports(ReportingBase):
-    def __init__(self, report_date=None):
-        super().__init__()
+    REQUEST_SUMMARY_QUERY = ReportQuery(f"""
+        SELECT
+            REQUEST_TYPE,
+            COUNT(*) as REQUEST_COUNT,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON")}
+        GROUP BY REQUEST_TYPE
+        ORDER BY REQUEST_COUNT DESC
+    """)
+
+    REQUEST_SUMMARY_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            REQUEST_TYPE,
+            SUM(REQUEST_COUNT) as REQUEST_COUNT,
+            COUNT(*) as UNIQUE_USERS
+        FROM REPORT_ROLLUP_DAILY_USERS
+        WHERE {date_range("ROLLUP_DAY")}
+        GROUP BY REQUEST_TYPE
+        ORDER BY REQUEST_COUNT DESC
+    """)
+
+    HOURLY_DISTRIBUTION_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(CREATED_ON, 'HH24') as HOUR_OF_DAY,
+            REQUEST_TYPE,
+            COUNT(*) as REQUEST_COUNT
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON")}
+        GROUP BY TO_CHAR(CREATED_ON, 'HH24'), REQUEST_TYPE
+        ORDER BY HOUR_OF_DAY, REQUEST_TYPE
+    """)
+
+    HOURLY_DISTRIBUTION_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(ROLLUP_HOUR, 'HH24') as HOUR_OF_DAY,
+            REQUEST_TYPE,
+            SUM(REQUEST_COUNT) as REQUEST_COUNT
+        FROM REPORT_ROLLUP_HOURLY
+        WHERE {date_range("ROLLUP_HOUR")}
+        AND REQUEST_COUNT > 0
+        GROUP BY TO_CHAR(ROLLUP_HOUR, 'HH24'), REQUEST_TYPE
+        ORDER BY HOUR_OF_DAY, REQUEST_TYPE
+    """)
+
+    def __init__(self, report_date=None, use_rollups=None, approximate=None):
+        super().__init__(use_rollups, approximate)
         self.report_date = report_date or datetime.now()
         # Make sure we pass the interval_type parameter
         self.start_date, self.end_date = self.get_date_range('daily', self.report_date)
-    
+
     def get_request_summary(self):
         """Get summary of requests by type for the day"""
-        query = f"""
-            SELECT 
-                REQUEST_TYPE, 
-                COUNT(*) as REQUEST_COUNT,
-                COUNT(DISTINCT MSISDN) as UNIQUE_USERS
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON < TO_TIMESTAMP('{self.end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            GROUP BY REQUEST_TYPE
-            ORDER BY REQUEST_COUNT DESC
-        """
-        return self.execute_query(query)
-    
+        return self.run_query(self.REQUEST_SUMMARY_ROLLUP_QUERY if self.use_rollups else self.REQUEST_SUMMARY_QUERY)
+
     def get_hourly_distribution(self):
         """Get hourly distribution of requests"""
-        query = f"""
-            SELECT 
-                TO_CHAR(CREATED_ON, 'HH24') as HOUR_OF_DAY,
-                REQUEST_TYPE,
-                COUNT(*) as REQUEST_COUNT
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON < TO_TIMESTAMP('{self.end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            GROUP BY TO_CHAR(CREATED_ON, 'HH24'), REQUEST_TYPE
-            ORDER BY HOUR_OF_DAY, REQUEST_TYPE
-        """
-        return self.execute_query(query)
-    
+        return self.run_query(self.HOURLY_DISTRIBUTION_ROLLUP_QUERY if self.use_rollups
+                              else self.HOURLY_DISTRIBUTION_QUERY)
+
     def generate_daily_report(self):
         """Generate and export all daily reports to CSV files"""
         date_str = self.report_date.strftime("%Y-%m-%d")
-        
+
         # Generate summary report
         summary_data = self.get_request_summary()
         summary_file = f"daily_summary_{date_str}.csv"
         self.export_to_csv(summary_data, summary_file)
-        
+
         # Generate hourly distribution report
         hourly_data = self.get_hourly_distribution()
         hourly_file = f"daily_hourly_distribution_{date_str}.csv"
         self.export_to_csv(hourly_data, hourly_file)
-        
+
         return {
             "summary": summary_file,
             "hourly_distribution": hourly_file,
-        }
\ No newline at end of file
+        }
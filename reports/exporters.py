@@ -1,16 +1,38 @@
 import os
 import csv
 import json
+import time
 import logging
+from dataclasses import dataclass, field
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from resources.utilities.database.oracle import exadata_db
 from .utils import ReportingBase
 
+# report queries run at once by export_reports, never more than the connection pool holds
+REPORT_MAX_WORKERS = int(os.environ.get("REPORT_MAX_WORKERS", 4))
+
+
+@dataclass(frozen=True)
+class ReportJob:
+    """A report query and the CSV file its rows are exported to"""
+    report: object
+    method_name: str
+    filename: str
+    report_type: str = None
+    kwargs: dict = field(default_factory=dict)
+
+
 class ReportExporter(ReportingBase):
     """Export report data to various formats"""
     
     def __init__(self):
         super().__init__()
         self.logger = logging.getLogger(__name__)
+        # rows, seconds and rows/sec of the most recent CSV/JSON export
+        self.last_export_stats = None
+        # per-query timings of the most recent export_reports run
+        self.last_run_timings = []
     
     def export_to_csv(self, data, filename, report_type=None):
         """
@@ -28,31 +50,114 @@ class ReportExporter(ReportingBase):
             self.logger.warning(f"No data to export for {filename}")
             return None
             
+        return self.stream_to_csv(iter(data), filename, report_type)
+    
+    def stream_to_csv(self, rows, filename, report_type=None):
+        """
+        Export rows to a CSV file as they are produced, e.g. from ReportingBase.stream_query
+        
+        Args:
+            rows: Iterable of dictionaries, consumed once
+            filename: Base filename without extension
+            report_type: Optional subfolder name
+            
+        Returns:
+            str: Path to the created CSV file
+        """
+        self.last_export_stats = self._stream_export(rows, filename, report_type, "csv", self._write_csv_rows)
+        return self.last_export_stats["path"] if self.last_export_stats else None
+    
+    def stream_to_json(self, rows, filename, report_type=None):
+        """
+        Export rows to a JSON array file as they are produced, e.g. from ReportingBase.stream_query
+        
+        Args:
+            rows: Iterable of dictionaries, consumed once
+            filename: Base filename without extension
+            report_type: Optional subfolder name
+            
+        Returns:
+            str: Path to the created JSON file
+        """
+        self.last_export_stats = self._stream_export(rows, filename, report_type, "json", self._write_json_rows)
+        return self.last_export_stats["path"] if self.last_export_stats else None
+    
+    @staticmethod
+    def _write_csv_rows(outfile, first_row, rows):
+        # Get fields from first row
+        writer = csv.DictWriter(outfile, fieldnames=first_row.keys())
+        writer.writeheader()
+        writer.writerow(first_row)
+        count = 1
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+    
+    @staticmethod
+    def _write_json_rows(outfile, first_row, rows):
+        outfile.write("[\n    ")
+        outfile.write(json.dumps(first_row, default=str))
+        count = 1
+        for row in rows:
+            outfile.write(",\n    ")
+            outfile.write(json.dumps(row, default=str))
+            count += 1
+        outfile.write("\n]\n")
+        return count
+    
+    def _stream_export(self, rows, filename, report_type, extension, write_rows):
+        """
+        Open the export file, hand the rows to write_rows and log the export rate
+        
+        Returns:
+            dict: path, rows, seconds and rows_per_sec of the export, None if nothing was written
+        """
+        rows = iter(rows)
+        start = time.perf_counter()
+        try:
+            first_row = next(rows, None)
+        except Exception as e:
+            self.logger.error(f"Error exporting data to {extension.upper()}: {str(e)}")
+            return None
+        
+        if first_row is None:
+            self.logger.warning(f"No data to export for {filename}")
+            return None
+            
         # Ensure directory exists
         output_dir = self.ensure_reports_directory(report_type)
         
         # Add timestamp to filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        full_filename = f"{filename}_{timestamp}.csv"
+        full_filename = f"{filename}_{timestamp}.{extension}"
         file_path = os.path.join(output_dir, full_filename)
         
         try:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                # Get fields from first row
-                fieldnames = data[0].keys()
-                
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                writer.writeheader()
+            with open(file_path, 'w', newline='', encoding='utf-8') as outfile:
+                count = write_rows(outfile, first_row, rows)
                 
-                for row in data:
-                    writer.writerow(row)
-                    
-            self.logger.info(f"Successfully exported {len(data)} rows to {file_path}")
-            return file_path
-            
         except Exception as e:
-            self.logger.error(f"Error exporting data to CSV: {str(e)}")
+            self.logger.error(f"Error exporting data to {extension.upper()}: {str(e)}")
+            # Don't leave a truncated export behind
+            if os.path.exists(file_path):
+                os.remove(file_path)
             return None
+        finally:
+            # Release the database connection held by an unfinished query stream
+            if hasattr(rows, 'close'):
+                rows.close()
+        
+        elapsed = time.perf_counter() - start
+        rows_per_sec = count / elapsed if elapsed > 0 else float(count)
+        self.logger.info(f"Successfully exported {count} rows to {file_path} "
+                         f"in {elapsed:.2f}s ({rows_per_sec:.0f} rows/sec)")
+        return {
+            "path": file_path,
+            "rows": count,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(rows_per_sec, 1)
+        }
     
     def export_to_json(self, data, filename, report_type=None):
         """
@@ -89,7 +194,7 @@ class ReportExporter(ReportingBase):
             self.logger.error(f"Error exporting data to JSON: {str(e)}")
             return None
     
-    def export_full_report(self, report_obj, report_name, report_type):
+    def export_full_report(self, report_obj, report_name, report_type, max_workers=None):
         """
         Export all available reports from a report object
         
@@ -97,35 +202,83 @@ class ReportExporter(ReportingBase):
             report_obj: Report object (WeeklyReports, MonthlyReports, etc.)
             report_name: Base name for the report files
             report_type: Type of report (weekly, monthly, etc.)
+            max_workers: Queries to run at once, defaults to REPORT_MAX_WORKERS
             
         Returns:
             dict: Mapping of report method names to export file paths
         """
-        results = {}
+        jobs = self.full_report_jobs(report_obj, report_name, report_type)
+        results = self.export_reports(jobs, max_workers)
+        return {job.method_name: results[job.filename] for job in jobs if job.filename in results}
+    
+    @staticmethod
+    def full_report_jobs(report_obj, report_name, report_type):
+        """
+        One job per report query of a report object, i.e. every get_ method it adds to ReportingBase
         
-        # Get all methods in the report object that start with "get_"
-        report_methods = [method for method in dir(report_obj) 
-                          if method.startswith('get_') and callable(getattr(report_obj, method))]
+        Returns:
+            list: ReportJob per query
+        """
+        report_methods = [method for method in dir(report_obj)
+                          if method.startswith('get_') and not hasattr(ReportingBase, method)
+                          and callable(getattr(report_obj, method))]
         
-        for method_name in report_methods:
-            try:
-                # Call the method to get the report data
-                method = getattr(report_obj, method_name)
-                report_data = method()
-                
-                # Skip empty results
-                if not report_data:
-                    self.logger.warning(f"No data returned from {method_name}")
-                    continue
-                
-                # Export the data to CSV
-                filename = f"{report_name}_{method_name[4:]}"  # Remove 'get_' prefix
-                csv_path = self.export_to_csv(report_data, filename, report_type)
+        # Remove 'get_' prefix for the file name
+        return [ReportJob(report_obj, method_name, f"{report_name}_{method_name[4:]}", report_type)
+                for method_name in report_methods]
+    
+    def export_reports(self, jobs, max_workers=None):
+        """
+        Run report queries and export each result to CSV, several at a time on the shared connection pool
+        
+        Args:
+            jobs: List of ReportJob, independent of each other
+            max_workers: Queries to run at once, defaults to REPORT_MAX_WORKERS. Capped at the
+                connection pool size so workers never queue for a connection.
+            
+        Returns:
+            dict: Mapping of job file names to export file paths, for the jobs that produced a file
+        """
+        max_workers = max(1, min(max_workers or REPORT_MAX_WORKERS, exadata_db.pool_config["max"], len(jobs) or 1))
+        start = time.perf_counter()
+        
+        if max_workers == 1:
+            timings = [self._run_job(job) for job in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report") as executor:
+                timings = list(executor.map(self._run_job, jobs))
+        
+        self.last_run_timings = timings
+        results = {timing["report"]: timing["path"] for timing in timings if timing["path"]}
+        self.logger.info(f"Exported {len(results)} of {len(jobs)} reports in "
+                         f"{time.perf_counter() - start:.2f}s with {max_workers} workers")
+        return results
+    
+    def _run_job(self, job):
+        """
+        Run one report query and export its rows
+        
+        Returns:
+            dict: report, path, rows, query_seconds and total_seconds of the job
+        """
+        timing = {"report": job.filename, "path": None, "rows": 0, "query_seconds": 0.0, "total_seconds": 0.0}
+        start = time.perf_counter()
+        try:
+            # Call the method to get the report data, streamed queries are timed with the export
+            report_data = getattr(job.report, job.method_name)(**job.kwargs)
+            timing["query_seconds"] = round(time.perf_counter() - start, 3)
+            
+            stats = self._stream_export(report_data or [], job.filename, job.report_type, "csv",
+                                        self._write_csv_rows)
+            if stats:
+                timing.update(path=stats["path"], rows=stats["rows"])
+            else:
+                self.logger.warning(f"No data returned from {job.method_name}")
                 
-                if csv_path:
-                    results[method_name] = csv_path
-                    
-            except Exception as e:
-                self.logger.error(f"Error generating report {method_name}: {str(e)}")
+        except Exception as e:
+            self.logger.error(f"Error generating report {job.method_name}: {str(e)}")
         
-        return results
\ No newline at end of file
+        timing["total_seconds"] = round(time.perf_counter() - start, 3)
+        self.logger.info(f"Report {job.filename}: {timing['rows']} rows, query {timing['query_seconds']:.2f}s, "
+                         f"total {timing['total_seconds']:.2f}s")
+        return timing
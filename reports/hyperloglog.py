@@ -0,0 +1,79 @@
+"""
+HyperLogLog sketches for approximate unique-user counts in the reports.
+
+A sketch of 2^p one-byte registers estimates the number of distinct MSISDNs added to it with a relative standard
+error of 1.04 / sqrt(2^p). At the default precision of 14 (16 KB per sketch) that is 0.81%: about 68% of estimates are
+within 0.81% of the exact count, 95% within 1.6% and 99.7% within 2.4%. Counts below 2.5 * 2^p (about 40,000) use
+linear counting and are closer still. Sketches merge losslessly (register-wise max), so one sketch per day and
+request type answers the unique users of any range of days and types.
+"""
+import math
+import hashlib
+
+HLL_PRECISION = 14
+
+# 2^-rank for every possible register value
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+class HyperLogLog:
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: bytes = None):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 16, got {precision}")
+        self.precision = precision
+        if registers is None:
+            self.registers = bytearray(1 << precision)
+        elif len(registers) == 1 << precision:
+            self.registers = bytearray(registers)
+        else:
+            raise ValueError(f"Expected {1 << precision} registers, got {len(registers)}")
+
+    @classmethod
+    def from_bytes(cls, registers: bytes):
+        """
+        Sketch stored with to_bytes, the precision follows from its size
+        :return: HyperLogLog
+        """
+        return cls(precision=len(registers).bit_length() - 1, registers=registers)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value: str):
+        __hash = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+        __index = __hash >> (64 - self.precision)
+        # rank: position of the first 1 bit in the remaining 64 - p bits
+        __rank = 64 - self.precision - (__hash & ((1 << (64 - self.precision)) - 1)).bit_length() + 1
+        if __rank > self.registers[__index]:
+            self.registers[__index] = __rank
+
+    def update(self, values):
+        for __value in values:
+            self.add(__value)
+        return self
+
+    def merge(self, other):
+        """
+        Fold another sketch of the same precision into this one, the result counts the union of both
+        :return: HyperLogLog
+        """
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.precision} and {other.precision}")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        """
+        :return: int, estimated number of distinct values added
+        """
+        __m = len(self.registers)
+        __alpha = 0.7213 / (1 + 1.079 / __m)
+        __estimate = __alpha * __m * __m / sum(_INVERSE_POWERS[__rank] for __rank in self.registers)
+        if __estimate <= 2.5 * __m:
+            __zeros = self.registers.count(0)
+            if __zeros:
+                # small range: linear counting
+                __estimate = __m * math.log(__m / __zeros)
+        return int(round(__estimate))
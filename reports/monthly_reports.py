@@ -1,86 +1,180 @@
 from datetime import datetime, timedelta
 from .utils import ReportingBase
+from .queries import ReportQuery, date_range
 
 class MonthlyReports(ReportingBase):
-    def __init__(self, report_date=None):
-        super().__init__()
+    WEEKLY_TREND_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(CREATED_ON, 'YYYY-IW') as YEAR_WEEK,
+            TO_CHAR(MIN(CREATED_ON), 'YYYY-MM-DD') as WEEK_START_DATE,
+            TO_CHAR(MAX(CREATED_ON), 'YYYY-MM-DD') as WEEK_END_DATE,
+            REQUEST_TYPE,
+            COUNT(*) as REQUEST_COUNT,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON")}
+        GROUP BY TO_CHAR(CREATED_ON, 'YYYY-IW'), REQUEST_TYPE
+        ORDER BY YEAR_WEEK, REQUEST_TYPE
+    """)
+
+    WEEKLY_TREND_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(ROLLUP_DAY, 'YYYY-IW') as YEAR_WEEK,
+            TO_CHAR(MIN(ROLLUP_DAY), 'YYYY-MM-DD') as WEEK_START_DATE,
+            TO_CHAR(MAX(ROLLUP_DAY), 'YYYY-MM-DD') as WEEK_END_DATE,
+            REQUEST_TYPE,
+            SUM(REQUEST_COUNT) as REQUEST_COUNT,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS
+        FROM REPORT_ROLLUP_DAILY_USERS
+        WHERE {date_range("ROLLUP_DAY")}
+        GROUP BY TO_CHAR(ROLLUP_DAY, 'YYYY-IW'), REQUEST_TYPE
+        ORDER BY YEAR_WEEK, REQUEST_TYPE
+    """)
+
+    USER_RETENTION_QUERY = ReportQuery(f"""
+        WITH FirstUsage AS (
+            SELECT
+                MSISDN,
+                MIN(TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as FIRST_USAGE_DATE
+            FROM TRANSACTION_REQUESTS
+            WHERE CREATED_ON < :query_end_date
+            GROUP BY MSISDN
+        ),
+        CurrentMonthUsers AS (
+            SELECT DISTINCT
+                MSISDN
+            FROM TRANSACTION_REQUESTS
+            WHERE {date_range("CREATED_ON")}
+        )
+        SELECT
+            'New Users' as USER_TYPE,
+            COUNT(*) as USER_COUNT
+        FROM FirstUsage f
+        JOIN CurrentMonthUsers c ON f.MSISDN = c.MSISDN
+        WHERE TO_DATE(f.FIRST_USAGE_DATE, 'YYYY-MM-DD') >= :start_date
+
+        UNION ALL
+
+        SELECT
+            'Returning Users' as USER_TYPE,
+            COUNT(*) as USER_COUNT
+        FROM FirstUsage f
+        JOIN CurrentMonthUsers c ON f.MSISDN = c.MSISDN
+        WHERE TO_DATE(f.FIRST_USAGE_DATE, 'YYYY-MM-DD') < :start_date
+    """)
+
+    USER_RETENTION_ROLLUP_QUERY = ReportQuery(f"""
+        WITH FirstUsage AS (
+            SELECT
+                MSISDN,
+                MIN(ROLLUP_DAY) as FIRST_USAGE_DAY
+            FROM REPORT_ROLLUP_DAILY_USERS
+            WHERE ROLLUP_DAY < :query_end_date
+            GROUP BY MSISDN
+        ),
+        CurrentMonthUsers AS (
+            SELECT DISTINCT
+                MSISDN
+            FROM REPORT_ROLLUP_DAILY_USERS
+            WHERE {date_range("ROLLUP_DAY")}
+        )
+        SELECT
+            'New Users' as USER_TYPE,
+            COUNT(*) as USER_COUNT
+        FROM FirstUsage f
+        JOIN CurrentMonthUsers c ON f.MSISDN = c.MSISDN
+        WHERE f.FIRST_USAGE_DAY >= :start_date
+
+        UNION ALL
+
+        SELECT
+            'Returning Users' as USER_TYPE,
+            COUNT(*) as USER_COUNT
+        FROM FirstUsage f
+        JOIN CurrentMonthUsers c ON f.MSISDN = c.MSISDN
+        WHERE f.FIRST_USAGE_DAY < :start_date
+    """)
+
+    MONTHLY_SUMMARY_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(:start_date, 'Month YYYY') as REPORT_MONTH,
+            COUNT(*) as TOTAL_REQUESTS,
+            COUNT(DISTINCT MSISDN) as TOTAL_UNIQUE_USERS,
+            SUM(CASE WHEN REQUEST_TYPE = 'AIRTIME_TRANSFER' THEN 1 ELSE 0 END) as AIRTIME_TRANSFER_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'BUNDLE_PURCHASE' THEN 1 ELSE 0 END) as BUNDLE_PURCHASE_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'CALL_RECORDS' THEN 1 ELSE 0 END) as CALL_RECORDS_REQUESTS,
+            COUNT(DISTINCT TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as ACTIVE_DAYS,
+            ROUND(COUNT(*) / COUNT(DISTINCT TO_CHAR(CREATED_ON, 'YYYY-MM-DD')), 2) as AVG_DAILY_REQUESTS,
+            ROUND(COUNT(DISTINCT MSISDN) / COUNT(DISTINCT TO_CHAR(CREATED_ON, 'YYYY-MM-DD')), 2) as AVG_DAILY_USERS
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON")}
+    """)
+
+    MONTHLY_SUMMARY_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(:start_date, 'Month YYYY') as REPORT_MONTH,
+            SUM(REQUEST_COUNT) as TOTAL_REQUESTS,
+            COUNT(DISTINCT MSISDN) as TOTAL_UNIQUE_USERS,
+            SUM(CASE WHEN REQUEST_TYPE = 'AIRTIME_TRANSFER' THEN REQUEST_COUNT ELSE 0 END) as AIRTIME_TRANSFER_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'BUNDLE_PURCHASE' THEN REQUEST_COUNT ELSE 0 END) as BUNDLE_PURCHASE_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'CALL_RECORDS' THEN REQUEST_COUNT ELSE 0 END) as CALL_RECORDS_REQUESTS,
+            COUNT(DISTINCT ROLLUP_DAY) as ACTIVE_DAYS,
+            ROUND(SUM(REQUEST_COUNT) / NULLIF(COUNT(DISTINCT ROLLUP_DAY), 0), 2) as AVG_DAILY_REQUESTS,
+            ROUND(COUNT(DISTINCT MSISDN) / NULLIF(COUNT(DISTINCT ROLLUP_DAY), 0), 2) as AVG_DAILY_USERS
+        FROM REPORT_ROLLUP_DAILY_USERS
+        WHERE {date_range("ROLLUP_DAY")}
+    """)
+
+    # Unique users come from the daily sketches, see get_monthly_summary
+    MONTHLY_SUMMARY_APPROXIMATE_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(:start_date, 'Month YYYY') as REPORT_MONTH,
+            SUM(REQUEST_COUNT) as TOTAL_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'AIRTIME_TRANSFER' THEN REQUEST_COUNT ELSE 0 END) as AIRTIME_TRANSFER_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'BUNDLE_PURCHASE' THEN REQUEST_COUNT ELSE 0 END) as BUNDLE_PURCHASE_REQUESTS,
+            SUM(CASE WHEN REQUEST_TYPE = 'CALL_RECORDS' THEN REQUEST_COUNT ELSE 0 END) as CALL_RECORDS_REQUESTS,
+            COUNT(DISTINCT TRUNC(ROLLUP_HOUR)) as ACTIVE_DAYS,
+            ROUND(SUM(REQUEST_COUNT) / NULLIF(COUNT(DISTINCT TRUNC(ROLLUP_HOUR)), 0), 2) as AVG_DAILY_REQUESTS
+        FROM REPORT_ROLLUP_HOURLY
+        WHERE {date_range("ROLLUP_HOUR")}
+        AND REQUEST_COUNT > 0
+    """)
+
+    def __init__(self, report_date=None, use_rollups=None, approximate=None):
+        super().__init__(use_rollups, approximate)
         self.report_date = report_date or datetime.now()
         # Make sure we pass the interval_type parameter
         self.start_date, self.end_date = self.get_date_range('monthly', self.report_date)
-        
+
         # Adjust end date for wider data query window if needed
         # This helps find data in test environments
         self.query_end_date = datetime.now() + timedelta(days=365)  # Look ahead a year for test data
-    
+
     def get_weekly_trend(self):
         """Get weekly trend of requests within the month"""
-        query = f"""
-            SELECT 
-                TO_CHAR(CREATED_ON, 'YYYY-IW') as YEAR_WEEK,
-                TO_CHAR(MIN(CREATED_ON), 'YYYY-MM-DD') as WEEK_START_DATE,
-                TO_CHAR(MAX(CREATED_ON), 'YYYY-MM-DD') as WEEK_END_DATE,
-                REQUEST_TYPE,
-                COUNT(*) as REQUEST_COUNT,
-                COUNT(DISTINCT MSISDN) as UNIQUE_USERS
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON < TO_TIMESTAMP('{self.end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            GROUP BY TO_CHAR(CREATED_ON, 'YYYY-IW'), REQUEST_TYPE
-            ORDER BY YEAR_WEEK, REQUEST_TYPE
-        """
-        return self.execute_query(query)
-    
-    def get_user_retention(self):
-        """Calculate user retention metrics for the month"""
-        query = f"""
-            WITH FirstUsage AS (
-                SELECT 
-                    MSISDN,
-                    MIN(TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as FIRST_USAGE_DATE
-                FROM TRANSACTION_REQUESTS
-                WHERE CREATED_ON < TO_TIMESTAMP('{self.query_end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-                GROUP BY MSISDN
-            ),
-            CurrentMonthUsers AS (
-                SELECT DISTINCT
-                    MSISDN
-                FROM TRANSACTION_REQUESTS
-                WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-                AND CREATED_ON < TO_TIMESTAMP('{self.end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            )
-            SELECT
-                'New Users' as USER_TYPE,
-                COUNT(*) as USER_COUNT
-            FROM FirstUsage f
-            JOIN CurrentMonthUsers c ON f.MSISDN = c.MSISDN
-            WHERE TO_DATE(f.FIRST_USAGE_DATE, 'YYYY-MM-DD') >= TO_DATE('{self.start_date.strftime("%Y-%m-%d")}', 'YYYY-MM-DD')
-            
-            UNION ALL
-            
-            SELECT
-                'Returning Users' as USER_TYPE,
-                COUNT(*) as USER_COUNT
-            FROM FirstUsage f
-            JOIN CurrentMonthUsers c ON f.MSISDN = c.MSISDN
-            WHERE TO_DATE(f.FIRST_USAGE_DATE, 'YYYY-MM-DD') < TO_DATE('{self.start_date.strftime("%Y-%m-%d")}', 'YYYY-MM-DD')
-        """
-        return self.execute_query(query)
-    
+        return self.run_query(self.WEEKLY_TREND_ROLLUP_QUERY if self.use_rollups else self.WEEKLY_TREND_QUERY)
+
+    def get_user_retention(self, stream=False):
+        """Calculate user retention metrics for the month, as a row generator when stream is set"""
+        return self.run_query(self.USER_RETENTION_ROLLUP_QUERY if self.use_rollups else self.USER_RETENTION_QUERY,
+                              stream=stream)
+
     def get_monthly_summary(self):
         """Generate comprehensive monthly summary"""
-        query = f"""
-            SELECT
-                TO_CHAR(TO_DATE('{self.start_date.strftime("%Y-%m-%d")}', 'YYYY-MM-DD'), 'Month YYYY') as REPORT_MONTH,
-                COUNT(*) as TOTAL_REQUESTS,
-                COUNT(DISTINCT MSISDN) as TOTAL_UNIQUE_USERS,
-                SUM(CASE WHEN REQUEST_TYPE = 'AIRTIME_TRANSFER' THEN 1 ELSE 0 END) as AIRTIME_TRANSFER_REQUESTS,
-                SUM(CASE WHEN REQUEST_TYPE = 'BUNDLE_PURCHASE' THEN 1 ELSE 0 END) as BUNDLE_PURCHASE_REQUESTS,
-                SUM(CASE WHEN REQUEST_TYPE = 'CALL_RECORDS' THEN 1 ELSE 0 END) as CALL_RECORDS_REQUESTS,
-                COUNT(DISTINCT TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as ACTIVE_DAYS,
-                ROUND(COUNT(*) / COUNT(DISTINCT TO_CHAR(CREATED_ON, 'YYYY-MM-DD')), 2) as AVG_DAILY_REQUESTS,
-                ROUND(COUNT(DISTINCT MSISDN) / COUNT(DISTINCT TO_CHAR(CREATED_ON, 'YYYY-MM-DD')), 2) as AVG_DAILY_USERS
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON < TO_TIMESTAMP('{self.end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-        """
-        return self.execute_query(query)
\ No newline at end of file
+        if not self.approximate:
+            return self.run_query(self.MONTHLY_SUMMARY_ROLLUP_QUERY if self.use_rollups
+                                  else self.MONTHLY_SUMMARY_QUERY)
+
+        unique_users = self.estimate_unique_users(self.start_date, self.end_date).get(None, 0)
+        return [{
+            "REPORT_MONTH": row["REPORT_MONTH"],
+            "TOTAL_REQUESTS": row["TOTAL_REQUESTS"],
+            "TOTAL_UNIQUE_USERS": unique_users,
+            "AIRTIME_TRANSFER_REQUESTS": row["AIRTIME_TRANSFER_REQUESTS"],
+            "BUNDLE_PURCHASE_REQUESTS": row["BUNDLE_PURCHASE_REQUESTS"],
+            "CALL_RECORDS_REQUESTS": row["CALL_RECORDS_REQUESTS"],
+            "ACTIVE_DAYS": row["ACTIVE_DAYS"],
+            "AVG_DAILY_REQUESTS": row["AVG_DAILY_REQUESTS"],
+            # a month without requests still has its summary row, with no active days
+            "AVG_DAILY_USERS": round(unique_users / row["ACTIVE_DAYS"], 2) if row["ACTIVE_DAYS"] else 0
+        } for row in self.run_query(self.MONTHLY_SUMMARY_APPROXIMATE_QUERY)]
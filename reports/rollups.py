@@ -0,0 +1,240 @@
+import os
+import cx_Oracle
+from datetime import timedelta
+from resources.utilities.database.oracle import exadata_db
+from resources.utilities.database.profiler import ProfiledCursor
+from .hyperloglog import HyperLogLog
+from .utils import ReportingBase, REPORT_FETCH_ARRAYSIZE, read_sketch
+
+# requests newer than this are left for the next refresh, so rows still being committed are not skipped
+ROLLUP_SETTLE_SECONDS = int(os.environ.get("ROLLUP_SETTLE_SECONDS", 60))
+# hours of requests rolled up per transaction, bounds the work of a backfill step
+ROLLUP_BATCH_HOURS = int(os.environ.get("ROLLUP_BATCH_HOURS", 24 * 7))
+
+
+class ReportRollups(ReportingBase):
+    """
+    Maintain the REPORT_ROLLUP_* tables (migrations/002_report_rollups.sql, 003_report_rollup_sketches.sql)
+    from TRANSACTION_REQUESTS.
+
+    Each refresh rolls up the requests created between the stored watermark and now minus ROLLUP_SETTLE_SECONDS
+    and moves the watermark forward in the same transaction, so every request is counted exactly once. The first
+    refresh backfills from the oldest request, ROLLUP_BATCH_HOURS at a time.
+    """
+
+    ROLLUP_NAME = "TRANSACTION_REQUESTS"
+
+    LOCK_WATERMARK_QUERY = """
+        SELECT HIGH_WATERMARK FROM REPORT_ROLLUP_WATERMARK WHERE ROLLUP_NAME = :rollup_name FOR UPDATE
+    """
+
+    INSERT_WATERMARK_QUERY = """
+        INSERT INTO REPORT_ROLLUP_WATERMARK (ROLLUP_NAME, HIGH_WATERMARK) VALUES (:rollup_name, NULL)
+    """
+
+    UPDATE_WATERMARK_QUERY = """
+        UPDATE REPORT_ROLLUP_WATERMARK
+        SET HIGH_WATERMARK = :high, UPDATED_ON = SYSTIMESTAMP
+        WHERE ROLLUP_NAME = :rollup_name
+    """
+
+    WATERMARK_QUERY = "SELECT HIGH_WATERMARK FROM REPORT_ROLLUP_WATERMARK WHERE ROLLUP_NAME = :rollup_name"
+
+    # Database clock, CREATED_ON is set with SYSTIMESTAMP
+    SETTLED_UNTIL_QUERY = "SELECT CAST(SYSTIMESTAMP AS DATE) - :settle_seconds / 86400 FROM DUAL"
+
+    FIRST_REQUEST_HOUR_QUERY = "SELECT TRUNC(MIN(CREATED_ON), 'HH') FROM TRANSACTION_REQUESTS"
+
+    MERGE_HOURLY_REQUESTS_QUERY = """
+        MERGE INTO REPORT_ROLLUP_HOURLY h
+        USING (
+            SELECT TRUNC(CREATED_ON, 'HH') as ROLLUP_HOUR, REQUEST_TYPE, COUNT(*) as REQUEST_COUNT
+            FROM TRANSACTION_REQUESTS
+            WHERE CREATED_ON >= :low AND CREATED_ON < :high
+            GROUP BY TRUNC(CREATED_ON, 'HH'), REQUEST_TYPE
+        ) s
+        ON (h.ROLLUP_HOUR = s.ROLLUP_HOUR AND h.REQUEST_TYPE = s.REQUEST_TYPE)
+        WHEN MATCHED THEN UPDATE SET h.REQUEST_COUNT = h.REQUEST_COUNT + s.REQUEST_COUNT
+        WHEN NOT MATCHED THEN INSERT (ROLLUP_HOUR, REQUEST_TYPE, REQUEST_COUNT, PROCESSED_COUNT, PROCESSING_SECONDS)
+            VALUES (s.ROLLUP_HOUR, s.REQUEST_TYPE, s.REQUEST_COUNT, 0, 0)
+    """
+
+    # Processing is rolled up by PROCESSED_ON into the hour the request was created in
+    MERGE_HOURLY_PROCESSING_QUERY = """
+        MERGE INTO REPORT_ROLLUP_HOURLY h
+        USING (
+            SELECT
+                TRUNC(CREATED_ON, 'HH') as ROLLUP_HOUR,
+                REQUEST_TYPE,
+                COUNT(*) as PROCESSED_COUNT,
+                SUM(EXTRACT(SECOND FROM (PROCESSED_ON - CREATED_ON)) +
+                    EXTRACT(MINUTE FROM (PROCESSED_ON - CREATED_ON)) * 60 +
+                    EXTRACT(HOUR FROM (PROCESSED_ON - CREATED_ON)) * 3600 +
+                    EXTRACT(DAY FROM (PROCESSED_ON - CREATED_ON)) * 86400) as PROCESSING_SECONDS
+            FROM TRANSACTION_REQUESTS
+            WHERE PROCESSED_ON >= :low AND PROCESSED_ON < :high
+            GROUP BY TRUNC(CREATED_ON, 'HH'), REQUEST_TYPE
+        ) s
+        ON (h.ROLLUP_HOUR = s.ROLLUP_HOUR AND h.REQUEST_TYPE = s.REQUEST_TYPE)
+        WHEN MATCHED THEN UPDATE SET
+            h.PROCESSED_COUNT = h.PROCESSED_COUNT + s.PROCESSED_COUNT,
+            h.PROCESSING_SECONDS = h.PROCESSING_SECONDS + s.PROCESSING_SECONDS
+        WHEN NOT MATCHED THEN INSERT (ROLLUP_HOUR, REQUEST_TYPE, REQUEST_COUNT, PROCESSED_COUNT, PROCESSING_SECONDS)
+            VALUES (s.ROLLUP_HOUR, s.REQUEST_TYPE, 0, s.PROCESSED_COUNT, s.PROCESSING_SECONDS)
+    """
+
+    MERGE_DAILY_USERS_QUERY = """
+        MERGE INTO REPORT_ROLLUP_DAILY_USERS d
+        USING (
+            SELECT
+                TRUNC(CREATED_ON) as ROLLUP_DAY,
+                REQUEST_TYPE,
+                MSISDN,
+                COUNT(*) as REQUEST_COUNT,
+                MIN(CREATED_ON) as FIRST_REQUEST_ON,
+                MAX(CREATED_ON) as LAST_REQUEST_ON
+            FROM TRANSACTION_REQUESTS
+            WHERE CREATED_ON >= :low AND CREATED_ON < :high
+            GROUP BY TRUNC(CREATED_ON), REQUEST_TYPE, MSISDN
+        ) s
+        ON (d.ROLLUP_DAY = s.ROLLUP_DAY AND d.REQUEST_TYPE = s.REQUEST_TYPE AND d.MSISDN = s.MSISDN)
+        WHEN MATCHED THEN UPDATE SET
+            d.REQUEST_COUNT = d.REQUEST_COUNT + s.REQUEST_COUNT,
+            d.FIRST_REQUEST_ON = LEAST(d.FIRST_REQUEST_ON, s.FIRST_REQUEST_ON),
+            d.LAST_REQUEST_ON = GREATEST(d.LAST_REQUEST_ON, s.LAST_REQUEST_ON)
+        WHEN NOT MATCHED THEN INSERT (ROLLUP_DAY, REQUEST_TYPE, MSISDN, REQUEST_COUNT, FIRST_REQUEST_ON, LAST_REQUEST_ON)
+            VALUES (s.ROLLUP_DAY, s.REQUEST_TYPE, s.MSISDN, s.REQUEST_COUNT, s.FIRST_REQUEST_ON, s.LAST_REQUEST_ON)
+    """
+
+    ROLLUP_QUERIES = (MERGE_HOURLY_REQUESTS_QUERY, MERGE_HOURLY_PROCESSING_QUERY, MERGE_DAILY_USERS_QUERY)
+
+    # Subscribers of the batch per day and request type, added to that day's sketch. Adding a subscriber
+    # already in the sketch changes nothing, so only the new requests are read.
+    BATCH_USERS_QUERY = """
+        SELECT TRUNC(CREATED_ON) as ROLLUP_DAY, REQUEST_TYPE, MSISDN
+        FROM TRANSACTION_REQUESTS
+        WHERE CREATED_ON >= :low AND CREATED_ON < :high
+        GROUP BY TRUNC(CREATED_ON), REQUEST_TYPE, MSISDN
+    """
+
+    BATCH_SKETCHES_QUERY = """
+        SELECT ROLLUP_DAY, REQUEST_TYPE, SKETCH
+        FROM REPORT_ROLLUP_DAILY_SKETCH
+        WHERE ROLLUP_DAY >= TRUNC(:low) AND ROLLUP_DAY < :high
+    """
+
+    MERGE_SKETCH_QUERY = """
+        MERGE INTO REPORT_ROLLUP_DAILY_SKETCH d
+        USING (SELECT :rollup_day as ROLLUP_DAY, :request_type as REQUEST_TYPE FROM DUAL) s
+        ON (d.ROLLUP_DAY = s.ROLLUP_DAY AND d.REQUEST_TYPE = s.REQUEST_TYPE)
+        WHEN MATCHED THEN UPDATE SET d.SKETCH = :sketch
+        WHEN NOT MATCHED THEN INSERT (ROLLUP_DAY, REQUEST_TYPE, SKETCH) VALUES (s.ROLLUP_DAY, s.REQUEST_TYPE, :sketch)
+    """
+
+    def get_watermark(self):
+        """
+        Returns:
+            datetime: End of the rolled up requests, None before the first refresh
+        """
+        with exadata_db.connection() as conn:
+            cursor = ProfiledCursor(conn.cursor())
+            try:
+                cursor.execute(self.WATERMARK_QUERY, rollup_name=self.ROLLUP_NAME)
+                row = cursor.fetchone()
+                return row[0] if row else None
+            finally:
+                cursor.close()
+
+    def update_sketches(self, cursor, low, high):
+        """
+        Add the subscribers of the requests created in [low, high) to the sketch of their day and request type
+        
+        Returns:
+            int: Number of sketches written
+        """
+        sketches = {}
+        cursor.execute(self.BATCH_SKETCHES_QUERY, low=low, high=high)
+        for rollup_day, request_type, sketch in cursor.fetchall():
+            sketches[(rollup_day, request_type)] = HyperLogLog.from_bytes(read_sketch(sketch))
+        
+        cursor.arraysize = REPORT_FETCH_ARRAYSIZE
+        cursor.execute(self.BATCH_USERS_QUERY, low=low, high=high)
+        touched = set()
+        while True:
+            rows = cursor.fetchmany(REPORT_FETCH_ARRAYSIZE)
+            if not rows:
+                break
+            for rollup_day, request_type, msisdn in rows:
+                key = (rollup_day, request_type)
+                if key not in sketches:
+                    sketches[key] = HyperLogLog()
+                sketches[key].add(msisdn)
+                touched.add(key)
+        
+        if touched:
+            cursor.setinputsizes(sketch=cx_Oracle.BLOB)
+            cursor.executemany(self.MERGE_SKETCH_QUERY, [
+                {"rollup_day": rollup_day, "request_type": request_type,
+                 "sketch": sketches[(rollup_day, request_type)].to_bytes()}
+                for rollup_day, request_type in touched
+            ])
+        return len(touched)
+
+    def refresh(self, upto=None):
+        """
+        Roll up the requests created since the watermark
+
+        Args:
+            upto: Roll up until this time, defaults to the database time minus ROLLUP_SETTLE_SECONDS
+
+        Returns:
+            dict: watermark after the refresh and the number of batches committed
+        """
+        batches = 0
+        watermark = None
+        while True:
+            with exadata_db.connection() as conn:
+                cursor = ProfiledCursor(conn.cursor())
+                try:
+                    # Lock the watermark row, a concurrent refresh waits and then continues from our watermark
+                    cursor.execute(self.LOCK_WATERMARK_QUERY, rollup_name=self.ROLLUP_NAME)
+                    row = cursor.fetchone()
+                    if row is None:
+                        cursor.execute(self.INSERT_WATERMARK_QUERY, rollup_name=self.ROLLUP_NAME)
+                    watermark = row[0] if row else None
+
+                    if upto is None:
+                        cursor.execute(self.SETTLED_UNTIL_QUERY, settle_seconds=ROLLUP_SETTLE_SECONDS)
+                        upto = cursor.fetchone()[0]
+
+                    low = watermark
+                    if low is None:
+                        # First refresh, backfill from the oldest request
+                        cursor.execute(self.FIRST_REQUEST_HOUR_QUERY)
+                        low = cursor.fetchone()[0]
+
+                    if low is None or low >= upto:
+                        conn.commit()
+                        break
+
+                    high = min(upto, low + timedelta(hours=ROLLUP_BATCH_HOURS))
+                    for query in self.ROLLUP_QUERIES:
+                        cursor.execute(query, low=low, high=high)
+                    self.update_sketches(cursor, low, high)
+                    cursor.execute(self.UPDATE_WATERMARK_QUERY, high=high, rollup_name=self.ROLLUP_NAME)
+                    conn.commit()
+
+                except Exception as e:
+                    conn.rollback()
+                    self.logger.error(f"Error refreshing report rollups: {str(e)}")
+                    raise
+                finally:
+                    cursor.close()
+
+            batches += 1
+            watermark = high
+            self.logger.info(f"Rolled up transaction requests from {low} to {high}")
+            if high >= upto:
+                break
+
+        return {"watermark": watermark, "batches": batches}
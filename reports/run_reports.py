@@ -12,158 +12,191 @@ from reports.daily_reports import DailyReports
 from reports.weekly_reports import WeeklyReports
 from reports.monthly_reports import MonthlyReports
 from reports.custom_reports import CustomReports
-from reports.exporters import ReportExporter
+from reports.exporters import ReportExporter, ReportJob
+from reports.rollups import ReportRollups
 
-# Configure logging
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+def daily_report_jobs(report_date=None, **report_options):
+    """Report queries of the daily run"""
+    daily_report = DailyReports(report_date or datetime.now(), **report_options)
+    return [
+        ReportJob(daily_report, "get_request_summary", "daily_summary", "daily"),
+        ReportJob(daily_report, "get_hourly_distribution", "daily_hourly_distribution", "daily"),
+    ]
 
-logging.basicConfig(
-    filename=os.path.join(log_dir, 'reports.log'),
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+def weekly_report_jobs(report_date=None, **report_options):
+    """Report queries of the weekly run"""
+    weekly_report = WeeklyReports(report_date or datetime.now(), **report_options)
+    return [
+        ReportJob(weekly_report, "get_daily_trend", "weekly_daily_trend", "weekly"),
+        # Streamed straight from the cursor to the file
+        ReportJob(weekly_report, "get_top_users", "weekly_top_users", "weekly", {"stream": True}),
+        # Add more individual report exports here
+    ]
 
-def run_daily_reports():
-    """Generate and export daily reports"""
-    logging.info("Starting daily reports generation")
-    
-    today = datetime.now()
-    
-    # Use DailyReports class instead of CustomReports
-    daily_report = DailyReports(today)
-    exporter = ReportExporter()
+def monthly_report_jobs(report_date=None, **report_options):
+    """Report queries of the monthly run, every query MonthlyReports provides"""
+    today = report_date or datetime.now()
+    # If it's the first day of the month, report on the previous month
+    if today.day == 1:
+        previous_month = datetime(today.year if today.month > 1 else today.year - 1,
+                                  today.month - 1 if today.month > 1 else 12, 1)
+    else:
+        previous_month = today.replace(day=1)
     
-    # Generate and export reports using DailyReports methods
-    summary = daily_report.get_request_summary()
-    exporter.export_to_csv(summary, "daily_summary", "daily")
+    return ReportExporter.full_report_jobs(MonthlyReports(previous_month, **report_options), "monthly_report", "monthly")
+
+def custom_report_jobs(start_date, end_date, **report_options):
+    """Report queries of a custom date range run"""
+    custom_report = CustomReports(start_date, end_date, **report_options)
+    return [
+        ReportJob(custom_report, "get_transaction_summary", "custom_summary", "custom"),
+        ReportJob(custom_report, "get_request_type_breakdown", "custom_breakdown_by_type", "custom"),
+        ReportJob(custom_report, "get_daily_activity", "custom_daily_activity", "custom"),
+    ]
+
+def refresh_rollups():
+    """
+    Bring the report rollups up to date
     
-    hourly = daily_report.get_hourly_distribution()
-    exporter.export_to_csv(hourly, "daily_hourly_distribution", "daily")
+    Returns:
+        tuple: Watermark the rollups are complete until (None when unknown) and whether the refresh succeeded
+    """
+    rollups = ReportRollups()
+    try:
+        result = rollups.refresh()
+        logging.info(f"Report rollups refreshed in {result['batches']} batches, watermark {result['watermark']}")
+        return result['watermark'], True
+    except Exception as e:
+        logging.error(f"Error refreshing report rollups: {str(e)}")
+    try:
+        return rollups.get_watermark(), False
+    except Exception as e:
+        logging.error(f"Report rollup watermark unavailable, is migrations/002_report_rollups.sql applied? {str(e)}")
+        return None, False
+
+def fall_back_to_raw_queries(jobs):
+    """
+    Refresh the rollups the reports read, reports the rollups do not cover (no watermark, or the refresh failed
+    and the range ends after the watermark) scan TRANSACTION_REQUESTS instead
+    """
+    reports = list({id(job.report): job.report for job in jobs if job.report.use_rollups}.values())
+    if not reports:
+        return
+    watermark, refreshed = refresh_rollups()
+    for report in reports:
+        if watermark is None or not (refreshed or report.rollups_cover(watermark)):
+            logging.warning(f"Report rollups do not cover {type(report).__name__} (watermark {watermark}), "
+                            f"querying TRANSACTION_REQUESTS")
+            report.use_raw_queries()
+
+def run_report_jobs(name, jobs, max_workers=None):
+    """
+    Run report jobs on one exporter, up to max_workers queries at a time
     
-    # Or use the built-in method to generate all reports
-    # report_files = daily_report.generate_daily_report()
-    # logging.info(f"Generated daily reports: {', '.join(report_files.values())}")
+    Returns:
+        dict: Mapping of job file names to export file paths
+    """
+    logging.info(f"Starting {name} reports generation")
+    fall_back_to_raw_queries(jobs)
+    exporter = ReportExporter()
+    export_results = exporter.export_reports(jobs, max_workers)
     
-    logging.info("Daily reports generation completed")
+    for timing in exporter.last_run_timings:
+        logging.info(f"{timing['report']}: {timing['rows']} rows, query {timing['query_seconds']}s, "
+                     f"total {timing['total_seconds']}s")
+    logging.info(f"{name.capitalize()} reports generation completed. Generated {len(export_results)} reports.")
+    return export_results
 
-def run_weekly_reports():
+def run_daily_reports(max_workers=None, **report_options):
+    """Generate and export daily reports"""
+    return run_report_jobs("daily", daily_report_jobs(**report_options), max_workers)
+
+def run_weekly_reports(max_workers=None, **report_options):
     """Generate and export weekly reports"""
-    logging.info("Starting weekly reports generation")
-    
     try:
-        # Get current week
-        today = datetime.now()
-        weekly_report = WeeklyReports(today)
-        exporter = ReportExporter()
-        
-        # Export all weekly reports with proper error handling
-        export_results = {}
-        
-        try:
-            daily_trend = weekly_report.get_daily_trend()
-            if daily_trend:
-                export_results['daily_trend'] = exporter.export_to_csv(daily_trend, 
-                                                                      "weekly_daily_trend", 
-                                                                      "weekly")
-        except Exception as e:
-            logging.error(f"Error generating weekly daily trend: {str(e)}")
-            
-        try:
-            top_users = weekly_report.get_top_users()
-            if top_users:
-                export_results['top_users'] = exporter.export_to_csv(top_users, 
-                                                                   "weekly_top_users", 
-                                                                   "weekly")
-        except Exception as e:
-            logging.error(f"Error generating weekly top users: {str(e)}")
-            
-        # Add more individual report exports with error handling
-        
-        logging.info(f"Weekly reports generation completed. Generated {len(export_results)} reports.")
-        
+        return run_report_jobs("weekly", weekly_report_jobs(**report_options), max_workers)
     except Exception as e:
         logging.error(f"Error in weekly report generation: {str(e)}")
+        return {}
 
-def run_monthly_reports():
+def run_monthly_reports(max_workers=None, **report_options):
     """Generate and export monthly reports"""
-    logging.info("Starting monthly reports generation")
-    
-    # Get previous month
-    today = datetime.now()
-    # If it's the first day of the month, report on the previous month
-    if today.day == 1:
-        previous_month = datetime(today.year, today.month-1 if today.month > 1 else 12, 1)
-    else:
-        previous_month = today.replace(day=1)
-    
-    monthly_report = MonthlyReports(previous_month)
-    exporter = ReportExporter()
-    
-    # Export all monthly reports
-    export_results = exporter.export_full_report(monthly_report, "monthly_report", "monthly")
-    
-    logging.info(f"Monthly reports generation completed. Generated {len(export_results)} reports.")
+    return run_report_jobs("monthly", monthly_report_jobs(**report_options), max_workers)
 
-def run_custom_report(start_date, end_date):
+def run_custom_report(start_date, end_date, max_workers=None, **report_options):
     """Generate and export custom date range reports"""
-    logging.info(f"Starting custom reports generation from {start_date} to {end_date}")
-    
     try:
-        custom_report = CustomReports(start_date, end_date)
-        exporter = ReportExporter()
-        
-        # Generate summary with error handling
-        try:
-            summary = custom_report.get_transaction_summary()
-            if summary:
-                exporter.export_to_csv(summary, "custom_summary", "custom")
-        except Exception as e:
-            logging.error(f"Error generating custom summary: {str(e)}")
-        
-        # Generate breakdown with error handling
-        try:
-            breakdown = custom_report.get_request_type_breakdown()
-            if breakdown:
-                exporter.export_to_csv(breakdown, "custom_breakdown_by_type", "custom")
-        except Exception as e:
-            logging.error(f"Error generating custom breakdown: {str(e)}")
-        
-        # Generate daily activity with error handling
-        try:
-            daily = custom_report.get_daily_activity()
-            if daily:
-                exporter.export_to_csv(daily, "custom_daily_activity", "custom")
-        except Exception as e:
-            logging.error(f"Error generating custom daily activity: {str(e)}")
-        
-        logging.info("Custom reports generation completed")
-        
+        return run_report_jobs(f"custom ({start_date} to {end_date})",
+                               custom_report_jobs(start_date, end_date, **report_options), max_workers)
     except Exception as e:
         logging.error(f"Error in custom report generation: {str(e)}")
+        return {}
+
+def run_all_reports(max_workers=None, **report_options):
+    """
+    Generate daily, weekly and monthly reports in one run, their queries sharing one worker
+    pool and one connection pool
+    """
+    today = datetime.now()
+    jobs = (daily_report_jobs(today, **report_options) + weekly_report_jobs(today, **report_options)
+            + monthly_report_jobs(today, **report_options))
+    return run_report_jobs("daily, weekly and monthly", jobs, max_workers)
 
 if __name__ == "__main__":
+    # Configure logging
+    log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    
+    logging.basicConfig(
+        filename=os.path.join(log_dir, 'reports.log'),
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    
     parser = argparse.ArgumentParser(description='Generate CDC transaction reports')
-    parser.add_argument('--type', choices=['daily', 'weekly', 'monthly', 'custom'],
-                        default='daily', help='Type of report to generate')
+    parser.add_argument('--type', choices=['daily', 'weekly', 'monthly', 'custom', 'rollups'],
+                        default='daily', help='Type of report to generate, rollups only refreshes the report rollups')
+    parser.add_argument('--all', action='store_true',
+                        help='Generate daily, weekly and monthly reports in one run (ignores --type)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Report queries to run at once (default: REPORT_MAX_WORKERS, 1 runs them in turn)')
+    parser.add_argument('--rollups', action='store_true',
+                        help='Read the report rollups instead of TRANSACTION_REQUESTS (default: REPORT_USE_ROLLUPS)')
+    parser.add_argument('--raw', action='store_true',
+                        help='Query TRANSACTION_REQUESTS directly instead of the report rollups')
+    parser.add_argument('--approximate', action='store_true',
+                        help='Estimate unique users from daily HyperLogLog sketches (about 0.8%% standard error, '
+                             'implies --rollups)')
     parser.add_argument('--start-date', help='Start date for custom report (YYYY-MM-DD)')
     parser.add_argument('--end-date', help='End date for custom report (YYYY-MM-DD)')
     
     args = parser.parse_args()
+    if args.raw and (args.approximate or args.rollups):
+        parser.error("--rollups and --approximate read the report rollups, they cannot be combined with --raw")
+    report_options = {
+        "use_rollups": False if args.raw else (True if args.rollups or args.approximate else None),
+        "approximate": True if args.approximate else None,
+    }
     
     try:
-        if args.type == 'daily':
-            run_daily_reports()
+        if args.all:
+            run_all_reports(args.workers, **report_options)
+        elif args.type == 'daily':
+            run_daily_reports(args.workers, **report_options)
         elif args.type == 'weekly':
-            run_weekly_reports()
+            run_weekly_reports(args.workers, **report_options)
         elif args.type == 'monthly':
-            run_monthly_reports()
+            run_monthly_reports(args.workers, **report_options)
+        elif args.type == 'rollups':
+            # Errors reach the handler below, a scheduled refresh should fail loudly
+            result = ReportRollups().refresh()
+            logging.info(f"Report rollups refreshed in {result['batches']} batches, watermark {result['watermark']}")
         elif args.type == 'custom':
             if not args.start_date:
                 print("Error: start-date is required for custom reports")
                 sys.exit(1)
-            run_custom_report(args.start_date, args.end_date)
+            run_custom_report(args.start_date, args.end_date, args.workers, **report_options)
     except Exception as e:
         logging.error(f"Error running reports: {str(e)}", exc_info=True)
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
@@ -2,37 +2,125 @@ import os
 import csv
 import logging
 from datetime import datetime, timedelta
-from resources.utilities.database.oracle import exadata_db
+from resources.utilities.database import access as db_access
+from .hyperloglog import HyperLogLog
+from .queries import ReportQuery, date_range
+
+# rows fetched per round trip when streaming a report query
+REPORT_FETCH_ARRAYSIZE = int(os.environ.get("REPORT_FETCH_ARRAYSIZE", 1000))
+# read the REPORT_ROLLUP_* tables (reports/rollups.py) instead of scanning TRANSACTION_REQUESTS, turn on once
+# migrations/002_report_rollups.sql is applied
+REPORT_USE_ROLLUPS = os.environ.get("REPORT_USE_ROLLUPS", "false").lower() == "true"
+# estimate unique users from the daily HyperLogLog sketches (reports/hyperloglog.py) instead of counting them
+REPORT_APPROXIMATE_USERS = os.environ.get("REPORT_APPROXIMATE_USERS", "false").lower() == "true"
+
+
+def read_sketch(value):
+    """Sketch bytes of a REPORT_ROLLUP_DAILY_SKETCH.SKETCH value, which the driver may return as a LOB"""
+    return value.read() if hasattr(value, 'read') else bytes(value)
+
 
 class ReportingBase:
     """Base class for all reporting functionality with shared methods."""
     
-    def __init__(self):
+    SKETCHES_QUERY = ReportQuery(f"""
+        SELECT ROLLUP_DAY, REQUEST_TYPE, SKETCH
+        FROM REPORT_ROLLUP_DAILY_SKETCH
+        WHERE {date_range("ROLLUP_DAY")}
+    """)
+    
+    SKETCHES_INCLUDING_END_QUERY = ReportQuery(f"""
+        SELECT ROLLUP_DAY, REQUEST_TYPE, SKETCH
+        FROM REPORT_ROLLUP_DAILY_SKETCH
+        WHERE {date_range("ROLLUP_DAY", include_end=True)}
+    """)
+    
+    def __init__(self, use_rollups=None, approximate=None):
         self.logger = logging.getLogger(__name__)
+        self.use_rollups = REPORT_USE_ROLLUPS if use_rollups is None else use_rollups
+        if approximate and not self.use_rollups:
+            raise ValueError("Approximate unique users are estimated from the report rollups, use_rollups is off")
+        # Only reports that count unique users over ranges of days have an approximate variant
+        self.approximate = self.use_rollups and (REPORT_APPROXIMATE_USERS if approximate is None else approximate)
+    
+    def rollups_cover(self, watermark):
+        """True when rollups rolled up until watermark hold every request of the report's date range"""
+        range_end = getattr(self, "query_end_date", getattr(self, "end_date", None))
+        return watermark is not None and range_end is not None and watermark >= range_end
+    
+    def use_raw_queries(self):
+        """Scan TRANSACTION_REQUESTS instead of the report rollups, unique users are counted exactly"""
+        self.use_rollups = False
+        self.approximate = False
     
-    def execute_query(self, query, fetch_data=True):
-        """Execute a query and return formatted results."""
-        try:
-            conn = exadata_db.get_connection_handle()
-            cursor = conn.cursor()
-            cursor.execute(query)
+    def execute_query(self, query, params=None, fetch_data=True):
+        """Execute a query, with optional bind variable values, and return formatted results."""
+        if fetch_data:
+            return db_access.execute_query(query, params, fetch=db_access.FETCH_ALL)
+        db_access.execute_query(query, params, commit=True)
+        return True
+    
+    def stream_query(self, query, params=None, arraysize=None):
+        """
+        Execute a query and yield its rows one at a time, fetching them from the database in batches.
+        
+        The pooled connection is held until the generator is exhausted or closed, so only one batch
+        of rows is in memory at a time regardless of the size of the result set.
+        
+        Args:
+            query: SQL query to execute
+            params: Optional bind variable values
+            arraysize: Rows per fetch, defaults to REPORT_FETCH_ARRAYSIZE
             
-            if fetch_data:
-                columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
-                result = [dict(zip(columns, row)) for row in rows]
-                return result
-            else:
-                conn.commit()
-                return True
-        except Exception as e:
-            self.logger.error(f"Database error in reporting: {str(e)}")
-            raise
-        finally:
-            if 'cursor' in locals() and cursor:
-                cursor.close()
-            if 'conn' in locals() and conn:
-                conn.close()
+        Yields:
+            dict: One row keyed by column name
+        """
+        return db_access.stream_query(query, params, arraysize=arraysize or REPORT_FETCH_ARRAYSIZE)
+    
+    def bind_values(self):
+        """Values of the bind variables report queries share, the report's date range"""
+        return {name: getattr(self, name) for name in ("start_date", "end_date", "query_end_date")
+                if hasattr(self, name)}
+    
+    def run_query(self, report_query, stream=False, **values):
+        """
+        Execute a ReportQuery with its binds taken from the report's date range and values
+        
+        Args:
+            report_query: ReportQuery to execute
+            stream: Return a row generator (see stream_query) instead of a list
+            values: Bind values in addition to, or overriding, bind_values()
+            
+        Returns:
+            list or generator: Rows as dictionaries
+        """
+        params = report_query.bind({**self.bind_values(), **values})
+        if stream:
+            return self.stream_query(report_query.sql, params)
+        return self.execute_query(report_query.sql, params)
+    
+    def estimate_unique_users(self, start_date, end_date, include_end=False, group_by=None):
+        """
+        Estimate unique users by merging the daily sketches of a date range, see reports/hyperloglog.py
+        for the error bound.
+        
+        Args:
+            start_date: First day of the range
+            end_date: End of the range, exclusive unless include_end is set
+            include_end: Include the day of end_date
+            group_by: Function of (rollup_day, request_type) returning the group a sketch is merged into,
+                by default all sketches of the range are merged into one group keyed None
+            
+        Returns:
+            dict: Estimated unique users per group
+        """
+        query = self.SKETCHES_INCLUDING_END_QUERY if include_end else self.SKETCHES_QUERY
+        merged = {}
+        for row in self.run_query(query, stream=True, start_date=start_date, end_date=end_date):
+            sketch = HyperLogLog.from_bytes(read_sketch(row["SKETCH"]))
+            key = group_by(row["ROLLUP_DAY"], row["REQUEST_TYPE"]) if group_by else None
+            merged[key] = merged[key].merge(sketch) if key in merged else sketch
+        return {key: sketch.estimate() for key, sketch in merged.items()}
     
     def get_date_range(self, interval_type=None, reference_date=None):
         """
@@ -93,7 +181,7 @@ class ReportingBase:
         if subdir:
             report_dir = os.path.join(report_dir, subdir)
             
-        if not os.path.exists(report_dir):
-            os.makedirs(report_dir)
+        # exist_ok: report jobs running in parallel may create it at the same time
+        os.makedirs(report_dir, exist_ok=True)
             
         return report_dir
\ No newline at end of file
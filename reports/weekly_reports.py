@@ -1,65 +1,118 @@
 from datetime import datetime, timedelta
 from .utils import ReportingBase
+from .queries import ReportQuery, date_range
 
 class WeeklyReports(ReportingBase):
-    def __init__(self, report_date=None):
-        super().__init__()
+    DAILY_TREND_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(CREATED_ON, 'YYYY-MM-DD') as REQUEST_DATE,
+            REQUEST_TYPE,
+            COUNT(*) as REQUEST_COUNT,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON", end="query_end_date")}
+        GROUP BY TO_CHAR(CREATED_ON, 'YYYY-MM-DD'), REQUEST_TYPE
+        ORDER BY REQUEST_DATE, REQUEST_TYPE
+    """)
+
+    DAILY_TREND_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            TO_CHAR(ROLLUP_DAY, 'YYYY-MM-DD') as REQUEST_DATE,
+            REQUEST_TYPE,
+            SUM(REQUEST_COUNT) as REQUEST_COUNT,
+            COUNT(*) as UNIQUE_USERS
+        FROM REPORT_ROLLUP_DAILY_USERS
+        WHERE {date_range("ROLLUP_DAY", end="query_end_date")}
+        GROUP BY TO_CHAR(ROLLUP_DAY, 'YYYY-MM-DD'), REQUEST_TYPE
+        ORDER BY REQUEST_DATE, REQUEST_TYPE
+    """)
+
+    TOP_USERS_QUERY = ReportQuery(f"""
+        SELECT
+            MSISDN,
+            COUNT(*) as REQUEST_COUNT,
+            COUNT(DISTINCT REQUEST_TYPE) as UNIQUE_REQUEST_TYPES,
+            MIN(TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as FIRST_REQUEST_DATE,
+            MAX(TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as LAST_REQUEST_DATE
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON", end="query_end_date")}
+        GROUP BY MSISDN
+        ORDER BY REQUEST_COUNT DESC
+        FETCH FIRST :row_limit ROWS ONLY
+    """)
+
+    TOP_USERS_ROLLUP_QUERY = ReportQuery(f"""
+        SELECT
+            MSISDN,
+            SUM(REQUEST_COUNT) as REQUEST_COUNT,
+            COUNT(DISTINCT REQUEST_TYPE) as UNIQUE_REQUEST_TYPES,
+            TO_CHAR(MIN(ROLLUP_DAY), 'YYYY-MM-DD') as FIRST_REQUEST_DATE,
+            TO_CHAR(MAX(ROLLUP_DAY), 'YYYY-MM-DD') as LAST_REQUEST_DATE
+        FROM REPORT_ROLLUP_DAILY_USERS
+        WHERE {date_range("ROLLUP_DAY", end="query_end_date")}
+        GROUP BY MSISDN
+        ORDER BY REQUEST_COUNT DESC
+        FETCH FIRST :row_limit ROWS ONLY
+    """)
+
+    REQUEST_TYPE_SUMMARY_QUERY = ReportQuery(f"""
+        SELECT
+            REQUEST_TYPE,
+            COUNT(*) as REQUEST_COUNT,
+            COUNT(DISTINCT MSISDN) as UNIQUE_USERS,
+            ROUND(AVG(EXTRACT(SECOND FROM (PROCESSED_ON - CREATED_ON)) +
+                  EXTRACT(MINUTE FROM (PROCESSED_ON - CREATED_ON)) * 60 +
+                  EXTRACT(HOUR FROM (PROCESSED_ON - CREATED_ON)) * 3600), 2) as AVG_PROCESSING_TIME_SEC
+        FROM TRANSACTION_REQUESTS
+        WHERE {date_range("CREATED_ON", end="query_end_date")}
+        GROUP BY REQUEST_TYPE
+        ORDER BY REQUEST_COUNT DESC
+    """)
+
+    REQUEST_TYPE_SUMMARY_ROLLUP_QUERY = ReportQuery(f"""
+        WITH Users AS (
+            SELECT
+                REQUEST_TYPE,
+                SUM(REQUEST_COUNT) as REQUEST_COUNT,
+                COUNT(DISTINCT MSISDN) as UNIQUE_USERS
+            FROM REPORT_ROLLUP_DAILY_USERS
+            WHERE {date_range("ROLLUP_DAY", end="query_end_date")}
+            GROUP BY REQUEST_TYPE
+        ),
+        Processing AS (
+            SELECT
+                REQUEST_TYPE,
+                ROUND(SUM(PROCESSING_SECONDS) / NULLIF(SUM(PROCESSED_COUNT), 0), 2) as AVG_PROCESSING_TIME_SEC
+            FROM REPORT_ROLLUP_HOURLY
+            WHERE {date_range("ROLLUP_HOUR", end="query_end_date")}
+            GROUP BY REQUEST_TYPE
+        )
+        SELECT u.REQUEST_TYPE, u.REQUEST_COUNT, u.UNIQUE_USERS, p.AVG_PROCESSING_TIME_SEC
+        FROM Users u
+        LEFT JOIN Processing p ON p.REQUEST_TYPE = u.REQUEST_TYPE
+        ORDER BY u.REQUEST_COUNT DESC
+    """)
+
+    def __init__(self, report_date=None, use_rollups=None, approximate=None):
+        super().__init__(use_rollups, approximate)
         self.report_date = report_date or datetime.now()
         # Make sure we pass the interval_type parameter
         self.start_date, self.end_date = self.get_date_range('weekly', self.report_date)
-        
+
         # Adjust end date for wider data query window if needed
         # This helps find data in test environments
         self.query_end_date = datetime.now() + timedelta(days=365)  # Look ahead a year for test data
-    
+
     def get_daily_trend(self):
         """Get daily trend of requests within the week"""
-        query = f"""
-            SELECT 
-                TO_CHAR(CREATED_ON, 'YYYY-MM-DD') as REQUEST_DATE,
-                REQUEST_TYPE,
-                COUNT(*) as REQUEST_COUNT,
-                COUNT(DISTINCT MSISDN) as UNIQUE_USERS
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON < TO_TIMESTAMP('{self.query_end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            GROUP BY TO_CHAR(CREATED_ON, 'YYYY-MM-DD'), REQUEST_TYPE
-            ORDER BY REQUEST_DATE, REQUEST_TYPE
-        """
-        return self.execute_query(query)
-    
-    def get_top_users(self, limit=50):
-        """Get top users by request count for the week"""
-        query = f"""
-            SELECT 
-                MSISDN,
-                COUNT(*) as REQUEST_COUNT,
-                COUNT(DISTINCT REQUEST_TYPE) as UNIQUE_REQUEST_TYPES,
-                MIN(TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as FIRST_REQUEST_DATE,
-                MAX(TO_CHAR(CREATED_ON, 'YYYY-MM-DD')) as LAST_REQUEST_DATE
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON < TO_TIMESTAMP('{self.query_end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            GROUP BY MSISDN
-            ORDER BY REQUEST_COUNT DESC
-            FETCH FIRST {limit} ROWS ONLY
-        """
-        return self.execute_query(query)
-    
+        return self.run_query(self.DAILY_TREND_ROLLUP_QUERY if self.use_rollups else self.DAILY_TREND_QUERY)
+
+    def get_top_users(self, limit=50, stream=False):
+        """Get top users by request count for the week, as a row generator when stream is set"""
+        return self.run_query(self.TOP_USERS_ROLLUP_QUERY if self.use_rollups else self.TOP_USERS_QUERY,
+                              stream=stream, row_limit=limit)
+
     def get_request_type_summary(self):
         """Get summary of request types for the week"""
-        query = f"""
-            SELECT 
-                REQUEST_TYPE,
-                COUNT(*) as REQUEST_COUNT,
-                COUNT(DISTINCT MSISDN) as UNIQUE_USERS,
-                ROUND(AVG(EXTRACT(SECOND FROM (PROCESSED_ON - CREATED_ON)) + 
-                      EXTRACT(MINUTE FROM (PROCESSED_ON - CREATED_ON)) * 60 + 
-                      EXTRACT(HOUR FROM (PROCESSED_ON - CREATED_ON)) * 3600), 2) as AVG_PROCESSING_TIME_SEC
-            FROM TRANSACTION_REQUESTS
-            WHERE CREATED_ON >= TO_TIMESTAMP('{self.start_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            AND CREATED_ON < TO_TIMESTAMP('{self.query_end_date.strftime("%Y-%m-%d %H:%M:%S")}', 'YYYY-MM-DD HH24:MI:SS')
-            GROUP BY REQUEST_TYPE
-            ORDER BY REQUEST_COUNT DESC
-        """
-        return self.execute_query(query)
\ No newline at end of file
+        return self.run_query(self.REQUEST_TYPE_SUMMARY_ROLLUP_QUERY if self.use_rollups
+                              else self.REQUEST_TYPE_SUMMARY_QUERY)
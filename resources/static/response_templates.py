@@ -10,6 +10,8 @@ EXECUTION_SUCCESS = {"success": True}
 EXECUTION_FAIL = {"success": False, "data": {"message": "Failed to process your request."}}
 APPLICATION_ERRORED = {"success": False, "data": {"message": "Request could not be processed at this time. Please try again later."}}
 SERVICE_NOT_ALLOWED = {"success": False, "data": {"message": "Service not allowed on this number."}}
+ACCESS_FORBIDDEN = {"success": False, "data": {"message": "Access not allowed from this address."}}
+ACCESS_UNAUTHORIZED = {"success": False, "data": {"message": "Missing or invalid admin token."}}
 
 # ussd response template
 RESPONSE_MESSAGE_TEMPLATE = "<msg><sessionid>{SESSION_ID}</sessionid>\
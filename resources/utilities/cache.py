@@ -0,0 +1,104 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Bounded cache with least recently used eviction and a time to live per entry.
+
+    Negative results (e.g. "subscriber not found") can be cached with their own, usually shorter, TTL via
+    set_negative so repeated lookups for a bad key do not go back to the backend every time.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 300, negative_ttl: float = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl if negative_ttl is not None else ttl
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0, "expirations": 0,
+                        "invalidations": 0}
+
+    def get(self, key, default=None):
+        with self.__lock:
+            __entry = self.__entries.get(key)
+            if __entry is None:
+                self.__stats["misses"] += 1
+                return default
+
+            __expires_at, __value, __negative = __entry
+            if __expires_at < time.monotonic():
+                del self.__entries[key]
+                self.__stats["expirations"] += 1
+                self.__stats["misses"] += 1
+                return default
+
+            self.__entries.move_to_end(key)
+            self.__stats["negative_hits" if __negative else "hits"] += 1
+            return __value
+
+    def set(self, key, value, ttl: float = None, negative: bool = False):
+        if self.max_size <= 0:
+            return
+        __ttl = ttl if ttl is not None else (self.negative_ttl if negative else self.ttl)
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + __ttl, value, negative)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                self.__stats["evictions"] += 1
+
+    def set_negative(self, key, value, ttl: float = None):
+        self.set(key, value, ttl=ttl, negative=True)
+
+    def add(self, key, value=True, ttl: float = None):
+        """
+        Set the key only if it is not cached, in one step (e.g. a dedup window)
+        :return: True if the key was added, False if it was already cached
+        """
+        if self.max_size <= 0:
+            return True
+        __now = time.monotonic()
+        with self.__lock:
+            __entry = self.__entries.get(key)
+            if __entry is not None and __entry[0] >= __now:
+                self.__stats["hits"] += 1
+                return False
+            self.__stats["misses"] += 1
+            self.__entries[key] = (__now + (ttl if ttl is not None else self.ttl), value, False)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                self.__stats["evictions"] += 1
+            return True
+
+    def invalidate(self, key):
+        """
+        Drop a single entry
+        :return: True if the key was cached
+        """
+        with self.__lock:
+            if self.__entries.pop(key, None) is None:
+                return False
+            self.__stats["invalidations"] += 1
+            return True
+
+    def clear(self):
+        with self.__lock:
+            self.__stats["invalidations"] += len(self.__entries)
+            self.__entries.clear()
+
+    def get_stats(self):
+        with self.__lock:
+            __stats = dict(self.__stats)
+            __stats["size"] = len(self.__entries)
+        __lookups = __stats["hits"] + __stats["negative_hits"] + __stats["misses"]
+        __stats["hit_ratio"] = round((__stats["hits"] + __stats["negative_hits"]) / __lookups, 4) if __lookups else 0.0
+        __stats["max_size"] = self.max_size
+        __stats["ttl"] = self.ttl
+        __stats["negative_ttl"] = self.negative_ttl
+        return __stats
+
+    def __len__(self):
+        return len(self.__entries)
@@ -0,0 +1,74 @@
+"""
+Shared Exadata access for the models and reports: one place that borrows a pooled connection, runs a statement,
+fetches, commits or rolls back, and records the statement in the statement profiler (see profiler.py).
+"""
+import time
+import logging
+from resources.utilities.database.oracle import exadata_db
+from resources.utilities.database.profiler import ProfiledCursor
+
+FETCH_ALL = "all"
+FETCH_ONE = "one"
+
+db_logger = logging.getLogger('exadata')
+
+
+def rows_as_dicts(cursor, rows):
+    __columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(__columns, row)) for row in rows]
+
+
+def execute_query(query, params=None, fetch: str = None, commit: bool = False):
+    """
+    Run one statement on a pooled connection
+    :param query: SQL, with :name binds for params
+    :param params: bind values
+    :param fetch: FETCH_ALL for every row as a dict, FETCH_ONE for the first row as a tuple, None to fetch nothing
+    :param commit: commit after the statement (INSERT/UPDATE/DELETE/MERGE)
+    :return: rows when fetching, otherwise the number of rows the statement affected
+    """
+    __start = time.perf_counter()
+    with exadata_db.connection() as conn:
+        cursor = ProfiledCursor(conn.cursor(), acquire_seconds=time.perf_counter() - __start)
+        try:
+            cursor.execute(query, params or {})
+            if fetch == FETCH_ALL:
+                return rows_as_dicts(cursor, cursor.fetchall())
+            if fetch == FETCH_ONE:
+                return cursor.fetchone()
+            __rowcount = cursor.rowcount
+            if commit:
+                conn.commit()
+            return __rowcount
+        except Exception as e:
+            conn.rollback()
+            db_logger.error(f"Database error: {str(e)}")
+            raise
+        finally:
+            cursor.close()
+
+
+def stream_query(query, params=None, arraysize: int = 1000):
+    """
+    Run a query and yield its rows as dicts, fetched arraysize rows per round trip. The pooled connection is held
+    until the generator is exhausted or closed.
+    """
+    __start = time.perf_counter()
+    with exadata_db.connection() as conn:
+        cursor = ProfiledCursor(conn.cursor(), acquire_seconds=time.perf_counter() - __start)
+        try:
+            cursor.arraysize = arraysize
+            cursor.prefetchrows = arraysize
+            cursor.execute(query, params or {})
+            __columns = [desc[0] for desc in cursor.description]
+            while True:
+                __rows = cursor.fetchmany(arraysize)
+                if not __rows:
+                    break
+                for __row in __rows:
+                    yield dict(zip(__columns, __row))
+        except Exception as e:
+            db_logger.error(f"Database error: {str(e)}")
+            raise
+        finally:
+            cursor.close()
@@ -0,0 +1,59 @@
+"""
+Load watermark of the mirrored CDR tables, maintained by the triggers of migrations/004_cdr_mirror_load_watermark.sql.
+
+Results read from a mirrored table are cached with the table's watermark at the time of the read and are only used
+while the watermark is unchanged. The watermarks are read at most once per poll interval, so a load is noticed within
+poll_seconds of its commit.
+"""
+import time
+import logging
+import threading
+from resources.utilities.database import access as db_access
+
+
+class MirrorLoadWatermark:
+    WATERMARK_QUERY = "SELECT TABLE_NAME, LOADED_ON FROM CDR_MIRROR_LOAD_WATERMARK"
+
+    def __init__(self, poll_seconds: float = 30):
+        self.poll_seconds = poll_seconds
+        self.__lock = threading.Lock()
+        self.__watermarks = {}
+        self.__polled_at = None
+        self.__stats = {"polls": 0, "poll_errors": 0, "loads": 0}
+
+    def get(self, table_name: str):
+        """
+        :return: watermark of the table, None when it is unknown (e.g. the migration has not been applied), in which
+                 case nothing read from the table should be cached
+        """
+        if self.__polled_at is None or time.monotonic() - self.__polled_at >= self.poll_seconds:
+            self.refresh()
+        return self.__watermarks.get(table_name)
+
+    def refresh(self, force: bool = False):
+        """Read the watermarks, only one thread polls and the others keep using the previous values"""
+        if not self.__lock.acquire(blocking=self.__polled_at is None or force):
+            return
+        try:
+            if not force and self.__polled_at is not None and \
+                    time.monotonic() - self.__polled_at < self.poll_seconds:
+                return
+            try:
+                __rows = db_access.execute_query(self.WATERMARK_QUERY, fetch=db_access.FETCH_ALL)
+                __watermarks = {row["TABLE_NAME"]: row["LOADED_ON"] for row in __rows}
+                self.__stats["polls"] += 1
+            except Exception as e:
+                logging.warning(f"CDR mirror load watermark unavailable, recent transactions are not cached: {str(e)}")
+                __watermarks = {}
+                self.__stats["poll_errors"] += 1
+            self.__stats["loads"] += sum(1 for table_name, watermark in __watermarks.items()
+                                         if table_name in self.__watermarks and
+                                         self.__watermarks[table_name] != watermark)
+            self.__watermarks = __watermarks
+            self.__polled_at = time.monotonic()
+        finally:
+            self.__lock.release()
+
+    def get_stats(self):
+        return {**self.__stats, "poll_seconds": self.poll_seconds,
+                "watermarks": {table_name: str(watermark) for table_name, watermark in self.__watermarks.items()}}
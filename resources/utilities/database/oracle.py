@@ -1,6 +1,10 @@
 import cx_Oracle
 import config
 import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
 
 # cx_Oracle.init_oracle_client(lib_dir=r"C:\Users\molet013\Repo\instantclient_12_2")
 
@@ -9,6 +13,7 @@ class ExaDataDatabase:
         super().__init__()
         self.conn = None
         self.app = None
+        self.pool = None
 
         self.db_config = {
             "user": os.environ["EXADATA_DB_USERNAME"],
@@ -18,14 +23,116 @@ class ExaDataDatabase:
             "host": os.environ["EXADATA_DB_HOSTNAME"]
         }
 
+        # session pool sizing, acquire timeout is in milliseconds, statement cache size is per session
+        self.pool_config = {
+            "min": int(os.environ.get("EXADATA_DB_POOL_MIN", 2)),
+            "max": int(os.environ.get("EXADATA_DB_POOL_MAX", 10)),
+            "increment": int(os.environ.get("EXADATA_DB_POOL_INCREMENT", 1)),
+            "wait_timeout": int(os.environ.get("EXADATA_DB_POOL_WAIT_TIMEOUT", 5000)),
+            "stmtcachesize": int(os.environ.get("EXADATA_DB_STMT_CACHE_SIZE", 50))
+        }
+
+        self.__lock = threading.Lock()
+        self.__stats = {
+            "acquired": 0,
+            "released": 0,
+            "acquire_failures": 0,
+            "acquire_time_total": 0.0,
+            "acquire_time_max": 0.0
+        }
+
     def init(self, app: object):
         if app is None:
             raise Exception("App instance not provided")
         self.app = app
 
+    def get_pool(self):
+        """
+        Create the session pool on first use and return it
+        :return: cx_Oracle.SessionPool
+        """
+        if self.pool is None:
+            with self.__lock:
+                if self.pool is None:
+                    dsn_tns = cx_Oracle.makedsn(self.db_config["host"], self.db_config["port"],
+                                                service_name=self.db_config["sid"])
+                    self.pool = cx_Oracle.SessionPool(user=self.db_config["user"], password=self.db_config["pass"],
+                                                      dsn=dsn_tns, min=self.pool_config["min"],
+                                                      max=self.pool_config["max"],
+                                                      increment=self.pool_config["increment"],
+                                                      threaded=True, getmode=cx_Oracle.SPOOL_ATTRVAL_TIMEDWAIT,
+                                                      wait_timeout=self.pool_config["wait_timeout"],
+                                                      stmtcachesize=self.pool_config["stmtcachesize"])
+                    logging.info(f"Exadata session pool created: {self.pool_config}")
+        return self.pool
+
     def get_connection_handle(self):
-        dsn_tns = cx_Oracle.makedsn(self.db_config["host"], self.db_config["port"], service_name=self.db_config["sid"])
-        self.conn = cx_Oracle.connect(user=self.db_config["user"], password=self.db_config["pass"], dsn=dsn_tns, threaded=True)
-        return self.conn
+        """
+        Borrow a connection from the session pool. Calling close() on the connection returns it to the pool.
+        :return: cx_Oracle.Connection
+        """
+        __start = time.perf_counter()
+        try:
+            __conn = self.get_pool().acquire()
+        except Exception:
+            with self.__lock:
+                self.__stats["acquire_failures"] += 1
+            raise
+
+        __elapsed = time.perf_counter() - __start
+        with self.__lock:
+            self.__stats["acquired"] += 1
+            self.__stats["acquire_time_total"] += __elapsed
+            self.__stats["acquire_time_max"] = max(self.__stats["acquire_time_max"], __elapsed)
+        return __conn
+
+    def release_connection(self, conn):
+        """
+        Hand a borrowed connection back to the session pool
+        :param conn: connection returned by get_connection_handle
+        """
+        try:
+            self.get_pool().release(conn)
+        finally:
+            with self.__lock:
+                self.__stats["released"] += 1
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a pooled connection for the duration of a with block
+        """
+        __conn = self.get_connection_handle()
+        try:
+            yield __conn
+        finally:
+            self.release_connection(__conn)
+
+    def get_pool_stats(self):
+        """
+        Pool usage statistics
+        :return: dict
+        """
+        with self.__lock:
+            __stats = dict(self.__stats)
+
+        __acquired = __stats["acquired"]
+        __stats["in_use"] = __acquired - __stats["released"]
+        __stats["acquire_time_avg"] = __stats["acquire_time_total"] / __acquired if __acquired else 0.0
+        __stats["config"] = dict(self.pool_config)
+
+        if self.pool is not None:
+            __stats["opened"] = self.pool.opened
+            __stats["busy"] = self.pool.busy
+        return __stats
+
+    def close(self):
+        """
+        Close the session pool, e.g. on application shutdown
+        """
+        with self.__lock:
+            if self.pool is not None:
+                self.pool.close(force=True)
+                self.pool = None
 
-exadata_db = ExaDataDatabase()
\ No newline at end of file
+exadata_db = ExaDataDatabase()
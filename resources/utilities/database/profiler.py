@@ -0,0 +1,194 @@
+"""
+Statement-level profiling of the Exadata queries.
+
+Statements are grouped by fingerprint, their SQL with literals replaced by ? and whitespace collapsed, so the same
+statement run with different values (or different bind values) is counted once. Per fingerprint the profiler keeps
+the call count, errors, total/mean/max time spent in execute and fetch calls, rows fetched and the time spent
+acquiring the pooled connection the statement ran on.
+"""
+import os
+import re
+import json
+import time
+import logging
+import functools
+import threading
+
+DB_PROFILE_ENABLED = os.environ.get("DB_PROFILE_ENABLED", "true").lower() == "true"
+# distinct fingerprints tracked, statements beyond are counted together under OTHER_STATEMENTS
+DB_PROFILE_MAX_STATEMENTS = int(os.environ.get("DB_PROFILE_MAX_STATEMENTS", 500))
+# written at shutdown, {pid} keeps the files of several server workers apart
+DB_PROFILE_DUMP_FILE = os.environ.get("DB_PROFILE_DUMP_FILE") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "logs",
+    "db_profile-{pid}.json")
+
+OTHER_STATEMENTS = "<other statements>"
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_LITERALS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"(?<![\w:.])\d+(?:\.\d+)?\b")
+_VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=2048)
+def fingerprint(sql: str):
+    """
+    Normalised SQL of a statement, e.g. WHERE SESSION_UID='42' AND PHASE = 2 -> WHERE SESSION_UID=? AND PHASE = ?
+    :return: str
+    """
+    __sql = _COMMENTS.sub(" ", str(sql))
+    __sql = _LITERALS.sub("?", __sql)
+    __sql = _NUMBERS.sub("?", __sql)
+    __sql = _VALUE_LISTS.sub("(?, ...)", __sql)
+    return _WHITESPACE.sub(" ", __sql).strip()
+
+
+class StatementProfiler:
+    def __init__(self, max_statements: int = None, enabled: bool = None):
+        self.max_statements = DB_PROFILE_MAX_STATEMENTS if max_statements is None else max_statements
+        self.enabled = DB_PROFILE_ENABLED if enabled is None else enabled
+        self.__lock = threading.Lock()
+        self.__statements = {}
+        self.__since = time.time()
+
+    def record(self, sql: str, seconds: float, rows: int = 0, acquire_seconds: float = 0.0, failed: bool = False):
+        """Add one execution of a statement"""
+        if not self.enabled:
+            return
+        __fingerprint = fingerprint(sql)
+        with self.__lock:
+            __entry = self.__statements.get(__fingerprint)
+            if __entry is None:
+                if len(self.__statements) >= self.max_statements:
+                    __fingerprint = OTHER_STATEMENTS
+                    __entry = self.__statements.get(__fingerprint)
+                if __entry is None:
+                    __entry = self.__statements[__fingerprint] = {"calls": 0, "errors": 0, "total_seconds": 0.0,
+                                                                  "max_seconds": 0.0, "rows": 0,
+                                                                  "acquire_seconds": 0.0}
+            __entry["calls"] += 1
+            __entry["errors"] += 1 if failed else 0
+            __entry["total_seconds"] += seconds
+            __entry["max_seconds"] = max(__entry["max_seconds"], seconds)
+            __entry["rows"] += rows
+            __entry["acquire_seconds"] += acquire_seconds
+
+    def get_stats(self, limit: int = None, order_by: str = "total_seconds"):
+        """
+        :param limit: number of statements returned, all when not given
+        :param order_by: total_seconds, mean_seconds, max_seconds, calls, rows or acquire_seconds, descending
+        :return: dict with the statements and totals over all of them
+        """
+        with self.__lock:
+            __statements = [{"fingerprint": key, **entry} for key, entry in self.__statements.items()]
+            __since = self.__since
+
+        for __statement in __statements:
+            __statement["mean_seconds"] = __statement["total_seconds"] / __statement["calls"]
+            __statement["acquire_mean_seconds"] = __statement["acquire_seconds"] / __statement["calls"]
+        __statements.sort(key=lambda statement: statement[order_by], reverse=True)
+        return {
+            "since": __since,
+            "statements": len(__statements),
+            "calls": sum(statement["calls"] for statement in __statements),
+            "total_seconds": sum(statement["total_seconds"] for statement in __statements),
+            "top": __statements[:limit] if limit else __statements
+        }
+
+    def reset(self):
+        with self.__lock:
+            self.__statements = {}
+            self.__since = time.time()
+
+    def dump(self, path: str = None):
+        """Write the statistics to a JSON file, e.g. on application shutdown"""
+        __path = (path or DB_PROFILE_DUMP_FILE).format(pid=os.getpid())
+        try:
+            os.makedirs(os.path.dirname(__path), exist_ok=True)
+            with open(__path, "w", encoding="utf-8") as dump_file:
+                json.dump(self.get_stats(), dump_file, indent=2)
+        except Exception as e:
+            logging.error(f"Failed to write the statement profile to {__path}: {str(e)}")
+
+
+statement_profiler = StatementProfiler()
+
+
+class ProfiledCursor:
+    """
+    Cursor wrapper that records every statement it runs in the statement profiler. The time of a statement is the
+    time spent in its execute call and the fetch calls that follow it; the connection acquire time is attributed to
+    the first statement. Any other attribute (arraysize, description, rowcount, ...) is the wrapped cursor's.
+    """
+    __slots__ = ("_cursor", "_profiler", "_acquire_seconds", "_statement", "_seconds", "_rows", "_failed")
+
+    def __init__(self, cursor, acquire_seconds: float = 0.0, profiler: StatementProfiler = None):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_profiler", profiler or statement_profiler)
+        object.__setattr__(self, "_acquire_seconds", acquire_seconds)
+        object.__setattr__(self, "_statement", None)
+        object.__setattr__(self, "_seconds", 0.0)
+        object.__setattr__(self, "_rows", 0)
+        object.__setattr__(self, "_failed", False)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+    def __timed(self, method, *args, **kwargs):
+        __start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            object.__setattr__(self, "_failed", True)
+            raise
+        finally:
+            object.__setattr__(self, "_seconds", self._seconds + time.perf_counter() - __start)
+
+    def __begin(self, statement):
+        self.__finish()
+        object.__setattr__(self, "_statement", statement)
+
+    def __finish(self):
+        if self._statement is None:
+            return
+        self._profiler.record(self._statement, self._seconds, rows=self._rows, acquire_seconds=self._acquire_seconds,
+                              failed=self._failed)
+        object.__setattr__(self, "_statement", None)
+        object.__setattr__(self, "_acquire_seconds", 0.0)
+        object.__setattr__(self, "_seconds", 0.0)
+        object.__setattr__(self, "_rows", 0)
+        object.__setattr__(self, "_failed", False)
+
+    def __fetched(self, rows):
+        object.__setattr__(self, "_rows", self._rows + rows)
+
+    def execute(self, statement, *args, **kwargs):
+        self.__begin(statement)
+        return self.__timed(self._cursor.execute, statement, *args, **kwargs)
+
+    def executemany(self, statement, *args, **kwargs):
+        self.__begin(statement)
+        return self.__timed(self._cursor.executemany, statement, *args, **kwargs)
+
+    def fetchone(self):
+        __row = self.__timed(self._cursor.fetchone)
+        self.__fetched(0 if __row is None else 1)
+        return __row
+
+    def fetchmany(self, *args, **kwargs):
+        __rows = self.__timed(self._cursor.fetchmany, *args, **kwargs)
+        self.__fetched(len(__rows))
+        return __rows
+
+    def fetchall(self):
+        __rows = self.__timed(self._cursor.fetchall)
+        self.__fetched(len(__rows))
+        return __rows
+
+    def close(self):
+        self.__finish()
+        self._cursor.close()
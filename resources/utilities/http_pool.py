@@ -0,0 +1,98 @@
+import time
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HTTPSessionPool:
+    """
+    Process-wide keep-alive connection pool for an integration endpoint.
+
+    Wraps a shared requests.Session so TCP/TLS connections are reused between calls, applies connect/read
+    timeouts to every request and retries idempotent calls with exponential backoff on connection errors,
+    timeouts and 5xx responses.
+    """
+
+    def __init__(self, name: str, pool_size: int = 10, connect_timeout: float = 3.0, read_timeout: float = 10.0,
+                 retries: int = 2, backoff: float = 0.2, verify: bool = True):
+        self.name = name
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.__adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False, max_retries=0)
+        self.session.mount("http://", self.__adapter)
+        self.session.mount("https://", self.__adapter)
+
+        self.__lock = threading.Lock()
+        self.__in_flight = 0
+        self.__stats = {"requests": 0, "retries": 0, "failures": 0, "request_time_total": 0.0}
+
+    def post(self, url: str, idempotent: bool = False, **kwargs):
+        """
+        POST through the pool. Only idempotent calls are retried.
+        :return: requests.Response, the last response/exception is returned/raised once retries are exhausted
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        __attempts = 1 + (self.retries if idempotent else 0)
+
+        for __attempt in range(__attempts):
+            if __attempt:
+                with self.__lock:
+                    self.__stats["retries"] += 1
+                time.sleep(self.backoff * (2 ** (__attempt - 1)))
+
+            __start = time.perf_counter()
+            with self.__lock:
+                self.__in_flight += 1
+                self.__stats["requests"] += 1
+            try:
+                __response = self.session.post(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logging.warning(f"{self.name} request failed (attempt {__attempt + 1}/{__attempts}): {str(e)}")
+                if __attempt + 1 == __attempts:
+                    with self.__lock:
+                        self.__stats["failures"] += 1
+                    raise
+                continue
+            finally:
+                with self.__lock:
+                    self.__in_flight -= 1
+                    self.__stats["request_time_total"] += time.perf_counter() - __start
+
+            if __response.status_code < 500 or __attempt + 1 == __attempts:
+                if __response.status_code >= 500:
+                    with self.__lock:
+                        self.__stats["failures"] += 1
+                return __response
+            logging.warning(f"{self.name} returned {__response.status_code} (attempt {__attempt + 1}/{__attempts})")
+
+    def get_stats(self):
+        """
+        Request counters plus the state of the underlying urllib3 connection pools
+        :return: dict
+        """
+        with self.__lock:
+            __stats = dict(self.__stats)
+            __stats["in_flight"] = self.__in_flight
+
+        __stats["request_time_avg"] = __stats["request_time_total"] / __stats["requests"] if __stats["requests"] else 0.0
+        __stats["pool_size"] = self.pool_size
+        __stats["timeout"] = list(self.timeout)
+
+        __hosts = {}
+        for __key in list(self.__adapter.poolmanager.pools.keys()):
+            __pool = self.__adapter.poolmanager.pools.get(__key)
+            if __pool is None:
+                continue
+            __hosts[f"{__pool.scheme}://{__pool.host}:{__pool.port}"] = {
+                "connections_opened": __pool.num_connections,
+                "requests": __pool.num_requests,
+                "idle_connections": __pool.pool.qsize() if __pool.pool is not None else 0
+            }
+        __stats["hosts"] = __hosts
+        return __stats
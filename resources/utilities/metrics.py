@@ -0,0 +1,64 @@
+"""
+Prometheus metrics for the USSD hot path, served on /metrics
+"""
+import os
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, multiprocess
+from prometheus_client import CONTENT_TYPE_LATEST
+from resources.utilities.database.oracle import exadata_db
+from resources.utilities.sms_dispatcher import sms_dispatcher
+from resources.utilities.session_store import session_write_behind
+
+# USSD gateways time out after a few seconds, keep the buckets fine below that
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 10.0)
+
+USSD_REQUEST_LATENCY = Histogram("cdc_ussd_request_seconds", "USSD request latency end to end",
+                                 buckets=LATENCY_BUCKETS)
+
+# phases: tariff_lookup, session_db, state_resolution, cdc_query, sms_send
+USSD_PHASE_LATENCY = Histogram("cdc_ussd_phase_seconds", "USSD request latency per processing phase", ["phase"],
+                               buckets=LATENCY_BUCKETS)
+
+USSD_MENU_SELECTIONS = Counter("cdc_ussd_menu_selections_total", "USSD menu selections by outcome",
+                               ["selection", "outcome"])
+
+DB_POOL_CONNECTIONS = Gauge("cdc_db_pool_connections", "Exadata session pool connections", ["state"])
+DB_POOL_CONNECTIONS.labels(state="opened").set_function(lambda: exadata_db.get_pool_stats().get("opened", 0))
+DB_POOL_CONNECTIONS.labels(state="busy").set_function(lambda: exadata_db.get_pool_stats().get("busy", 0))
+DB_POOL_CONNECTIONS.labels(state="borrowed").set_function(lambda: exadata_db.get_pool_stats()["in_use"])
+
+SMS_QUEUE_DEPTH = Gauge("cdc_sms_dispatch_queue_depth", "SMS jobs waiting for a dispatch worker")
+SMS_QUEUE_DEPTH.set_function(sms_dispatcher.queue_depth)
+
+# session changes waiting for / lost by the CDC_USSD_SESSION write-behind, see session_store.py
+SESSION_WRITE_BEHIND = Gauge("cdc_session_write_behind_operations", "USSD session write-behind operations", ["state"])
+SESSION_WRITE_BEHIND.labels(state="pending").set_function(session_write_behind.pending)
+SESSION_WRITE_BEHIND.labels(state="dropped").set_function(lambda: session_write_behind.dropped)
+
+# free text input outside the menu is counted as "other" to keep label cardinality bounded
+MENU_SELECTION_LABELS = {"new_session", "1", "2", "3"}
+
+
+def observe_phase(phase: str):
+    """
+    Time a processing phase, usable as a decorator or context manager
+    :param phase: tariff_lookup, session_db, state_resolution, cdc_query or sms_send
+    """
+    return USSD_PHASE_LATENCY.labels(phase=phase).time()
+
+
+def count_menu_selection(selection: str, outcome: str):
+    USSD_MENU_SELECTIONS.labels(selection=selection if selection in MENU_SELECTION_LABELS else "other",
+                                outcome=outcome).inc()
+
+
+def generate_metrics():
+    """
+    Render the metrics in the Prometheus text format. With PROMETHEUS_MULTIPROC_DIR set (multi-process servers)
+    the samples of every worker are aggregated.
+    :return: (bytes, content type)
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        __registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(__registry)
+        return generate_latest(__registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
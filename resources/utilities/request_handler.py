@@ -1,4 +1,80 @@
-from bs4 import BeautifulSoup
+import threading
+from lxml import etree
+
+# request element tag -> USSDRequest attribute
+REQUEST_FIELDS = {"msisdn": "msisdn", "sessionid": "session_id", "phase": "request_phase"}
+
+# lxml parsers must not be shared between threads
+_parsers = threading.local()
+
+
+def _get_parser():
+    __parser = getattr(_parsers, "parser", None)
+    if __parser is None:
+        __parser = etree.XMLParser(resolve_entities=False, no_network=True, load_dtd=False, huge_tree=False)
+        _parsers.parser = __parser
+    return __parser
+
+
+class InvalidRequestError(ValueError):
+    """The request body is not a well formed USSD <msg> document"""
+
+
+class USSDRequest:
+    """Parsed USSD gateway request, fields are also readable by key for dict style callers"""
+    __slots__ = ("msisdn", "session_id", "request_phase", "request_type", "request_input")
+
+    def __init__(self, msisdn: str, session_id: str, request_phase: str, request_type: str, request_input: str):
+        self.msisdn = msisdn
+        self.session_id = session_id
+        self.request_phase = request_phase
+        self.request_type = request_type
+        self.request_input = request_input
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def to_dict(self):
+        return {__field: getattr(self, __field) for __field in self.__slots__}
+
+    def __repr__(self):
+        return f"USSDRequest({self.to_dict()})"
+
+
+def parse_request(xml_post_data: bytes):
+    """
+    Parse and validate a USSD request in a single pass over the <msg> children
+    :param xml_post_data: raw request body
+    :return: USSDRequest
+    :raises InvalidRequestError: malformed XML, wrong root element or a missing/empty field
+    """
+    try:
+        __root = etree.fromstring(xml_post_data, _get_parser())
+    except (etree.XMLSyntaxError, ValueError) as e:
+        raise InvalidRequestError(f"Malformed USSD request: {str(e)}")
+
+    if __root.tag != "msg":
+        raise InvalidRequestError(f"Unexpected USSD request root element <{__root.tag}>")
+
+    __fields = {}
+    for __element in __root:
+        __tag = __element.tag
+        if __tag in REQUEST_FIELDS:
+            __fields[REQUEST_FIELDS[__tag]] = __element.text or ""
+        elif __tag == "request":
+            __fields["request_type"] = __element.get("type")
+            __fields["request_input"] = __element.text or ""
+
+    for __field in ("msisdn", "session_id", "request_phase", "request_type"):
+        if not __fields.get(__field):
+            raise InvalidRequestError(f"USSD request is missing {__field}")
+    if "request_input" not in __fields:
+        raise InvalidRequestError("USSD request is missing request_input")
+
+    return USSDRequest(**__fields)
 
 
 # request handler
@@ -6,29 +82,9 @@ class XMLRequestParser:
     def __init__(self, xml_post_data: bytes = None):
         super().__init__()
 
+        self.__request_data = None
         if xml_post_data:
-            self.__request_body = str(xml_post_data.decode("UTF-8"))
-            self.__request_data = self.__request_data_to_json()
-
-    def __request_data_to_json(self):
-        """
-        transform request xml to json format
-        :return: dict
-        """
-        request_data = BeautifulSoup(self.__request_body, features="xml")
-        if not request_data:
-            return None
-
-        return {
-            "msisdn": request_data.find("msisdn").text,
-            "session_id": request_data.find("sessionid").text,
-            "request_phase": request_data.find("phase").text,
-            "request_type": request_data.find("request")["type"],
-            "request_input": request_data.find("request").text
-        }
-
-    def __generate_response_body(self, **kwargs):
-        pass
+            self.__request_data = parse_request(xml_post_data)
 
     def get_request_data(self):
         return self.__request_data
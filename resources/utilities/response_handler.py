@@ -1,24 +1,90 @@
+import os
+import re
+import time
 import uuid
+import itertools
 from resources.static.response_templates import RESPONSE_MESSAGE_TEMPLATE
 
+# compile the template once into the literal segments around its placeholders
+RESPONSE_PLACEHOLDERS = ["SESSION_ID", "RESPONSE_TYPE", "MESSAGE", "PREMIUM_REFERENCE"]
+if re.findall(r"{(\w+)}", RESPONSE_MESSAGE_TEMPLATE) != RESPONSE_PLACEHOLDERS:
+    raise ValueError(f"RESPONSE_MESSAGE_TEMPLATE must use the placeholders {RESPONSE_PLACEHOLDERS} in that order")
+RESPONSE_SEGMENTS = tuple(re.split(r"{\w+}", RESPONSE_MESSAGE_TEMPLATE))
+
+XML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "'": "&apos;", '"': "&quot;"})
+
+# premium reference: uuid4 (default) or monotonic, a per process prefix plus a counter
+PREMIUM_REFERENCE_MODE = os.environ.get("USSD_PREMIUM_REFERENCE", "uuid").lower()
+_reference_prefix = f"{os.getpid():x}-{int(time.time()):x}-"
+_reference_counter = itertools.count(1)
+
+
+def _reset_reference_counter():
+    """Forked workers (e.g. preloading servers) need their own prefix or references would repeat"""
+    global _reference_prefix, _reference_counter
+    _reference_prefix = f"{os.getpid():x}-{int(time.time()):x}-"
+    _reference_counter = itertools.count(1)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_reference_counter)
+
+
+def escape_xml(value: str):
+    """
+    Escape text for XML element content and quoted attributes, skipping the copy when nothing needs escaping
+    :return: str
+    """
+    if "&" in value or "<" in value or ">" in value or "'" in value or '"' in value:
+        return value.translate(XML_ESCAPES)
+    return value
+
+
+def uuid_reference():
+    return str(uuid.uuid4())
+
+
+def monotonic_reference():
+    """
+    Unique, increasing reference without the cost of uuid4: process id and start time plus a counter
+    :return: str
+    """
+    return f"{_reference_prefix}{next(_reference_counter):010d}"
+
+
+def render_response(session_id: str, response_type, message: str, premium_reference: str):
+    """
+    Render RESPONSE_MESSAGE_TEMPLATE in a single join, escaping the caller supplied values
+    :return: str
+    """
+    __before_session, __before_type, __before_message, __before_reference, __tail = RESPONSE_SEGMENTS
+    return "".join((__before_session, escape_xml(str(session_id)), __before_type, escape_xml(str(response_type)),
+                    __before_message, escape_xml(message), __before_reference, premium_reference, __tail))
+
 
 # response handler
 class XMLResponseBuilder:
-    def __init__(self, session_id: str, message: str, response_type: int):
+    __slots__ = ("__session_id", "__message", "__response_type", "__premium_reference")
+
+    def __init__(self, session_id: str, message: str, response_type: int, reference_mode: str = None):
         super().__init__()
 
         # generate transaction premium reference
-        self.__premium_reference = uuid.uuid4()
+        __mode = reference_mode or PREMIUM_REFERENCE_MODE
+        self.__premium_reference = monotonic_reference() if __mode == "monotonic" else uuid_reference()
         self.__session_id = session_id
         self.__message = message
-        self.__response_type = str(response_type)
+        self.__response_type = response_type
 
     def __generate_response_xml(self):
-        __response_message = RESPONSE_MESSAGE_TEMPLATE.replace("{SESSION_ID}", self.__session_id) \
-            .replace("{RESPONSE_TYPE}", self.__response_type).replace("{MESSAGE}", self.__message) \
-            .replace("{PREMIUM_REFERENCE}", str(self.__premium_reference))
-
-        return __response_message
+        return render_response(self.__session_id, self.__response_type, self.__message, self.__premium_reference)
 
     def get_response_body(self):
-        return self.__generate_response_xml()
\ No newline at end of file
+        return self.__generate_response_xml()
+
+    def get_response_bytes(self):
+        """
+        UTF-8 encoded response body, ready to hand to flask.make_response
+        :return: bytes
+        """
+        return self.__generate_response_xml().encode("utf-8")
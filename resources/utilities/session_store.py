@@ -0,0 +1,357 @@
+"""
+Fast session store for USSD sessions
+
+Backends (USSD_SESSION_STORE):
+- oracle: no store, sessions are read and written synchronously in CDC_USSD_SESSION (default)
+- memory: in-process LRU/TTL store, for single worker deployments
+- shared: store served over a local socket by `python -m resources.utilities.session_store`, for multi-worker deployments
+
+The shared store exchanges pickled objects, anyone able to connect with the authkey can run code in the server and
+the workers. USSD_SESSION_STORE_AUTHKEY is therefore required, and USSD_SESSION_STORE_ADDRESS is a unix socket path
+or a loopback host:port unless USSD_SESSION_STORE_ALLOW_REMOTE=true.
+
+With a store configured, CDC_USSD_SESSION is written behind in batches for audit.
+"""
+import os
+import abc
+import time
+import queue
+import atexit
+import logging
+import threading
+import ipaddress
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+
+from resources.utilities.database.oracle import exadata_db
+from resources.utilities.database.profiler import ProfiledCursor
+
+
+class SessionStore(abc.ABC):
+    """Session store interface, records are dicts keyed by session uid"""
+
+    @abc.abstractmethod
+    def get(self, session_uid: str):
+        """:return: the session record, None on a miss"""
+
+    @abc.abstractmethod
+    def set(self, session_uid: str, record: dict):
+        """Store the session record"""
+
+    @abc.abstractmethod
+    def delete(self, session_uid: str):
+        """Drop the session record"""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store with least recently used eviction and a time to live per session"""
+
+    def __init__(self, max_size: int = 10000, ttl: int = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__records = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, session_uid: str):
+        with self.__lock:
+            __entry = self.__records.get(session_uid)
+            if __entry is None:
+                return None
+            __expires_at, __record = __entry
+            if __expires_at < time.monotonic():
+                del self.__records[session_uid]
+                return None
+            self.__records.move_to_end(session_uid)
+            return dict(__record)
+
+    def set(self, session_uid: str, record: dict):
+        with self.__lock:
+            self.__records[session_uid] = (time.monotonic() + self.ttl, dict(record))
+            self.__records.move_to_end(session_uid)
+            while len(self.__records) > self.max_size:
+                self.__records.popitem(last=False)
+
+    def delete(self, session_uid: str):
+        with self.__lock:
+            self.__records.pop(session_uid, None)
+
+    def __len__(self):
+        return len(self.__records)
+
+
+class SessionStoreManager(BaseManager):
+    """Serves the shared store"""
+    pass
+
+
+class SessionStoreClient(BaseManager):
+    """Connects workers to the shared store"""
+    pass
+
+
+SessionStoreClient.register("get_store")
+
+
+def is_loopback(host: str):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False
+
+
+def get_store_address():
+    """
+    USSD_SESSION_STORE_ADDRESS is a unix socket path or host:port, a host other than loopback is refused unless
+    USSD_SESSION_STORE_ALLOW_REMOTE=true
+    """
+    __address = os.environ.get("USSD_SESSION_STORE_ADDRESS", "/tmp/cdc_ussd_session_store.sock")
+    if ":" not in __address:
+        return __address
+    __host, __port = __address.rsplit(":", 1)
+    if not is_loopback(__host) and os.environ.get("USSD_SESSION_STORE_ALLOW_REMOTE", "false").lower() != "true":
+        raise ValueError(f"Shared session store address {__address} is not a loopback address, "
+                         f"set USSD_SESSION_STORE_ALLOW_REMOTE=true to serve it over the network")
+    return __host, int(__port)
+
+
+def get_store_authkey():
+    """USSD_SESSION_STORE_AUTHKEY authenticates the workers to the shared store, there is no default"""
+    __authkey = os.environ.get("USSD_SESSION_STORE_AUTHKEY")
+    if not __authkey:
+        raise ValueError("USSD_SESSION_STORE_AUTHKEY is required for the shared session store")
+    return __authkey.encode("UTF-8")
+
+
+class SharedSessionStore(SessionStore):
+    """
+    Client for a MemorySessionStore served over a local socket, shared by all workers on the host.
+    Store errors are logged and treated as misses so the session falls back to CDC_USSD_SESSION.
+    """
+
+    def __init__(self, address=None, authkey: bytes = None):
+        # fails on a missing authkey or a remote address, so a misconfigured worker does not start
+        self.address = address or get_store_address()
+        self.authkey = authkey or get_store_authkey()
+        self.__store = None
+        self.__lock = threading.Lock()
+
+    def __get_store(self):
+        if self.__store is None:
+            with self.__lock:
+                if self.__store is None:
+                    __manager = SessionStoreClient(address=self.address, authkey=self.authkey)
+                    __manager.connect()
+                    self.__store = __manager.get_store()
+        return self.__store
+
+    def __call(self, method: str, *args):
+        try:
+            return getattr(self.__get_store(), method)(*args)
+        except Exception as e:
+            logging.error(f"Shared session store {method} failed: {str(e)}")
+            self.__store = None
+            return None
+
+    def get(self, session_uid: str):
+        return self.__call("get", session_uid)
+
+    def set(self, session_uid: str, record: dict):
+        self.__call("set", session_uid, record)
+
+    def delete(self, session_uid: str):
+        self.__call("delete", session_uid)
+
+
+def serve_session_store(address=None, authkey: bytes = None):
+    """Serve a MemorySessionStore to the workers on this host, blocks forever"""
+    __store = MemorySessionStore(max_size=int(os.environ.get("USSD_SESSION_STORE_SIZE", 10000)),
+                                 ttl=int(os.environ.get("USSD_SESSION_STORE_TTL", 300)))
+    SessionStoreManager.register("get_store", callable=lambda: __store)
+    __manager = SessionStoreManager(address=address or get_store_address(), authkey=authkey or get_store_authkey())
+    __manager.get_server().serve_forever()
+
+
+def create_session_store(backend: str = None):
+    """
+    Build the store configured by USSD_SESSION_STORE
+    :return: SessionStore or None for the oracle backend
+    """
+    backend = (backend or os.environ.get("USSD_SESSION_STORE", "oracle")).lower()
+    if backend == "memory":
+        return MemorySessionStore(max_size=int(os.environ.get("USSD_SESSION_STORE_SIZE", 10000)),
+                                  ttl=int(os.environ.get("USSD_SESSION_STORE_TTL", 300)))
+    if backend == "shared":
+        return SharedSessionStore()
+    if backend != "oracle":
+        logging.error(f"Unknown session store backend '{backend}', using oracle")
+    return None
+
+
+class SessionWriteBehind:
+    """
+    Background writer that persists session changes to CDC_USSD_SESSION in batches.
+    Inserts of a batch are applied before its updates, so a session created and moved within one batch stays ordered.
+    A batch that fails (e.g. no pooled connection in time) is retried with backoff; rows Oracle rejects are dropped
+    on their own and the rest of the batch is still written. Every dropped operation is counted in dropped.
+    """
+    INSERT_QUERY = "INSERT INTO CDC_USSD_SESSION (SESSION_UID, CURRENT_STATE, CURRENT_STATE_ALIAS, CURRENT_STATE_PHASE, " \
+                   "MSISDN, USER_INPUT, CREATED_ON, MODIFIED_ON) VALUES (:session_uid, :current_state, " \
+                   ":current_state_alias, :current_state_phase, :msisdn, :user_input, SYSDATE, SYSDATE)"
+    UPDATE_QUERY = "UPDATE CDC_USSD_SESSION SET CURRENT_STATE=:current_state, CURRENT_STATE_ALIAS=:current_state_alias, " \
+                   "CURRENT_STATE_PHASE=:current_state_phase WHERE SESSION_UID=:session_uid"
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None, max_queue: int = None,
+                 retries: int = None, retry_backoff: float = None):
+        self.batch_size = batch_size or int(os.environ.get("USSD_SESSION_WRITE_BATCH", 100))
+        self.flush_interval = flush_interval or float(os.environ.get("USSD_SESSION_WRITE_INTERVAL", 1.0))
+        self.retries = retries if retries is not None else int(os.environ.get("USSD_SESSION_WRITE_RETRIES", 3))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else \
+            float(os.environ.get("USSD_SESSION_WRITE_BACKOFF", 0.5))
+        self.__queue = queue.Queue(maxsize=max_queue or int(os.environ.get("USSD_SESSION_WRITE_QUEUE", 10000)))
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.__stats_lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.retried = 0
+
+    def start(self):
+        with self.__lock:
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__thread = threading.Thread(target=self.__run, name="session-write-behind", daemon=True)
+                self.__thread.start()
+                atexit.register(self.stop)
+
+    def enqueue_insert(self, record: dict):
+        self.__enqueue(("insert", {
+            "session_uid": record["session_uid"],
+            "current_state": record["current_state"],
+            "current_state_alias": record["current_state_alias"],
+            "current_state_phase": record["current_state_phase"],
+            "msisdn": record["msisdn"],
+            "user_input": record["user_input"]
+        }))
+
+    def enqueue_update(self, record: dict):
+        self.__enqueue(("update", {
+            "session_uid": record["session_uid"],
+            "current_state": record["current_state"],
+            "current_state_alias": record["current_state_alias"],
+            "current_state_phase": record["current_state_phase"]
+        }))
+
+    def __enqueue(self, operation: tuple):
+        self.start()
+        try:
+            self.__queue.put_nowait(operation)
+        except queue.Full:
+            self.__count(dropped=1)
+            logging.error(f"Session write-behind queue full, dropped {operation[0]} for {operation[1]['session_uid']}")
+
+    def pending(self):
+        return self.__queue.qsize()
+
+    def __count(self, dropped: int = 0, written: int = 0, retried: int = 0):
+        with self.__stats_lock:
+            self.dropped += dropped
+            self.written += written
+            self.retried += retried
+
+    def get_stats(self):
+        with self.__stats_lock:
+            return {"pending": self.pending(), "written": self.written, "dropped": self.dropped,
+                    "retried": self.retried}
+
+    def __run(self):
+        while True:
+            __operation = self.__queue.get()
+            if __operation is None:
+                return
+
+            # collect a batch for at most flush_interval seconds
+            __batch = [__operation]
+            __stop = False
+            __deadline = time.monotonic() + self.flush_interval
+            while len(__batch) < self.batch_size:
+                __remaining = __deadline - time.monotonic()
+                if __remaining <= 0:
+                    break
+                try:
+                    __operation = self.__queue.get(timeout=__remaining)
+                except queue.Empty:
+                    break
+                if __operation is None:
+                    __stop = True
+                    break
+                __batch.append(__operation)
+
+            self.flush(__batch)
+            if __stop:
+                return
+
+    def flush(self, batch: list):
+        __inserts = [params for operation, params in batch if operation == "insert"]
+        __updates = [params for operation, params in batch if operation == "update"]
+        for __attempt in range(self.retries + 1):
+            if __attempt:
+                self.__count(retried=1)
+                time.sleep(self.retry_backoff * 2 ** (__attempt - 1))
+            try:
+                __rejected = self.__write(__inserts, __updates)
+            except Exception as e:
+                logging.error(f"Session write-behind failed for {len(batch)} operations "
+                              f"(attempt {__attempt + 1} of {self.retries + 1}): {str(e)}")
+                continue
+            self.__count(dropped=__rejected, written=len(batch) - __rejected)
+            return
+        self.__count(dropped=len(batch))
+        logging.error(f"Session write-behind dropped {len(batch)} operations after {self.retries + 1} attempts")
+
+    def __write(self, inserts: list, updates: list):
+        """
+        Write one batch in one transaction, rows Oracle rejects are skipped
+        :return: number of rejected rows
+        """
+        __rejected = 0
+        with exadata_db.connection() as conn:
+            cursor = ProfiledCursor(conn.cursor())
+            try:
+                for __query, __rows in ((self.INSERT_QUERY, inserts), (self.UPDATE_QUERY, updates)):
+                    if not __rows:
+                        continue
+                    cursor.executemany(__query, __rows, batcherrors=True)
+                    for __error in cursor.getbatcherrors() or []:
+                        __rejected += 1
+                        logging.error(f"Session write-behind dropped row for session "
+                                      f"{__rows[__error.offset]['session_uid']}: {__error.message}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return __rejected
+
+    def stop(self, timeout: float = 5.0):
+        """Flush whatever is queued and stop the writer"""
+        __thread = self.__thread
+        if __thread is None or not __thread.is_alive():
+            return
+        try:
+            self.__queue.put(None, timeout=timeout)
+        except queue.Full:
+            logging.error(f"Session write-behind stopped with {self.pending()} operations pending")
+            return
+        __thread.join(timeout)
+
+
+session_store = create_session_store()
+session_write_behind = SessionWriteBehind()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logging.info(f"Serving USSD session store on {get_store_address()}")
+    serve_session_store()
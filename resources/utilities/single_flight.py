@@ -0,0 +1,55 @@
+import threading
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the function, callers arriving while it runs
+    wait for it and get the same result (or exception) instead of running it again. Nothing is kept once the call
+    returns, later callers run the function again (see TTLCache for keeping results).
+    """
+
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+        self.__calls = {}
+        self.__lock = threading.Lock()
+        self.__stats = {"calls": 0, "shared": 0, "timeouts": 0}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        :return: (result, shared), shared is True when the result came from another caller's call
+        """
+        with self.__lock:
+            self.__stats["calls"] += 1
+            __call = self.__calls.get(key)
+            __leader = __call is None
+            if __leader:
+                __call = self.__calls[key] = {"done": threading.Event(), "result": None, "error": None}
+            else:
+                self.__stats["shared"] += 1
+
+        if not __leader:
+            if __call["done"].wait(self.timeout):
+                if __call["error"] is not None:
+                    raise __call["error"]
+                return __call["result"], True
+            # the first call is stuck, do not let every duplicate wait on it
+            with self.__lock:
+                self.__stats["timeouts"] += 1
+            return func(*args, **kwargs), False
+
+        try:
+            __call["result"] = func(*args, **kwargs)
+            return __call["result"], False
+        except Exception as e:
+            __call["error"] = e
+            raise
+        finally:
+            with self.__lock:
+                self.__calls.pop(key, None)
+            __call["done"].set()
+
+    def get_stats(self):
+        with self.__lock:
+            __stats = dict(self.__stats)
+            __stats["in_flight"] = len(self.__calls)
+        return __stats
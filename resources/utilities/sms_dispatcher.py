@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from resources.utilities.structured_logging import get_log_context, restore_log_context
+from resources.utilities.tracing import trace_request
+
+dispatch_logger = logging.getLogger('sms_dispatcher')
+
+
+class SMSDispatcher:
+    """
+    Background pipeline for SMS work that the USSD reply should not wait on.
+
+    Jobs are named handlers with JSON-serialisable keyword arguments. They are queued on a bounded queue and run by
+    a pool of worker threads. When a spool directory is configured every accepted job is also written to disk and only
+    removed once it has run, so jobs pending at shutdown are replayed on the next start. The spool may be shared by
+    several server processes: a job file is claimed with an atomic rename before the job runs, so a job replayed by a
+    starting process while another process still has it queued runs only once.
+    With zero workers jobs run inline in the calling thread.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 1000, spool_dir: str = None):
+        self.workers = workers
+        self.spool_dir = spool_dir
+        self.__queue = queue.Queue(maxsize=max_queue)
+        self.__handlers = {}
+        self.__threads = []
+        self.__lock = threading.Lock()
+        self.__stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "in_flight": 0,
+                        "queue_wait_total": 0.0, "queue_wait_max": 0.0, "latency_total": 0.0, "latency_max": 0.0,
+                        "latency_last": 0.0}
+
+    def register(self, name: str, handler):
+        self.__handlers[name] = handler
+
+    def start(self):
+        """Start the workers and replay the spool, called at server startup and again (a no-op) by submit"""
+        with self.__lock:
+            if self.__threads or self.workers <= 0:
+                return
+            for __index in range(self.workers):
+                __thread = threading.Thread(target=self.__run, name=f"sms-dispatch-{__index}", daemon=True)
+                __thread.start()
+                self.__threads.append(__thread)
+            atexit.register(self.stop)
+
+        if self.spool_dir:
+            threading.Thread(target=self.__replay_spool, name="sms-dispatch-replay", daemon=True).start()
+
+    def submit(self, name: str, **kwargs):
+        """
+        Accept a job for background processing
+        :return: True if the job was accepted, False if the queue is full
+        """
+        if name not in self.__handlers:
+            raise ValueError(f"No SMS dispatch handler registered for '{name}'")
+
+        self.start()
+        __job = {"job_id": str(uuid.uuid4()), "name": name, "kwargs": kwargs, "enqueued_at": time.time(),
+                 "log_context": get_log_context()}
+        if self.workers <= 0:
+            with self.__lock:
+                self.__stats["submitted"] += 1
+            self.__process(__job)
+            return True
+
+        # spool before queueing so a worker never finishes a job that is not on disk yet
+        self.__spool(__job)
+        try:
+            self.__queue.put_nowait(__job)
+        except queue.Full:
+            self.__unspool(__job, ".json")
+            with self.__lock:
+                self.__stats["rejected"] += 1
+            dispatch_logger.error(f"SMS dispatch queue full, rejected {name} job {kwargs}")
+            return False
+
+        with self.__lock:
+            self.__stats["submitted"] += 1
+        return True
+
+    def __spool(self, job: dict):
+        if not self.spool_dir:
+            return
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            __path = self.__spool_path(job, ".json")
+            job["spooled"] = True
+            with open(f"{__path}.tmp", "w", encoding="utf-8") as spool_file:
+                json.dump(job, spool_file)
+            os.replace(f"{__path}.tmp", __path)
+        except Exception as e:
+            job["spooled"] = False
+            dispatch_logger.error(f"Failed to spool SMS job {job['job_id']}: {str(e)}")
+
+    def __spool_path(self, job: dict, suffix: str):
+        return os.path.join(self.spool_dir, f"{job['job_id']}{suffix}")
+
+    def __claim(self, job: dict):
+        """
+        Take a spooled job for this process
+        :return: False if another process (or an earlier copy in this one) has already claimed it
+        """
+        if not job.get("spooled"):
+            return True
+        try:
+            os.rename(self.__spool_path(job, ".json"), self.__spool_path(job, ".claimed"))
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            dispatch_logger.error(f"Failed to claim SMS job {job['job_id']}, running it anyway: {str(e)}")
+        return True
+
+    def __unspool(self, job: dict, suffix: str = ".claimed"):
+        if not job.get("spooled"):
+            return
+        try:
+            os.remove(self.__spool_path(job, suffix))
+        except FileNotFoundError:
+            pass
+
+    def __replay_spool(self):
+        """
+        Re-queue the jobs waiting in the spool. Claimed jobs are running in another process, or were interrupted by
+        a process that stopped while running them; they are left in place as the SMS may already have been sent.
+        """
+        try:
+            __files = sorted(os.listdir(self.spool_dir))
+        except FileNotFoundError:
+            return
+
+        __claimed = [f for f in __files if f.endswith(".claimed")]
+        if __claimed:
+            dispatch_logger.warning(f"{len(__claimed)} SMS jobs in {self.spool_dir} are claimed, running "
+                                    f"elsewhere or interrupted, and are not replayed: {', '.join(__claimed[:10])}")
+
+        for __file in (f for f in __files if f.endswith(".json")):
+            try:
+                with open(os.path.join(self.spool_dir, __file), encoding="utf-8") as spool_file:
+                    __job = json.load(spool_file)
+            except FileNotFoundError:
+                # claimed meanwhile
+                continue
+            except Exception as e:
+                dispatch_logger.error(f"Skipping unreadable SMS spool file {__file}: {str(e)}")
+                continue
+            __job["spooled"] = True
+            dispatch_logger.info(f"Replaying spooled SMS job {__job['job_id']}")
+            self.__queue.put(__job)
+
+    def __run(self):
+        while True:
+            __job = self.__queue.get()
+            if __job is None:
+                return
+            self.__process(__job)
+
+    def __process(self, job: dict):
+        if not self.__claim(job):
+            dispatch_logger.info(f"SMS job {job['job_id']} ({job['name']}) already run by another worker")
+            return
+        # log with the context of the request that submitted the job, the job is traced on its own
+        with restore_log_context(job.get("log_context")), trace_request(f"sms_job.{job['name']}"):
+            self.__run_job(job)
+
+    def __run_job(self, job: dict):
+        __started = time.time()
+        __queue_wait = __started - job["enqueued_at"]
+        with self.__lock:
+            self.__stats["in_flight"] += 1
+
+        __success = False
+        try:
+            __result = self.__handlers[job["name"]](**job["kwargs"])
+            __success = not (isinstance(__result, dict) and __result.get("success") is False)
+        except Exception as e:
+            dispatch_logger.exception(f"SMS job {job['job_id']} ({job['name']}) failed: {str(e)}")
+        finally:
+            self.__unspool(job)
+
+        __latency = time.time() - job["enqueued_at"]
+        with self.__lock:
+            self.__stats["in_flight"] -= 1
+            self.__stats["completed" if __success else "failed"] += 1
+            self.__stats["queue_wait_total"] += __queue_wait
+            self.__stats["queue_wait_max"] = max(self.__stats["queue_wait_max"], __queue_wait)
+            self.__stats["latency_total"] += __latency
+            self.__stats["latency_max"] = max(self.__stats["latency_max"], __latency)
+            self.__stats["latency_last"] = __latency
+        dispatch_logger.info(f"SMS job {job['job_id']} ({job['name']}) {'completed' if __success else 'failed'} "
+                             f"in {__latency:.3f}s (queued {__queue_wait:.3f}s)")
+
+    def queue_depth(self):
+        return self.__queue.qsize()
+
+    def get_stats(self):
+        with self.__lock:
+            __stats = dict(self.__stats)
+        __processed = __stats["completed"] + __stats["failed"]
+        __stats["queue_depth"] = self.queue_depth()
+        __stats["workers"] = self.workers
+        __stats["queue_wait_avg"] = __stats["queue_wait_total"] / __processed if __processed else 0.0
+        __stats["latency_avg"] = __stats["latency_total"] / __processed if __processed else 0.0
+        return __stats
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the workers once the jobs already queued have run"""
+        with self.__lock:
+            __threads, self.__threads = self.__threads, []
+        for _ in __threads:
+            self.__queue.put(None)
+        __deadline = time.monotonic() + timeout
+        for __thread in __threads:
+            __thread.join(max(0.0, __deadline - time.monotonic()))
+
+
+sms_dispatcher = SMSDispatcher(workers=int(os.environ.get("SMS_DISPATCH_WORKERS", 4)),
+                               max_queue=int(os.environ.get("SMS_DISPATCH_QUEUE_SIZE", 1000)),
+                               spool_dir=os.environ.get("SMS_DISPATCH_SPOOL_DIR") or None)
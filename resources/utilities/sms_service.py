@@ -1,32 +1,25 @@
 import os
+import time
 import base64
-import requests
 import logging
-from typing import Dict, Any, Optional
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, List
 from dotenv import load_dotenv
+from resources.utilities.http_pool import HTTPSessionPool
+from resources.utilities.tracing import traced
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'logs')
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-# Set up logger for SMS service
+# written to logs/sms.log, see resources/utilities/structured_logging.py
 sms_logger = logging.getLogger('sms_service')
-sms_logger.setLevel(logging.INFO)
-
-# Create file handler
-file_handler = logging.FileHandler(os.path.join(log_dir, 'sms.log'))
-file_handler.setLevel(logging.INFO)
 
-# Create formatter
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-
-# Add handler to logger
-sms_logger.addHandler(file_handler)
+# keep-alive connections to BulkSMS, the read timeout stays below the time callers wait for a batched message
+bulksms_http_pool = HTTPSessionPool(name="BulkSMS",
+                                    pool_size=int(os.environ.get("BULKSMS_HTTP_POOL_SIZE", 10)),
+                                    connect_timeout=float(os.environ.get("BULKSMS_HTTP_CONNECT_TIMEOUT", 3)),
+                                    read_timeout=float(os.environ.get("BULKSMS_HTTP_READ_TIMEOUT", 10)))
 
 class SMSService:
     """Service for sending SMS messages using BulkSMS API with token authentication"""
@@ -37,8 +30,8 @@ class SMSService:
         self.token_secret = os.environ.get('BULKSMS_TOKEN_SECRET')
         self.api_url = os.environ.get('BULKSMS_API_URL')
         # Check if we're in simulation mode (no actual SMS sent)
-        # self.simulation_mode = os.environ.get('SMS_SIMULATION_MODE', 'false').lower() == 'true'
-        self.simulation_mode = True  # For testing purposes, always in simulation mode
+        # Simulation stays the default, SMS_SIMULATION_MODE=false sends for real (e.g. to the load test BulkSMS fake)
+        self.simulation_mode = os.environ.get('SMS_SIMULATION_MODE', 'true').lower() == 'true'
         
         # Use the configured logger
         self.logger = sms_logger
@@ -63,6 +56,7 @@ class SMSService:
         encoded = base64.b64encode(auth_string.encode('utf-8')).decode('utf-8')
         return {"Authorization": f"Basic {encoded}"}
 
+    @traced("SMSService.send_message")
     def send_message(self, to: str, body: str) -> Dict[str, Any]:
         """
         Send an SMS message
@@ -103,7 +97,7 @@ class SMSService:
         
         try:
             self.logger.debug(f"Sending SMS to {to}")
-            response = requests.post(
+            response = bulksms_http_pool.post(
                 self.api_url,
                 headers=headers,
                 json=payload
@@ -132,6 +126,12 @@ class SMSService:
                         'message_id': 'unknown',
                         'response': result
                     }
+
+            self.logger.error(f"SMS to {to} rejected with status {response.status_code}: {response.text}")
+            return {
+                'success': False,
+                'error': f"BulkSMS returned status {response.status_code}"
+            }
                 
         except Exception as e:
             self.logger.exception(f"Error sending SMS: {str(e)}")
@@ -139,6 +139,188 @@ class SMSService:
                 'success': False,
                 'error': str(e)
             }
+
+    @traced("SMSService.send_messages")
+    def send_messages(self, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Send several SMS messages in one request to the BulkSMS multi-message API
+        
+        Args:
+            messages: List of dicts with 'to' and 'body'
+            
+        Returns:
+            List of status dicts, one per message in the same order
+        """
+        if self.simulation_mode:
+            for message in messages:
+                self.logger.info(f"SIMULATION MODE: Would send SMS to {message['to']}: {message['body']}")
+            return [{'success': True, 'simulated': True, 'message_id': f'simulation-{i:04d}'}
+                    for i in range(len(messages))]
+
+        if not all([self.token_id, self.token_secret, self.api_url]):
+            return [{'success': False, 'error': 'SMS service not configured'} for _ in messages]
+
+        results = [{'success': False, 'error': 'Missing recipient or message body'} for _ in messages]
+        payload = []
+        positions = []
+        for i, message in enumerate(messages):
+            to, body = message.get('to'), message.get('body')
+            if not to or not body:
+                continue
+            payload.append({
+                'to': to if to.startswith('+') else f"+{to}",
+                'body': body,
+                'encoding': 'TEXT',
+            })
+            positions.append(i)
+
+        if not payload:
+            return results
+
+        headers = {
+            'Content-Type': 'application/json',
+            **self._get_authorization_header()
+        }
+
+        try:
+            self.logger.debug(f"Sending {len(payload)} SMS messages in one request")
+            response = bulksms_http_pool.post(
+                self.api_url,
+                headers=headers,
+                json=payload
+            )
+
+            if response.status_code not in (200, 201):
+                self.logger.error(f"SMS batch of {len(payload)} rejected with status {response.status_code}: {response.text}")
+                # BulkSMS took none of the messages of a 4xx batch (e.g. one bad recipient), they are sent one by
+                # one; after a 5xx the batch may have gone through
+                for i in positions:
+                    results[i] = {'success': False, 'error': f"BulkSMS returned status {response.status_code}",
+                                  'retry': 400 <= response.status_code < 500}
+                return results
+
+            result = response.json()
+        except Exception as e:
+            # the batch may have been accepted, do not retry it message by message
+            self.logger.exception(f"Error sending SMS batch: {str(e)}")
+            for i in positions:
+                results[i] = {'success': False, 'error': str(e)}
+            return results
+
+        if not isinstance(result, list):
+            self.logger.error(f"Unexpected BulkSMS batch response: {result}")
+            result = []
+
+        # BulkSMS answers with one entry per submitted message, in submission order
+        for position, (i, message) in enumerate(zip(positions, payload)):
+            if position >= len(result) or not isinstance(result[position], dict):
+                results[i] = {'success': False, 'error': 'Message missing from BulkSMS batch response'}
+                continue
+            message_result = result[position]
+            if (message_result.get('status') or {}).get('type') == 'FAILED':
+                results[i] = {'success': False, 'error': f"BulkSMS rejected the message to {message['to']}",
+                              'retry': True, 'response': message_result}
+            else:
+                results[i] = {
+                    'success': True,
+                    'message_id': message_result.get('id', 'unknown'),
+                    'response': message_result
+                }
+
+        self.logger.info(f"SMS batch sent: {sum(1 for r in results if r['success'])}/{len(messages)} accepted")
+        return results
+
+
+class SMSBatchSender:
+    """
+    Coalesces outgoing SMS messages into BulkSMS multi-message requests
+
+    Messages are collected for at most max_wait seconds or until max_batch messages are pending, then sent in one
+    request. Each caller gets the result for its own message. Only messages BulkSMS explicitly did not take (rejected
+    in the response, or the whole request refused with a 4xx) are retried with a single send, a message that may
+    have gone out is never sent twice.
+    """
+
+    def __init__(self, service: SMSService, max_batch: int = 50, max_wait: float = 0.25):
+        self.service = service
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.logger = service.logger
+        self.__pending = []
+        self.__condition = threading.Condition()
+        self.__lock = threading.Lock()
+        self.__thread = None
+        self.__stats = {"batches": 0, "messages": 0, "fallbacks": 0}
+
+    def submit(self, to: str, body: str) -> Future:
+        """
+        Queue a message for the next batch
+        
+        Returns:
+            Future resolving to the status dict of this message
+        """
+        future = Future()
+        with self.__condition:
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__thread = threading.Thread(target=self.__run, name="sms-batch-sender", daemon=True)
+                self.__thread.start()
+            self.__pending.append(({'to': to, 'body': body}, future))
+            self.__condition.notify()
+        return future
+
+    def send_message(self, to: str, body: str, timeout: float = 30) -> Dict[str, Any]:
+        """Drop-in replacement for SMSService.send_message that waits for the batch carrying this message"""
+        return self.submit(to, body).result(timeout=timeout)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while not self.__pending:
+                    self.__condition.wait()
+                deadline = time.monotonic() + self.max_wait
+                while len(self.__pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.__condition.wait(remaining)
+                batch, self.__pending = self.__pending[:self.max_batch], self.__pending[self.max_batch:]
+            self.__flush(batch)
+
+    def __flush(self, batch):
+        try:
+            results = self.service.send_messages([message for message, _ in batch])
+        except Exception as e:
+            self.logger.exception(f"Error sending SMS batch: {str(e)}")
+            results = [None] * len(batch)
+
+        with self.__lock:
+            self.__stats["batches"] += 1
+            self.__stats["messages"] += len(batch)
+        for (message, future), result in zip(batch, results):
+            if result and result.get('retry'):
+                with self.__lock:
+                    self.__stats["fallbacks"] += 1
+                try:
+                    result = self.service.send_message(to=message['to'], body=message['body'])
+                except Exception as e:
+                    result = {'success': False, 'error': str(e)}
+            elif not result:
+                result = {'success': False, 'error': 'SMS batch failed'}
+            future.set_result(result)
+
+    def get_stats(self):
+        with self.__condition:
+            pending = len(self.__pending)
+        with self.__lock:
+            stats = dict(self.__stats)
+        return {**stats, "pending": pending, "max_batch": self.max_batch, "max_wait": self.max_wait}
+
     
 # Create a singleton instance for import
-sms_service = SMSService()
\ No newline at end of file
+sms_service = SMSService()
+
+# Batch mode coalesces messages into multi-message requests
+sms_batch_sender = SMSBatchSender(sms_service,
+                                  max_batch=int(os.environ.get('SMS_BATCH_SIZE', 50)),
+                                  max_wait=float(os.environ.get('SMS_BATCH_WAIT', 0.25))) \
+    if os.environ.get('SMS_BATCH_MODE', 'false').lower() == 'true' else None
\ No newline at end of file
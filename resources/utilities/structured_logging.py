@@ -0,0 +1,252 @@
+"""
+Non-blocking structured logging.
+
+Loggers only put records on a bounded in-memory queue, a single listener thread formats them as JSON lines and
+writes them to size-rotated files (and optionally stdout), so request threads never wait on disk or stdout.
+Every record carries the request id, USSD session id and MSISDN of the request it was logged for.
+DEBUG records (SQL text, VXView payloads) are kept for a sample of the requests only.
+"""
+import os
+import sys
+import json
+import uuid
+import queue
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.environ.get("LOG_DIR") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "logs")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 50 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 10))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+# share of requests whose records below LOG_LEVEL (DEBUG: SQL text, VXView payloads) are written
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", 0.01))
+LOG_STDOUT = os.environ.get("LOG_STDOUT", "false").lower() == "true"
+
+# logger name -> log file, records of every other logger go to app.log
+LOG_FILES = {"USSD": "ussd_session.log", "sms_service": "sms.log", "traces": "slow_traces.jsonl"}
+DEFAULT_LOG_FILE = "app.log"
+
+# loggers whose DEBUG records can be sampled, every other logger (urllib3, cx_Oracle, asyncio, ...) stays at LOG_LEVEL
+# so its DEBUG records are not even created
+DEBUG_LOGGERS = tuple(name.strip() for name in os.environ.get(
+    "LOG_DEBUG_LOGGERS", "USSD,ussd_session,ussd_session_state,vxview,sms_service,sms_dispatcher,exadata,traces"
+).split(",") if name.strip())
+
+CONTEXT_FIELDS = ("request_id", "session_id", "msisdn")
+
+# attributes every LogRecord has, anything else was passed with extra= and is written as a field
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", *CONTEXT_FIELDS}
+
+_log_context = contextvars.ContextVar("log_context", default=None)
+
+
+@contextmanager
+def request_context(request_id: str = None, **fields):
+    """
+    Attach a request id, and fields such as session_id and msisdn, to every record logged in the with block.
+    Whether the request's DEBUG records are kept is decided once here, so a sampled request is logged completely.
+    :param request_id: id given by the caller (e.g. an X-Request-ID header), generated when not given
+    """
+    __context = {"request_id": request_id or uuid.uuid4().hex, **fields,
+                 "debug_sampled": random.random() < LOG_DEBUG_SAMPLE_RATE}
+    __token = _log_context.set(__context)
+    try:
+        yield __context
+    finally:
+        _log_context.reset(__token)
+
+
+def bind_log_context(**fields):
+    """Add fields to the current request context, e.g. the session id once the request has been parsed"""
+    __context = _log_context.get()
+    if __context is not None:
+        __context.update(fields)
+
+
+def get_log_context():
+    """
+    Context of the current request, for handing it to another thread (see SMSDispatcher.submit)
+    :return: dict, empty outside of a request
+    """
+    return dict(_log_context.get() or {})
+
+
+@contextmanager
+def restore_log_context(context: dict):
+    """Log with a context taken by get_log_context, e.g. in the worker that runs a queued job"""
+    __token = _log_context.set(dict(context) if context else None)
+    try:
+        yield
+    finally:
+        _log_context.reset(__token)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Copies the request context onto records and drops the DEBUG records of requests that were not sampled.
+    Runs in the thread that logs, before the record is queued.
+    """
+
+    def __init__(self, level: int, sample_rate: float):
+        super().__init__()
+        self.level = level
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        __context = _log_context.get() or {}
+        for __field in CONTEXT_FIELDS:
+            setattr(record, __field, __context.get(__field))
+
+        if record.levelno >= self.level:
+            return True
+        __sampled = __context.get("debug_sampled")
+        if __sampled is None:
+            # outside of a request, e.g. the state machine refresh or an SMS worker
+            __sampled = random.random() < self.sample_rate
+        return __sampled
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that counts and drops records when the queue is full instead of raising or blocking"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.__lock = threading.Lock()
+        self.dropped = 0
+
+    def prepare(self, record):
+        # render the message and traceback now, the arguments may change before the listener gets to them
+        __record = logging.makeLogRecord(record.__dict__)
+        __record.msg = record.getMessage()
+        __record.args = None
+        if record.exc_info:
+            __record.exc_text = logging.Formatter().formatException(record.exc_info)
+            __record.exc_info = None
+        return __record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.__lock:
+                self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request context and any extra= fields"""
+
+    def format(self, record):
+        __entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        for __field in CONTEXT_FIELDS:
+            if getattr(record, __field, None) is not None:
+                __entry[__field] = getattr(record, __field)
+        for __field, __value in record.__dict__.items():
+            if __field not in RECORD_ATTRIBUTES:
+                __entry[__field] = __value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            __entry["exception"] = record.exc_text
+        return json.dumps(__entry, default=str)
+
+
+class LoggerRouteFilter(logging.Filter):
+    """Passes the records of the given loggers (and their children), or every other record with exclude set"""
+
+    def __init__(self, names, exclude: bool = False):
+        super().__init__()
+        self.names = tuple(names)
+        self.exclude = exclude
+
+    def filter(self, record):
+        __matched = any(record.name == name or record.name.startswith(f"{name}.") for name in self.names)
+        return __matched != self.exclude
+
+
+class LoggingPipeline:
+    """Root logger -> NonBlockingQueueHandler -> queue -> QueueListener thread -> rotating files"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.handler = None
+        self.listener = None
+        self.__levels = {}
+
+    def start(self, log_dir: str = None):
+        """Route every logger through the queue, calling it again is a no-op"""
+        with self.__lock:
+            if self.listener is not None:
+                return
+            __log_dir = log_dir or LOG_DIR
+            os.makedirs(__log_dir, exist_ok=True)
+
+            __formatter = JSONFormatter()
+            __handlers = []
+            for __name, __file in LOG_FILES.items():
+                __handlers.append(self.__file_handler(os.path.join(__log_dir, __file), LoggerRouteFilter([__name])))
+            __handlers.append(self.__file_handler(os.path.join(__log_dir, DEFAULT_LOG_FILE),
+                                                  LoggerRouteFilter(LOG_FILES, exclude=True)))
+            if LOG_STDOUT:
+                __handlers.append(logging.StreamHandler(sys.stdout))
+            for __handler in __handlers:
+                __handler.setFormatter(__formatter)
+
+            __level = logging.getLevelName(LOG_LEVEL)
+            self.handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+            self.handler.addFilter(RequestContextFilter(__level, LOG_DEBUG_SAMPLE_RATE))
+            self.listener = QueueListener(self.handler.queue, *__handlers, respect_handler_level=True)
+            self.listener.start()
+
+            __root = logging.getLogger()
+            self.__levels = {None: __root.level}
+            __root.addHandler(self.handler)
+            __root.setLevel(__level)
+            # DEBUG records of the application are created only when some of them can be sampled
+            if LOG_DEBUG_SAMPLE_RATE > 0 and __level > logging.DEBUG:
+                for __name in DEBUG_LOGGERS:
+                    __logger = logging.getLogger(__name)
+                    self.__levels[__name] = __logger.level
+                    __logger.setLevel(logging.DEBUG)
+
+    @staticmethod
+    def __file_handler(path: str, route: logging.Filter):
+        __handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                        encoding="utf-8", delay=True)
+        __handler.addFilter(route)
+        return __handler
+
+    def get_stats(self):
+        return {
+            "running": self.listener is not None,
+            "queue_depth": self.handler.queue.qsize() if self.handler else 0,
+            "dropped": self.handler.dropped if self.handler else 0
+        }
+
+    def stop(self):
+        """Write the records still queued and close the files, e.g. on application shutdown"""
+        with self.__lock:
+            if self.listener is None:
+                return
+            logging.getLogger().removeHandler(self.handler)
+            for __name, __level in self.__levels.items():
+                logging.getLogger(__name).setLevel(__level)
+            self.__levels = {}
+            self.listener.stop()
+            for __handler in self.listener.handlers:
+                __handler.close()
+            self.listener = None
+
+
+logging_pipeline = LoggingPipeline()
@@ -0,0 +1,167 @@
+"""
+In-process request tracing, no external collector.
+
+A trace is started per USSD request (and per SMS dispatch job) with trace_request; code on the request path opens
+spans with span() or the @traced decorator. The current span is kept in a context variable, so spans opened in
+run_blocking threads attach to the request they were started for. Traces that take TRACE_SLOW_SECONDS or longer are
+written to logs/slow_traces.jsonl by the logging pipeline (see structured_logging.py), faster ones are discarded.
+"""
+import os
+import time
+import uuid
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+
+TRACE_ENABLED = os.environ.get("TRACE_ENABLED", "true").lower() == "true"
+TRACE_SLOW_SECONDS = float(os.environ.get("TRACE_SLOW_SECONDS", 1.0))
+# a trace stops recording spans past this, e.g. a lookup in a loop
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", 200))
+# characters of SQL kept on database spans
+TRACE_STATEMENT_LENGTH = int(os.environ.get("TRACE_STATEMENT_LENGTH", 120))
+
+trace_logger = logging.getLogger('traces')
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Trace:
+    """Spans of one request, shared by every thread working on it"""
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self.dropped = 0
+        self.__lock = threading.Lock()
+
+    def add(self, span):
+        with self.__lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    def to_dict(self, root):
+        with self.__lock:
+            __spans = sorted(self.spans, key=lambda span: span.start)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": root.duration_ms(),
+            "spans": [span.to_dict() for span in __spans],
+            "dropped_spans": self.dropped
+        }
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "end", "attributes", "error", "thread")
+
+    def __init__(self, trace: Trace, name: str, parent_id: str = None, attributes: dict = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes or {}
+        self.error = None
+        self.thread = threading.current_thread().name
+        self.end = None
+        self.start = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def duration_ms(self):
+        return round(self.duration() * 1000, 3)
+
+    def to_dict(self):
+        __span = {"name": self.name, "span_id": self.span_id, "parent_id": self.parent_id,
+                  "start_ms": round((self.start - self.trace.started) * 1000, 3), "duration_ms": self.duration_ms(),
+                  "thread": self.thread}
+        if self.attributes:
+            __span["attributes"] = self.attributes
+        if self.error:
+            __span["error"] = self.error
+        return __span
+
+
+def current_span():
+    """:return: Span open in this context, None outside of a trace"""
+    return _current_span.get()
+
+
+@contextmanager
+def _open_span(trace: Trace, name: str, parent_id: str, attributes: dict):
+    __span = Span(trace, name, parent_id, attributes)
+    __token = _current_span.set(__span)
+    try:
+        yield __span
+    except Exception as e:
+        __span.error = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        __span.end = time.perf_counter()
+        _current_span.reset(__token)
+        trace.add(__span)
+
+
+@contextmanager
+def trace_request(name: str, slow_seconds: float = None, **attributes):
+    """
+    Trace the with block, written to the slow trace log if it takes slow_seconds (TRACE_SLOW_SECONDS) or longer.
+    Inside a trace this only opens a span, e.g. an SMS job run inline by the request.
+    """
+    __parent = _current_span.get()
+    if __parent is not None or not TRACE_ENABLED:
+        with span(name, **attributes) as __span:
+            yield __span
+        return
+
+    __trace = Trace(name)
+    __threshold = TRACE_SLOW_SECONDS if slow_seconds is None else slow_seconds
+    try:
+        with _open_span(__trace, name, None, attributes) as __root:
+            yield __root
+    finally:
+        if __root.duration() >= __threshold:
+            trace_logger.warning("Slow %s: %.3fs", name, __root.duration(), extra={"trace": __trace.to_dict(__root)})
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the with block as a span of the current trace, does nothing outside of a trace"""
+    __parent = _current_span.get()
+    if __parent is None:
+        yield None
+        return
+    with _open_span(__parent.trace, name, __parent.span_id, attributes) as __span:
+        yield __span
+
+
+def traced(name: str, attributes=None):
+    """
+    Decorator: run the function in a span
+    :param attributes: optional function of the call's arguments returning span attributes, see sql_statement
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name, **(attributes(*args, **kwargs) if attributes else {})):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def sql_statement(query, *args, **kwargs):
+    """Span attributes of an execute_query(query, ...) call"""
+    return {"statement": " ".join(str(query).split())[:TRACE_STATEMENT_LENGTH]}
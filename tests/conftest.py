@@ -1,6 +1,7 @@
 import pytest
 import sys
 import os
+import tempfile
 from unittest.mock import patch, MagicMock
 
 # Add the parent directory to sys.path if needed
@@ -15,6 +16,13 @@ sys.modules['dotenv'] = mock_dotenv
 mock_oracledb = MagicMock()
 sys.modules['cx_Oracle'] = mock_oracledb
 
+# Run SMS dispatch jobs inline so request tests can assert on them
+os.environ.setdefault("SMS_DISPATCH_WORKERS", "0")
+
+# Anything the tests write to the log directory stays out of the source tree
+os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="cdc-test-logs-"))
+os.environ.setdefault("DB_PROFILE_DUMP_FILE", os.path.join(os.environ["LOG_DIR"], "db_profile-{pid}.json"))
+
 # Now it's safe to import application modules
 from views import create_app
 
@@ -34,6 +42,13 @@ def test_client():
             yield client  # this is where the testing happens!
 
 
+@pytest.fixture(name="vxview_env")
+def set_vxview_env(monkeypatch):
+    """VXView SystemAPI settings, without them the controller returns INPUT_INCOMPLETE before calling VXView"""
+    monkeypatch.setenv("VXVIEW_SYSTEM_API_ENDPOINT", "http://vxview.test/SystemAPI")
+    monkeypatch.setenv("VXVIEW_SYSTEM_API_SESSION_ID", "test-session")
+
+
 @pytest.fixture(scope='function')
 def request_payload(request):
     """Configure XML payload to send to the application during testing"""
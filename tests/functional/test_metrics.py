@@ -0,0 +1,22 @@
+
+
+def test_metrics(test_client):
+    """
+    GIVEN a USSD App configured for testing
+    WHEN the '/metrics' endpoint is requested (GET)
+    THEN check that the phase histograms, menu counters and pool/queue gauges are exposed
+    :return:
+    """
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+
+    body = response.get_data(as_text=True)
+    assert "cdc_ussd_request_seconds" in body
+    assert "cdc_ussd_phase_seconds" in body
+    assert "cdc_ussd_menu_selections_total" in body
+    assert 'cdc_db_pool_connections{state="borrowed"}' in body
+    assert "cdc_sms_dispatch_queue_depth" in body
+
+    response = test_client.post("/metrics")
+    assert response.status_code == 405  # method no allowed
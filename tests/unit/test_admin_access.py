@@ -0,0 +1,38 @@
+import pytest
+from unittest.mock import patch
+
+from views.blueprints import admin
+
+
+ADMIN_TOKEN = "s3cret-admin-token"
+
+
+class TestAdminAccess:
+    def test_unlisted_address_forbidden(self, test_client):
+        response = test_client.get("/app/admin/sms-dispatcher", environ_base={"REMOTE_ADDR": "41.203.191.10"})
+
+        assert response.status_code == 403
+        assert b'"success": false' in response.data
+
+    def test_unlisted_address_cannot_change_state(self, test_client):
+        with patch('views.blueprints.admin.statement_profiler') as mock_profiler:
+            response = test_client.delete("/app/admin/db-profile", environ_base={"REMOTE_ADDR": "41.203.191.10"})
+
+        assert response.status_code == 403
+        mock_profiler.reset.assert_not_called()
+
+    def test_local_address_allowed(self, test_client):
+        assert test_client.get("/app/admin/sms-dispatcher").status_code == 200
+
+    def test_allowed_network(self, test_client, monkeypatch):
+        monkeypatch.setattr(admin, "ADMIN_ALLOWED_IPS", [admin.ipaddress.ip_network("10.20.0.0/16")])
+
+        assert test_client.get("/app/admin/logging", environ_base={"REMOTE_ADDR": "10.20.4.5"}).status_code == 200
+        assert test_client.get("/app/admin/logging").status_code == 403
+
+    @pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}])
+    def test_token_required_when_configured(self, test_client, monkeypatch, headers):
+        monkeypatch.setattr(admin, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+
+        assert test_client.get("/app/admin/logging", headers=headers).status_code == 401
+        assert test_client.get("/app/admin/logging", headers={"X-Admin-Token": ADMIN_TOKEN}).status_code == 200
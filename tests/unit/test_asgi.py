@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+
+from views import app
+from views.asgi import create_asgi_app
+
+REQUEST_BODY = b"<msg><msisdn>26657123456</msisdn><sessionid>1234567890</sessionid><phase>2</phase>" \
+               b"<request type='2'>9</request></msg>"
+
+NEXT_STATE = {"success": True, "data": {"session_uid": "1234567890", "next_state": "MAIN", "next_state_message": "Menu",
+                                        "next_state_input_required": "Y", "next_state_alias": "MAIN",
+                                        "next_state_phase": 2}}
+PREPAID = {"success": True, "data": {"tariff_type": "Prepaid"}}
+
+
+@pytest.fixture(name="asgi_app", scope="module")
+def get_asgi_app(test_client):
+    """ASGI application around the Flask app the test client already created"""
+    return create_asgi_app(app)
+
+
+def call(application, method: str, path: str, body: bytes = b""):
+    """Drive one HTTP request through the ASGI application"""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+             "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+             "server": ("testserver", 80), "client": ("127.0.0.1", 5000)}
+    asyncio.run(application(scope, receive, send))
+    return messages[0]["status"], b"".join(m.get("body", b"") for m in messages[1:])
+
+
+def test_invalid_request_gets_missing_input_reply(asgi_app):
+    status, body = call(asgi_app, "POST", "/", b"<msg>")
+
+    assert status == 200
+    assert b"Missing input in the request!" in body
+
+
+def test_other_routes_are_served_by_flask(asgi_app):
+    status, body = call(asgi_app, "GET", "/app/health")
+
+    assert status == 200
+    assert b"API is up and running!" in body
+
+
+@patch('models.ussd_session.USSDSession.set_next_state', return_value={"success": True})
+@patch('models.ussd_session.USSDSession.get_next_state')
+@patch('controllers.ussd_session.USSDSessionController.get_tariff_type')
+def test_tariff_lookup_and_state_lookup_run_concurrently(mock_tariff, mock_next_state, mock_set_next_state,
+                                                         asgi_app):
+    """Each lookup waits for the other to start, run one after the other they would both time out"""
+    tariff_started, state_started = threading.Event(), threading.Event()
+
+    def tariff_lookup():
+        tariff_started.set()
+        assert state_started.wait(timeout=5)
+        return PREPAID
+
+    def state_lookup():
+        state_started.set()
+        assert tariff_started.wait(timeout=5)
+        return NEXT_STATE
+
+    mock_tariff.side_effect = tariff_lookup
+    mock_next_state.side_effect = state_lookup
+
+    status, body = call(asgi_app, "POST", "/", REQUEST_BODY)
+
+    assert status == 200
+    assert b"<response type='2'>Menu</response>" in body
+    mock_set_next_state.assert_called_once()
@@ -15,6 +15,16 @@ SAMPLE_UUID = "12345678-1234-5678-1234-567812345678"
 MOCK_TIMESTAMP = datetime.now()
 
 
+def mock_cdc_cursor(mock_exadata_db, rows):
+    """Pooled connection and cursor fetching the given rows"""
+    conn = mock_exadata_db.connection.return_value.__enter__.return_value
+    cursor = conn.cursor.return_value
+    columns = list(rows[0].keys())
+    cursor.description = [(column,) for column in columns]
+    cursor.fetchall.return_value = [tuple(row[column] for column in columns) for row in rows]
+    return conn, cursor
+
+
 # USSD Session Flow Tests
 class TestUSSDSessionFlow:
     @patch('models.ussd_session.USSDSession.execute_query')
@@ -356,9 +366,9 @@ class TestCDCTransactions:
 
     # Unit Tests for CDC Transaction Class Methods
     
-    @patch('models.cdc_transactions.CDCTransactions.execute_query')
+    @patch('models.cdc_transactions.exadata_db')
     @patch('uuid.uuid4')
-    def test_get_airtime_transfers(self, mock_uuid, mock_execute_query):
+    def test_get_airtime_transfers(self, mock_uuid, mock_exadata_db):
         """Test the airtime transfer history retrieval logic"""
         # Setup
         mock_uuid.return_value = SAMPLE_UUID
@@ -379,8 +389,8 @@ class TestCDCTransactions:
             }
         ]
         
-        # Set up the mock to return different values for each call
-        mock_execute_query.side_effect = [True, mock_data, True]
+        # Set up the pooled connection to return the rows
+        conn, cursor = mock_cdc_cursor(mock_exadata_db, mock_data)
         
         # Execute
         cdc = CDCTransactions()
@@ -399,18 +409,22 @@ class TestCDCTransactions:
         assert "26652" in first_msg
         assert "*" in first_msg  # Check for any masking character
         
-        # Verify correct number of database calls
-        assert mock_execute_query.call_count == 3  # INSERT, SELECT, UPDATE
+        # INSERT, SELECT and UPDATE share one pooled connection and one commit
+        mock_exadata_db.connection.assert_called_once()
+        conn.commit.assert_called_once()
+        assert cursor.execute.call_count == 3
         
         # Verify content of the SELECT query
-        select_call = mock_execute_query.call_args_list[1]
+        select_call = cursor.execute.call_args_list[1]
         assert "SELECT" in select_call[0][0]
         assert "AIRTIME_TRANSFER" in select_call[0][0]
-        assert f"OC_SERVED_MSISDN_NORM = '{SAMPLE_MSISDN}'" in select_call[0][0]
+        assert "OC_SERVED_MSISDN_NORM = :msisdn" in select_call[0][0]
+        assert "SELECT *" not in select_call[0][0]
+        assert select_call[0][1] == {'msisdn': SAMPLE_MSISDN, 'row_limit': 5}
     
-    @patch('models.cdc_transactions.CDCTransactions.execute_query')
+    @patch('models.cdc_transactions.exadata_db')
     @patch('uuid.uuid4')
-    def test_get_bundle_purchases(self, mock_uuid, mock_execute_query):
+    def test_get_bundle_purchases(self, mock_uuid, mock_exadata_db):
         """Test the bundle purchase history retrieval logic"""
         # Setup
         mock_uuid.return_value = SAMPLE_UUID
@@ -433,8 +447,8 @@ class TestCDCTransactions:
             }
         ]
         
-        # Set up the mock to return different values for each call
-        mock_execute_query.side_effect = [True, mock_data, True]
+        # Set up the pooled connection to return the rows
+        conn, cursor = mock_cdc_cursor(mock_exadata_db, mock_data)
         
         # Execute
         cdc = CDCTransactions()
@@ -454,18 +468,22 @@ class TestCDCTransactions:
         assert "26659" in second_msg
         assert "*" in second_msg
         
-        # Verify correct number of database calls
-        assert mock_execute_query.call_count == 3
+        # INSERT, SELECT and UPDATE share one pooled connection and one commit
+        mock_exadata_db.connection.assert_called_once()
+        conn.commit.assert_called_once()
+        assert cursor.execute.call_count == 3
         
         # Verify content of the SELECT query
-        select_call = mock_execute_query.call_args_list[1]
+        select_call = cursor.execute.call_args_list[1]
         assert "SELECT" in select_call[0][0]
         assert "BUNDLE_PURCHASE" in select_call[0][0]
-        assert f"OC_SERVED_MSISDN_NORM = '{SAMPLE_MSISDN}'" in select_call[0][0]
+        assert "OC_SERVED_MSISDN_NORM = :msisdn" in select_call[0][0]
+        assert "SELECT *" not in select_call[0][0]
+        assert select_call[0][1] == {'msisdn': SAMPLE_MSISDN, 'row_limit': 5}
     
-    @patch('models.cdc_transactions.CDCTransactions.execute_query')
+    @patch('models.cdc_transactions.exadata_db')
     @patch('uuid.uuid4')
-    def test_get_call_records(self, mock_uuid, mock_execute_query):
+    def test_get_call_records(self, mock_uuid, mock_exadata_db):
         """Test the call records retrieval and formatting"""
         # Setup
         mock_uuid.return_value = SAMPLE_UUID
@@ -488,8 +506,8 @@ class TestCDCTransactions:
             }
         ]
         
-        # Set up the mock to return different values for each call
-        mock_execute_query.side_effect = [True, mock_data, True]
+        # Set up the pooled connection to return the rows
+        conn, cursor = mock_cdc_cursor(mock_exadata_db, mock_data)
         
         # Execute
         cdc = CDCTransactions()
@@ -512,14 +530,18 @@ class TestCDCTransactions:
         assert "*" in second_msg
         assert "45sec" in second_msg or "45s" in second_msg
         
-        # Verify correct number of database calls
-        assert mock_execute_query.call_count == 3
+        # INSERT, SELECT and UPDATE share one pooled connection and one commit
+        mock_exadata_db.connection.assert_called_once()
+        conn.commit.assert_called_once()
+        assert cursor.execute.call_count == 3
         
         # Verify content of the SELECT query
-        select_call = mock_execute_query.call_args_list[1]
+        select_call = cursor.execute.call_args_list[1]
         assert "SELECT" in select_call[0][0]
         assert "CALL_RECORDS" in select_call[0][0]
-        assert f"OC_SERVED_MSISDN_NORM = '{SAMPLE_MSISDN}'" in select_call[0][0]
+        assert "OC_SERVED_MSISDN_NORM = :msisdn" in select_call[0][0]
+        assert "SELECT *" not in select_call[0][0]
+        assert select_call[0][1] == {'msisdn': SAMPLE_MSISDN, 'row_limit': 5}
     
     @patch('resources.utilities.sms_sender.SMS.send_sms')
     def test_send_sms(self, mock_send_message):
@@ -0,0 +1,149 @@
+import json
+import pytest
+from unittest.mock import MagicMock, patch
+
+from resources.utilities.database import access as db_access
+from resources.utilities.database.profiler import (StatementProfiler, ProfiledCursor, OTHER_STATEMENTS, fingerprint,
+                                                   statement_profiler)
+from resources.static.response_templates import EXECUTION_SUCCESS, EXECUTION_FAIL
+from models.ussd_session import USSDSession
+
+
+class TestFingerprint:
+    def test_literals_and_numbers_replaced(self):
+        assert fingerprint("SELECT PHASE FROM CDC_USSD_SESSION\n   WHERE SESSION_UID='1234'  AND PHASE = 2") == \
+            "SELECT PHASE FROM CDC_USSD_SESSION WHERE SESSION_UID=? AND PHASE = ?"
+
+    def test_binds_kept_and_value_lists_collapsed(self):
+        assert fingerprint("SELECT * FROM T WHERE A = :msisdn AND B IN (1, 2, 3) -- lookup") == \
+            "SELECT * FROM T WHERE A = :msisdn AND B IN (?, ...)"
+
+    def test_same_statement_different_values(self):
+        assert fingerprint("UPDATE T SET X='a' WHERE ID=1") == fingerprint("UPDATE T SET X='b''c' WHERE ID=22")
+
+
+class TestStatementProfiler:
+    def test_aggregates_per_fingerprint(self):
+        profiler = StatementProfiler(enabled=True)
+        profiler.record("SELECT * FROM T WHERE ID=1", 0.2, rows=1, acquire_seconds=0.1)
+        profiler.record("SELECT * FROM T WHERE ID=2", 0.4, rows=3, acquire_seconds=0.3, failed=True)
+        profiler.record("DELETE FROM T", 0.1)
+
+        stats = profiler.get_stats()
+        assert stats["statements"] == 2
+        assert stats["calls"] == 3
+        select = stats["top"][0]
+        assert select["fingerprint"] == "SELECT * FROM T WHERE ID=?"
+        assert select["calls"] == 2
+        assert select["errors"] == 1
+        assert select["rows"] == 4
+        assert select["max_seconds"] == 0.4
+        assert select["mean_seconds"] == pytest.approx(0.3)
+        assert select["acquire_mean_seconds"] == pytest.approx(0.2)
+
+    def test_order_by_and_limit(self):
+        profiler = StatementProfiler(enabled=True)
+        profiler.record("SELECT A FROM T", 1.0)
+        for _ in range(3):
+            profiler.record("SELECT B FROM T", 0.1)
+
+        top = profiler.get_stats(limit=1, order_by="calls")["top"]
+        assert [statement["fingerprint"] for statement in top] == ["SELECT B FROM T"]
+
+    def test_statements_beyond_limit_grouped(self):
+        profiler = StatementProfiler(max_statements=2, enabled=True)
+        for table in ("A", "B", "C", "D"):
+            profiler.record(f"SELECT * FROM {table}", 0.1)
+
+        stats = profiler.get_stats(order_by="calls")
+        assert stats["statements"] == 3
+        assert stats["top"][0]["fingerprint"] == OTHER_STATEMENTS
+        assert stats["top"][0]["calls"] == 2
+
+    def test_disabled_records_nothing(self):
+        profiler = StatementProfiler(enabled=False)
+        profiler.record("SELECT 1 FROM DUAL", 0.1)
+        assert profiler.get_stats()["statements"] == 0
+
+    def test_dump(self, tmp_path):
+        profiler = StatementProfiler(enabled=True)
+        profiler.record("SELECT 1 FROM DUAL", 0.1)
+        profiler.dump(str(tmp_path / "profile-{pid}.json"))
+
+        dump_file, = tmp_path.iterdir()
+        with open(dump_file, encoding="utf-8") as profile:
+            assert json.load(profile)["top"][0]["fingerprint"] == "SELECT ? FROM DUAL"
+
+
+class TestProfiledCursor:
+    def test_execute_and_fetch_recorded_per_statement(self):
+        profiler = StatementProfiler(enabled=True)
+        raw_cursor = MagicMock()
+        raw_cursor.fetchall.return_value = [(1,), (2,)]
+        raw_cursor.fetchone.return_value = None
+        cursor = ProfiledCursor(raw_cursor, acquire_seconds=0.5, profiler=profiler)
+
+        cursor.arraysize = 500
+        cursor.execute("SELECT ID FROM T", {})
+        cursor.fetchall()
+        cursor.execute("SELECT ID FROM T WHERE ID = :id", {"id": 1})
+        cursor.fetchone()
+        cursor.close()
+
+        assert raw_cursor.arraysize == 500
+        raw_cursor.close.assert_called_once()
+        statements = {entry["fingerprint"]: entry for entry in profiler.get_stats()["top"]}
+        assert statements["SELECT ID FROM T"]["rows"] == 2
+        assert statements["SELECT ID FROM T"]["acquire_seconds"] == 0.5
+        assert statements["SELECT ID FROM T WHERE ID = :id"]["rows"] == 0
+        assert statements["SELECT ID FROM T WHERE ID = :id"]["acquire_seconds"] == 0.0
+
+
+class TestDatabaseAccess:
+    @pytest.fixture(autouse=True)
+    def reset_profiler(self):
+        statement_profiler.reset()
+        yield
+        statement_profiler.reset()
+
+    @patch('resources.utilities.database.access.exadata_db')
+    def test_fetch_all_as_dicts(self, mock_exadata_db):
+        conn = mock_exadata_db.connection.return_value.__enter__.return_value
+        conn.cursor.return_value.description = [("MSISDN",), ("TOTAL",)]
+        conn.cursor.return_value.fetchall.return_value = [("26653566580", 3)]
+
+        rows = db_access.execute_query("SELECT MSISDN, TOTAL FROM T WHERE A = :a", {"a": 1},
+                                       fetch=db_access.FETCH_ALL)
+
+        assert rows == [{"MSISDN": "26653566580", "TOTAL": 3}]
+        conn.cursor.return_value.execute.assert_called_once_with("SELECT MSISDN, TOTAL FROM T WHERE A = :a", {"a": 1})
+        assert statement_profiler.get_stats()["top"][0]["rows"] == 1
+
+    @patch('resources.utilities.database.access.exadata_db')
+    def test_commit_returns_rowcount(self, mock_exadata_db):
+        conn = mock_exadata_db.connection.return_value.__enter__.return_value
+        conn.cursor.return_value.rowcount = 1
+
+        assert db_access.execute_query("UPDATE T SET A = 1", commit=True) == 1
+        conn.commit.assert_called_once()
+
+    @patch('resources.utilities.database.access.exadata_db')
+    def test_error_rolls_back(self, mock_exadata_db):
+        conn = mock_exadata_db.connection.return_value.__enter__.return_value
+        conn.cursor.return_value.execute.side_effect = RuntimeError("ORA-00001: unique constraint violated")
+
+        with pytest.raises(RuntimeError):
+            db_access.execute_query("INSERT INTO T VALUES (1)", commit=True)
+
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+        assert statement_profiler.get_stats()["top"][0]["errors"] == 1
+
+    @patch('resources.utilities.database.access.exadata_db')
+    def test_session_commit_result(self, mock_exadata_db):
+        cursor = mock_exadata_db.connection.return_value.__enter__.return_value.cursor.return_value
+
+        cursor.rowcount = 1
+        assert USSDSession.execute_query("UPDATE CDC_USSD_SESSION SET PHASE = 2", "commit") == EXECUTION_SUCCESS
+        cursor.rowcount = 0
+        assert USSDSession.execute_query("UPDATE CDC_USSD_SESSION SET PHASE = 2", "commit") == EXECUTION_FAIL
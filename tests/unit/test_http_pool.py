@@ -0,0 +1,72 @@
+import threading
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch, MagicMock
+
+from resources.utilities.http_pool import HTTPSessionPool
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 for the first `failures` requests, then 200"""
+    protocol_version = "HTTP/1.1"
+    failures = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        __status = 503 if FlakyHandler.failures > 0 else 200
+        FlakyHandler.failures -= 1
+        self.send_response(__status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(name="server_url")
+def get_server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+
+
+class TestHTTPSessionPool:
+    def test_connections_reused(self, server_url):
+        """Sequential calls share one keep-alive connection"""
+        FlakyHandler.failures = 0
+        pool = HTTPSessionPool(name="test", pool_size=2)
+
+        for _ in range(3):
+            assert pool.post(server_url, data="<xml/>").status_code == 200
+
+        stats = pool.get_stats()
+        assert stats["requests"] == 3
+        host = list(stats["hosts"].values())[0]
+        assert host["connections_opened"] == 1
+        assert host["requests"] == 3
+
+    def test_idempotent_calls_retried(self, server_url):
+        """5xx responses are retried with backoff for idempotent calls only"""
+        pool = HTTPSessionPool(name="test", retries=2, backoff=0)
+
+        FlakyHandler.failures = 1
+        assert pool.post(server_url, data="<xml/>").status_code == 503
+
+        FlakyHandler.failures = 2
+        assert pool.post(server_url, idempotent=True, data="<xml/>").status_code == 200
+        assert pool.get_stats()["retries"] == 2
+
+    def test_timeout_applied(self):
+        """Every request carries the configured connect/read timeouts"""
+        pool = HTTPSessionPool(name="test", connect_timeout=1, read_timeout=2, retries=1, backoff=0)
+        pool.session.post = MagicMock(side_effect=requests.ConnectTimeout("timed out"))
+
+        with pytest.raises(requests.ConnectTimeout):
+            pool.post("http://vxview.invalid/", idempotent=True)
+
+        assert pool.session.post.call_count == 2
+        assert pool.session.post.call_args[1]["timeout"] == (1, 2)
+        assert pool.get_stats()["failures"] == 1
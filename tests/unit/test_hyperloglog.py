@@ -0,0 +1,104 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from reports.hyperloglog import HyperLogLog, HLL_PRECISION
+from reports.custom_reports import CustomReports
+from reports.monthly_reports import MonthlyReports
+
+# three standard errors of the default precision
+ERROR_BOUND = 3 * 1.04 / (2 ** HLL_PRECISION) ** 0.5
+
+
+def msisdns(start, stop):
+    return (f"2665{index:07d}" for index in range(start, stop))
+
+
+class TestHyperLogLog:
+    @pytest.mark.parametrize("count", [0, 1, 100, 5000, 200000])
+    def test_estimate_within_error_bound(self, count):
+        sketch = HyperLogLog().update(msisdns(0, count))
+
+        assert sketch.estimate() == pytest.approx(count, rel=ERROR_BOUND, abs=1)
+
+    def test_duplicates_not_counted(self):
+        sketch = HyperLogLog().update(msisdns(0, 1000))
+        registers = sketch.to_bytes()
+
+        sketch.update(msisdns(0, 1000))
+
+        assert sketch.to_bytes() == registers
+
+    def test_merge_counts_union(self):
+        """Merging the sketches of two days estimates the subscribers of both days together"""
+        monday = HyperLogLog().update(msisdns(0, 60000))
+        tuesday = HyperLogLog().update(msisdns(40000, 100000))
+
+        merged = HyperLogLog.from_bytes(monday.to_bytes()).merge(tuesday)
+
+        assert merged.to_bytes() == HyperLogLog().update(msisdns(0, 100000)).to_bytes()
+        assert merged.estimate() == pytest.approx(100000, rel=ERROR_BOUND)
+
+    def test_round_trip(self):
+        sketch = HyperLogLog(precision=10).update(msisdns(0, 300))
+
+        restored = HyperLogLog.from_bytes(sketch.to_bytes())
+
+        assert restored.precision == 10
+        assert restored.estimate() == sketch.estimate()
+
+    def test_precision_mismatch(self):
+        with pytest.raises(ValueError):
+            HyperLogLog(precision=12).merge(HyperLogLog(precision=14))
+        with pytest.raises(ValueError):
+            HyperLogLog(precision=20)
+
+
+class TestApproximateReports:
+    def test_requires_rollups(self):
+        with pytest.raises(ValueError):
+            CustomReports("2025-01-01", "2025-01-31", use_rollups=False, approximate=True)
+
+    def test_daily_activity(self):
+        """Unique users per day are merged across request types, counts come from the hourly rollup"""
+        report = CustomReports("2025-01-01", "2025-01-02", use_rollups=True, approximate=True)
+        sketches = [
+            {"ROLLUP_DAY": datetime(2025, 1, 1), "REQUEST_TYPE": "AIRTIME_TRANSFER",
+             "SKETCH": HyperLogLog().update(msisdns(0, 800)).to_bytes()},
+            {"ROLLUP_DAY": datetime(2025, 1, 1), "REQUEST_TYPE": "CALL_RECORDS",
+             "SKETCH": HyperLogLog().update(msisdns(500, 1000)).to_bytes()},
+            {"ROLLUP_DAY": datetime(2025, 1, 2), "REQUEST_TYPE": "CALL_RECORDS",
+             "SKETCH": HyperLogLog().update(msisdns(0, 10)).to_bytes()},
+        ]
+        counts = [
+            {"ACTIVITY_DATE": "2025-01-01", "TOTAL_REQUESTS": 1500, "AIRTIME_REQUESTS": 900, "BUNDLE_REQUESTS": 0,
+             "CALL_RECORD_REQUESTS": 600},
+            {"ACTIVITY_DATE": "2025-01-02", "TOTAL_REQUESTS": 12, "AIRTIME_REQUESTS": 0, "BUNDLE_REQUESTS": 0,
+             "CALL_RECORD_REQUESTS": 12},
+        ]
+
+        with patch.object(report, "stream_query", return_value=iter(sketches)) as stream_query, \
+                patch.object(report, "execute_query", return_value=counts) as execute_query:
+            rows = report.get_daily_activity()
+
+        assert "REPORT_ROLLUP_DAILY_SKETCH" in stream_query.call_args.args[0]
+        assert "COUNT(DISTINCT" not in execute_query.call_args.args[0]
+        assert list(rows[0]) == ["ACTIVITY_DATE", "TOTAL_REQUESTS", "UNIQUE_USERS", "AIRTIME_REQUESTS",
+                                 "BUNDLE_REQUESTS", "CALL_RECORD_REQUESTS"]
+        assert rows[0]["UNIQUE_USERS"] == pytest.approx(1000, rel=ERROR_BOUND)
+        assert rows[1]["UNIQUE_USERS"] == 10
+
+    def test_monthly_summary_of_empty_month(self):
+        """A month without rollup rows still gets its summary row, without dividing by its zero active days"""
+        report = MonthlyReports(datetime(2025, 1, 15), use_rollups=True, approximate=True)
+        summary = {"REPORT_MONTH": "January   2025", "TOTAL_REQUESTS": None, "AIRTIME_TRANSFER_REQUESTS": None,
+                   "BUNDLE_PURCHASE_REQUESTS": None, "CALL_RECORDS_REQUESTS": None, "ACTIVE_DAYS": 0,
+                   "AVG_DAILY_REQUESTS": None}
+
+        with patch.object(report, "stream_query", return_value=iter([])), \
+                patch.object(report, "execute_query", return_value=[summary]) as execute_query:
+            rows = report.get_monthly_summary()
+
+        assert "NULLIF(COUNT(DISTINCT TRUNC(ROLLUP_HOUR)), 0)" in execute_query.call_args.args[0]
+        assert rows[0]["TOTAL_UNIQUE_USERS"] == 0
+        assert rows[0]["AVG_DAILY_USERS"] == 0
@@ -0,0 +1,64 @@
+import json
+import datetime
+import urllib.request
+
+from benchmarks.loadtest import fake_oracle
+from benchmarks.loadtest.fake_services import start_vxview, start_bulksms
+from controllers.integration.vxview.soap import tariff_type_decoder
+from models.cdc_transactions import CDCTransactions
+from models.ussd_session_state import USSDStateMachine
+from resources.static.vxview_integration.system_api_templates import GET_TARIFF_TYPE
+
+
+def post(url: str, body: bytes):
+    return urllib.request.urlopen(urllib.request.Request(url, data=body, method="POST"), timeout=5).read()
+
+
+def test_fake_oracle_runs_application_queries(tmp_path):
+    """The SQLite stand-in serves the real menu and CDR queries"""
+    msisdns = fake_oracle.create_database(str(tmp_path / "cdc.sqlite"), subscribers=3, rows_per_subscriber=8)
+    pool = fake_oracle.SessionPool(database=str(tmp_path / "cdc.sqlite"), min=1, max=2)
+
+    conn = pool.acquire()
+    cursor = conn.cursor()
+    cursor.execute(USSDStateMachine.LOAD_QUERY)
+    assert [row[0] for row in cursor.fetchall()] == ["INIT", "TRANSACTIONS", "TRANSACTIONS", "TRANSACTIONS"]
+
+    cursor.execute(CDCTransactions.INSERT_REQUEST_QUERY,
+                   {"request_id": "r1", "msisdn": msisdns[0], "request_type": "AIRTIME_TRANSFER"})
+    cursor.execute(CDCTransactions.AIRTIME_TRANSFER_QUERY, {"msisdn": msisdns[0], "row_limit": 5})
+    rows = cursor.fetchall()
+    assert len(rows) == 5
+    assert isinstance(rows[0][0], datetime.datetime)
+    assert [row[0] for row in rows] == sorted((row[0] for row in rows), reverse=True)
+    conn.commit()
+    pool.release(conn)
+    assert (pool.opened, pool.busy) == (1, 0)
+    pool.close()
+
+
+def test_fake_vxview_response_decodes():
+    vxview = start_vxview()
+    vxview.postpaid_msisdns.add("26658000001")
+    try:
+        prepaid = tariff_type_decoder.decode(post(vxview.url, GET_TARIFF_TYPE.replace("{SESSIONID}", "s")
+                                                  .replace("{MSISDN}", "26658000000").encode()))
+        postpaid = tariff_type_decoder.decode(post(vxview.url, GET_TARIFF_TYPE.replace("{SESSIONID}", "s")
+                                                   .replace("{MSISDN}", "26658000001").encode()))
+    finally:
+        vxview.shutdown()
+
+    assert prepaid.success and prepaid.tariff_type == "Prepaid"
+    assert postpaid.tariff_type == "Postpaid"
+    assert vxview.requests == 2
+
+
+def test_fake_bulksms_answers_per_recipient():
+    bulksms = start_bulksms()
+    try:
+        result = json.loads(post(bulksms.url, json.dumps([{"to": "+1", "body": "a"}, {"to": "+2", "body": "b"}]).encode()))
+    finally:
+        bulksms.shutdown()
+
+    assert [message["to"] for message in result] == ["+1", "+2"]
+    assert bulksms.requests == 2
@@ -0,0 +1,36 @@
+from prometheus_client import REGISTRY
+from resources.utilities.metrics import observe_phase, count_menu_selection
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_observe_phase_records_latency():
+    before = sample("cdc_ussd_phase_seconds_count", phase="tariff_lookup")
+    with observe_phase("tariff_lookup"):
+        pass
+    assert sample("cdc_ussd_phase_seconds_count", phase="tariff_lookup") == before + 1
+
+
+def test_observe_phase_as_decorator():
+    @observe_phase("cdc_query")
+    def lookup():
+        return "rows"
+
+    before = sample("cdc_ussd_phase_seconds_count", phase="cdc_query")
+    assert lookup() == "rows"
+    assert lookup() == "rows"
+    assert sample("cdc_ussd_phase_seconds_count", phase="cdc_query") == before + 2
+
+
+def test_free_text_selections_share_a_label():
+    before_menu = sample("cdc_ussd_menu_selections_total", selection="2", outcome="sms_queued")
+    before_other = sample("cdc_ussd_menu_selections_total", selection="other", outcome="navigated")
+
+    count_menu_selection("2", "sms_queued")
+    count_menu_selection("*123*4#", "navigated")
+    count_menu_selection("hello", "navigated")
+
+    assert sample("cdc_ussd_menu_selections_total", selection="2", outcome="sms_queued") == before_menu + 1
+    assert sample("cdc_ussd_menu_selections_total", selection="other", outcome="navigated") == before_other + 2
@@ -0,0 +1,65 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from resources.utilities.database.oracle import ExaDataDatabase
+
+
+class TestExaDataDatabasePool:
+    @patch('resources.utilities.database.oracle.cx_Oracle.SessionPool')
+    def test_pool_created_once(self, mock_session_pool):
+        """The session pool is created lazily and reused for every acquire"""
+        database = ExaDataDatabase()
+
+        database.get_connection_handle()
+        database.get_connection_handle()
+
+        mock_session_pool.assert_called_once()
+        assert mock_session_pool.call_args[1]["min"] == database.pool_config["min"]
+        assert mock_session_pool.call_args[1]["max"] == database.pool_config["max"]
+        assert mock_session_pool.call_args[1]["increment"] == database.pool_config["increment"]
+        assert mock_session_pool.return_value.acquire.call_count == 2
+
+    @patch('resources.utilities.database.oracle.cx_Oracle.SessionPool')
+    def test_connection_context_manager_releases(self, mock_session_pool):
+        """Connections borrowed in a with block go back to the pool, even on error"""
+        database = ExaDataDatabase()
+        pool = mock_session_pool.return_value
+
+        with database.connection() as conn:
+            assert conn is pool.acquire.return_value
+
+        with pytest.raises(ValueError):
+            with database.connection():
+                raise ValueError("query failed")
+
+        assert pool.release.call_count == 2
+        stats = database.get_pool_stats()
+        assert stats["acquired"] == 2
+        assert stats["released"] == 2
+        assert stats["in_use"] == 0
+
+    @patch('resources.utilities.database.oracle.cx_Oracle.SessionPool')
+    def test_acquire_failure_counted(self, mock_session_pool):
+        """Acquire timeouts are surfaced and recorded in the pool statistics"""
+        database = ExaDataDatabase()
+        mock_session_pool.return_value.acquire.side_effect = Exception("ORA-24457: timed out")
+
+        with pytest.raises(Exception):
+            database.get_connection_handle()
+
+        assert database.get_pool_stats()["acquire_failures"] == 1
+
+    @patch('resources.utilities.database.access.exadata_db')
+    def test_models_borrow_from_pool(self, mock_exadata_db):
+        """Model queries borrow their connection from the shared pool"""
+        from models.ussd_session_state import USSDSessionState
+
+        conn = MagicMock()
+        conn.cursor.return_value.fetchone.return_value = ("TRANSACTIONS",)
+        mock_exadata_db.connection.return_value.__enter__.return_value = conn
+
+        result = USSDSessionState.execute_query("SELECT 1 FROM DUAL")
+
+        assert result == ("TRANSACTIONS",)
+        mock_exadata_db.connection.assert_called_once()
+        conn.cursor.return_value.close.assert_called_once()
@@ -0,0 +1,102 @@
+import time
+import threading
+import pytest
+from unittest.mock import patch
+
+from reports.exporters import ReportExporter, ReportJob
+from reports.utils import ReportingBase
+
+
+class SlowReports(ReportingBase):
+    """Report queries that each take a database round trip"""
+    QUERY_SECONDS = 0.2
+
+    def __init__(self):
+        super().__init__()
+        self.running = 0
+        self.peak = 0
+        self.__lock = threading.Lock()
+
+    def query(self, name):
+        with self.__lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.QUERY_SECONDS)
+        with self.__lock:
+            self.running -= 1
+        return [{"REPORT": name, "REQUEST_COUNT": 1}]
+
+    def get_request_summary(self):
+        return self.query("summary")
+
+    def get_hourly_distribution(self):
+        return self.query("hourly")
+
+    def get_top_users(self, stream=False):
+        rows = self.query("top_users")
+        return iter(rows) if stream else rows
+
+    def get_empty(self):
+        return []
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporter = ReportExporter()
+    with patch.object(ReportExporter, "ensure_reports_directory", return_value=str(tmp_path)):
+        yield exporter
+
+
+class TestParallelReports:
+    def test_full_report_jobs_only_report_queries(self):
+        """Helpers inherited from ReportingBase such as get_date_range are not report queries"""
+        jobs = ReportExporter.full_report_jobs(SlowReports(), "slow_report", "slow")
+
+        assert sorted(job.method_name for job in jobs) == ["get_empty", "get_hourly_distribution",
+                                                           "get_request_summary", "get_top_users"]
+        assert {job.filename for job in jobs} == {"slow_report_empty", "slow_report_hourly_distribution",
+                                                  "slow_report_request_summary", "slow_report_top_users"}
+
+    def test_queries_run_concurrently(self, exporter):
+        report = SlowReports()
+
+        start = time.perf_counter()
+        results = exporter.export_full_report(report, "slow_report", "slow", max_workers=4)
+        elapsed = time.perf_counter() - start
+
+        assert set(results) == {"get_request_summary", "get_hourly_distribution", "get_top_users"}
+        assert report.peak == 3
+        assert elapsed < SlowReports.QUERY_SECONDS * 2
+
+    def test_concurrency_capped(self, exporter):
+        """Never more queries in flight than max_workers"""
+        report = SlowReports()
+        jobs = [ReportJob(report, "get_request_summary", f"summary_{index}", "slow") for index in range(6)]
+
+        results = exporter.export_reports(jobs, max_workers=2)
+
+        assert len(results) == 6
+        assert report.peak == 2
+
+    def test_per_query_timing(self, exporter):
+        report = SlowReports()
+        jobs = [ReportJob(report, "get_top_users", "top_users", "slow", {"stream": True}),
+                ReportJob(report, "get_empty", "empty", "slow")]
+
+        results = exporter.export_reports(jobs, max_workers=1)
+
+        assert list(results) == ["top_users"]
+        timings = {timing["report"]: timing for timing in exporter.last_run_timings}
+        assert timings["top_users"]["rows"] == 1
+        assert timings["top_users"]["total_seconds"] >= SlowReports.QUERY_SECONDS
+        assert timings["empty"]["path"] is None
+        assert timings["empty"]["rows"] == 0
+
+    def test_failed_query_does_not_stop_the_run(self, exporter):
+        report = SlowReports()
+        jobs = [ReportJob(report, "get_missing", "missing", "slow"),
+                ReportJob(report, "get_hourly_distribution", "hourly", "slow")]
+
+        results = exporter.export_reports(jobs, max_workers=2)
+
+        assert list(results) == ["hourly"]
@@ -0,0 +1,82 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+from reports.queries import ReportQuery, date_range
+from reports.daily_reports import DailyReports
+from reports.weekly_reports import WeeklyReports
+from reports.custom_reports import CustomReports
+from resources.utilities.database.oracle import ExaDataDatabase
+
+
+class TestReportQuery:
+    def test_binds_ignore_format_masks(self):
+        query = ReportQuery("""
+            SELECT TO_CHAR(CREATED_ON, 'YYYY-MM-DD HH24:MI:SS') FROM TRANSACTION_REQUESTS
+            WHERE CREATED_ON >= :start_date AND CREATED_ON < :end_date AND MSISDN = :msisdn AND :start_date IS NOT NULL
+        """)
+
+        assert query.binds == ("start_date", "end_date", "msisdn")
+
+    def test_bind_passes_only_used_values(self):
+        query = ReportQuery(f"SELECT 1 FROM DUAL WHERE {date_range('X', include_end=True)}")
+
+        assert "X <= :end_date" in query.sql
+        assert query.bind({"start_date": 1, "end_date": 2, "row_limit": 3}) == {"start_date": 1, "end_date": 2}
+        with pytest.raises(ValueError):
+            query.bind({"start_date": 1})
+
+
+class TestReportsBindValues:
+    @staticmethod
+    def executed(report, method, *args):
+        with patch.object(report, "execute_query", return_value=[]) as execute_query:
+            getattr(report, method)(*args)
+        return execute_query.call_args.args
+
+    def test_sql_text_constant_across_dates(self):
+        """Different report dates run the same statement text with different binds"""
+        first_sql, first_params = self.executed(DailyReports(datetime(2025, 1, 1), use_rollups=False),
+                                                "get_request_summary")
+        second_sql, second_params = self.executed(DailyReports(datetime(2025, 2, 1), use_rollups=False),
+                                                  "get_request_summary")
+
+        assert first_sql == second_sql
+        assert "2025" not in first_sql
+        assert first_params == {"start_date": datetime(2025, 1, 1), "end_date": datetime(2025, 1, 2)}
+        assert second_params["start_date"] == datetime(2025, 2, 1)
+
+    def test_limit_bound(self):
+        report = WeeklyReports(datetime(2025, 1, 8), use_rollups=True)
+
+        sql, params = self.executed(report, "get_top_users", 10)
+
+        assert "FETCH FIRST :row_limit ROWS ONLY" in sql
+        assert params["row_limit"] == 10
+        assert set(params) == {"start_date", "query_end_date", "row_limit"}
+
+    @patch('resources.utilities.database.access.exadata_db')
+    def test_execute_query_passes_params(self, mock_exadata_db):
+        cursor = MagicMock()
+        cursor.description = [("DATE_RANGE",)]
+        cursor.fetchall.return_value = [("2025-01-01 to 2025-01-31",)]
+        mock_exadata_db.connection.return_value.__enter__.return_value.cursor.return_value = cursor
+        report = CustomReports("2025-01-01", "2025-01-31", use_rollups=False)
+
+        rows = report.get_transaction_summary()
+
+        sql, params = cursor.execute.call_args.args
+        assert sql is CustomReports.TRANSACTION_SUMMARY_QUERY.sql
+        assert params == {"start_date": datetime(2025, 1, 1), "end_date": datetime(2025, 1, 31, 23, 59, 59)}
+        assert rows == [{"DATE_RANGE": "2025-01-01 to 2025-01-31"}]
+
+
+class TestStatementCache:
+    @patch('resources.utilities.database.oracle.cx_Oracle.SessionPool')
+    def test_pool_enables_statement_cache(self, mock_session_pool):
+        database = ExaDataDatabase()
+
+        database.get_pool()
+
+        assert mock_session_pool.call_args[1]["stmtcachesize"] == database.pool_config["stmtcachesize"]
+        assert database.pool_config["stmtcachesize"] > 0
@@ -0,0 +1,219 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+
+from reports.rollups import ReportRollups
+from reports.hyperloglog import HyperLogLog
+from reports.daily_reports import DailyReports
+from reports.weekly_reports import WeeklyReports
+from reports.monthly_reports import MonthlyReports
+from reports.custom_reports import CustomReports
+from reports.exporters import ReportJob
+from reports.run_reports import fall_back_to_raw_queries
+
+
+class FakeWatermarkCursor:
+    """Cursor answering the refresh queries from an in-memory watermark"""
+
+    def __init__(self, watermark, first_request_hour, settled_until, requests=()):
+        self.watermark = watermark
+        self.first_request_hour = first_request_hour
+        self.settled_until = settled_until
+        self.requests = list(requests)
+        self.merged = []
+        self.sketches = {}
+        self.__result = None
+        self.__rows = []
+
+    def execute(self, query, **params):
+        if query is ReportRollups.LOCK_WATERMARK_QUERY:
+            self.__result = (self.watermark,)
+        elif query is ReportRollups.SETTLED_UNTIL_QUERY:
+            self.__result = (self.settled_until,)
+        elif query is ReportRollups.FIRST_REQUEST_HOUR_QUERY:
+            self.__result = (self.first_request_hour,)
+        elif query is ReportRollups.UPDATE_WATERMARK_QUERY:
+            self.watermark = params["high"]
+        elif query in ReportRollups.ROLLUP_QUERIES:
+            self.merged.append((params["low"], params["high"]))
+        elif query is ReportRollups.BATCH_SKETCHES_QUERY:
+            self.__rows = [(day, request_type, sketch) for (day, request_type), sketch in self.sketches.items()]
+        elif query is ReportRollups.BATCH_USERS_QUERY:
+            self.__rows = sorted({(created_on.replace(hour=0, minute=0, second=0), request_type, msisdn)
+                                  for created_on, request_type, msisdn in self.requests
+                                  if params["low"] <= created_on < params["high"]})
+
+    def executemany(self, query, rows):
+        assert query is ReportRollups.MERGE_SKETCH_QUERY
+        for row in rows:
+            self.sketches[(row["rollup_day"], row["request_type"])] = row["sketch"]
+
+    def setinputsizes(self, **sizes):
+        pass
+
+    def fetchall(self):
+        rows, self.__rows = self.__rows, []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self.__rows = self.__rows[:size], self.__rows[size:]
+        return rows
+
+    def fetchone(self):
+        return self.__result
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def watermark_db():
+    def connect(cursor):
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+        mock_exadata_db.connection.return_value.__enter__.return_value = conn
+        return conn
+
+    with patch('reports.rollups.exadata_db') as mock_exadata_db:
+        yield connect
+
+
+class TestReportRollups:
+    @patch('reports.rollups.ROLLUP_BATCH_HOURS', 24)
+    def test_first_refresh_backfills_in_batches(self, watermark_db):
+        first_hour = datetime(2025, 3, 1, 8)
+        cursor = FakeWatermarkCursor(None, first_hour, first_hour + timedelta(hours=30))
+        conn = watermark_db(cursor)
+
+        result = ReportRollups().refresh()
+
+        assert result == {"watermark": first_hour + timedelta(hours=30), "batches": 2}
+        # every rollup statement covers each window once, windows are contiguous
+        windows = sorted(set(cursor.merged))
+        assert windows == [(first_hour, first_hour + timedelta(hours=24)),
+                           (first_hour + timedelta(hours=24), first_hour + timedelta(hours=30))]
+        assert len(cursor.merged) == 2 * len(ReportRollups.ROLLUP_QUERIES)
+        assert cursor.watermark == first_hour + timedelta(hours=30)
+        assert conn.commit.call_count == 2
+
+    def test_refresh_continues_from_watermark(self, watermark_db):
+        watermark = datetime(2025, 3, 2, 10, 15)
+        cursor = FakeWatermarkCursor(watermark, datetime(2025, 1, 1), None)
+        watermark_db(cursor)
+
+        result = ReportRollups().refresh(upto=watermark + timedelta(minutes=5))
+
+        assert result["batches"] == 1
+        assert set(cursor.merged) == {(watermark, watermark + timedelta(minutes=5))}
+
+    def test_refresh_up_to_date(self, watermark_db):
+        watermark = datetime(2025, 3, 2, 10, 15)
+        cursor = FakeWatermarkCursor(watermark, datetime(2025, 1, 1), watermark)
+        watermark_db(cursor)
+
+        assert ReportRollups().refresh() == {"watermark": watermark, "batches": 0}
+        assert cursor.merged == []
+
+    def test_sketches_updated_incrementally(self, watermark_db):
+        """Each refresh adds the subscribers of its requests to the sketch of their day"""
+        day = datetime(2025, 3, 2)
+        requests = [(day + timedelta(hours=9), "AIRTIME_TRANSFER", f"2665800{index:04d}") for index in range(300)]
+        requests += [(day + timedelta(hours=15), "AIRTIME_TRANSFER", f"2665800{index:04d}") for index in range(200, 500)]
+        requests += [(day + timedelta(hours=15), "CALL_RECORDS", "26658000001")]
+        cursor = FakeWatermarkCursor(day, None, None, requests)
+        watermark_db(cursor)
+
+        ReportRollups().refresh(upto=day + timedelta(hours=12))
+        ReportRollups().refresh(upto=day + timedelta(days=1))
+
+        assert set(cursor.sketches) == {(day, "AIRTIME_TRANSFER"), (day, "CALL_RECORDS")}
+        assert HyperLogLog.from_bytes(cursor.sketches[(day, "AIRTIME_TRANSFER")]).estimate() == pytest.approx(500, rel=0.03)
+        assert HyperLogLog.from_bytes(cursor.sketches[(day, "CALL_RECORDS")]).estimate() == 1
+
+    def test_failed_batch_rolls_back(self, watermark_db):
+        cursor = FakeWatermarkCursor(datetime(2025, 3, 2), None, datetime(2025, 3, 3))
+        cursor.execute = MagicMock(side_effect=[None, Exception("ORA-00060: deadlock detected")])
+        cursor.fetchone = MagicMock(return_value=(datetime(2025, 3, 2),))
+        conn = watermark_db(cursor)
+
+        with pytest.raises(Exception):
+            ReportRollups().refresh()
+
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+
+
+class TestReportsReadRollups:
+    REPORTS = [
+        (DailyReports, ("get_request_summary", "get_hourly_distribution")),
+        (WeeklyReports, ("get_daily_trend", "get_top_users", "get_request_type_summary")),
+        (MonthlyReports, ("get_weekly_trend", "get_user_retention", "get_monthly_summary")),
+    ]
+
+    @staticmethod
+    def queries(report, methods):
+        with patch.object(report, "execute_query", return_value=[]) as execute_query:
+            for method in methods:
+                getattr(report, method)()
+        return [call.args[0] for call in execute_query.call_args_list]
+
+    @pytest.mark.parametrize("report_class,methods", REPORTS)
+    def test_rollups(self, report_class, methods):
+        for query in self.queries(report_class(use_rollups=True), methods):
+            assert "REPORT_ROLLUP_" in query
+            assert "TRANSACTION_REQUESTS" not in query
+
+    @pytest.mark.parametrize("report_class,methods", REPORTS)
+    def test_raw(self, report_class, methods):
+        for query in self.queries(report_class(use_rollups=False), methods):
+            assert "TRANSACTION_REQUESTS" in query
+            assert "REPORT_ROLLUP_" not in query
+
+    def test_custom_range_includes_last_day(self):
+        report = CustomReports("2025-01-01", "2025-12-31", use_rollups=True)
+
+        for query in self.queries(report, ("get_transaction_summary", "get_request_type_breakdown",
+                                           "get_daily_activity")):
+            assert "FROM REPORT_ROLLUP_DAILY_USERS" in query
+            assert "ROLLUP_DAY <= :end_date" in query
+
+
+class TestRollupFallback:
+    @staticmethod
+    def jobs(*reports):
+        return [ReportJob(report, "get_transaction_summary", "custom_summary", "custom") for report in reports]
+
+    def test_raw_by_default(self):
+        assert not CustomReports("2025-01-01", "2025-01-31").use_rollups
+
+    @patch('reports.run_reports.ReportRollups')
+    def test_refreshed_rollups_read(self, mock_rollups):
+        mock_rollups.return_value.refresh.return_value = {"watermark": datetime(2025, 2, 1, 9, 0), "batches": 1}
+        report = CustomReports("2025-01-01", "2025-12-31", use_rollups=True, approximate=True)
+
+        fall_back_to_raw_queries(self.jobs(report))
+
+        assert report.use_rollups and report.approximate
+
+    @patch('reports.run_reports.ReportRollups')
+    def test_failed_refresh_falls_back_after_watermark(self, mock_rollups):
+        mock_rollups.return_value.refresh.side_effect = RuntimeError("ORA-00054: resource busy")
+        mock_rollups.return_value.get_watermark.return_value = datetime(2025, 2, 1)
+        covered = CustomReports("2025-01-01", "2025-01-31", use_rollups=True)
+        stale = CustomReports("2025-01-01", "2025-02-28", use_rollups=True, approximate=True)
+
+        fall_back_to_raw_queries(self.jobs(covered, stale))
+
+        assert covered.use_rollups
+        assert not stale.use_rollups and not stale.approximate
+
+    @patch('reports.run_reports.ReportRollups')
+    def test_missing_rollups_fall_back(self, mock_rollups):
+        error = RuntimeError("ORA-00942: table or view does not exist")
+        mock_rollups.return_value.refresh.side_effect = error
+        mock_rollups.return_value.get_watermark.side_effect = error
+        report = CustomReports("2025-01-01", "2025-01-31", use_rollups=True)
+
+        fall_back_to_raw_queries(self.jobs(report))
+
+        assert not report.use_rollups
@@ -0,0 +1,75 @@
+import csv
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+from reports.exporters import ReportExporter
+from reports.weekly_reports import WeeklyReports
+
+
+def mock_cursor(batches):
+    cursor = MagicMock()
+    cursor.description = [("MSISDN",), ("REQUEST_COUNT",)]
+    cursor.fetchmany.side_effect = list(batches) + [[]]
+    return cursor
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    exporter = ReportExporter()
+    with patch.object(ReportExporter, "ensure_reports_directory", return_value=str(tmp_path)):
+        yield exporter
+
+
+class TestReportStreaming:
+    @patch('resources.utilities.database.access.exadata_db')
+    def test_stream_query_fetches_in_batches(self, mock_exadata_db):
+        """Rows are fetched arraysize at a time and yielded as the consumer asks for them"""
+        cursor = mock_cursor([[("26658000001", 5), ("26658000002", 4)], [("26658000003", 3)]])
+        mock_exadata_db.connection.return_value.__enter__.return_value.cursor.return_value = cursor
+
+        rows = WeeklyReports().get_top_users(stream=True)
+        assert next(rows) == {"MSISDN": "26658000001", "REQUEST_COUNT": 5}
+        assert cursor.fetchmany.call_count == 1
+
+        assert [row["MSISDN"] for row in rows] == ["26658000002", "26658000003"]
+        assert cursor.arraysize == cursor.prefetchrows
+        cursor.fetchmany.assert_called_with(cursor.arraysize)
+        cursor.close.assert_called_once()
+        mock_exadata_db.connection.return_value.__exit__.assert_called_once()
+
+    def test_stream_to_csv(self, exporter):
+        """CSV exports are written from any iterable and report their rate"""
+        rows = ({"MSISDN": f"2665800{index:04d}", "REQUEST_COUNT": index} for index in range(2500))
+
+        path = exporter.stream_to_csv(rows, "weekly_top_users", "weekly")
+
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            written = list(csv.DictReader(csvfile))
+        assert len(written) == 2500
+        assert written[-1] == {"MSISDN": "26658002499", "REQUEST_COUNT": "2499"}
+        assert exporter.last_export_stats["rows"] == 2500
+        assert exporter.last_export_stats["rows_per_sec"] > 0
+
+    def test_stream_to_json(self, exporter):
+        """JSON exports are written as one array, row by row"""
+        rows = iter([{"USER_TYPE": "New Users", "USER_COUNT": 3}, {"USER_TYPE": "Returning Users", "USER_COUNT": 7}])
+
+        path = exporter.stream_to_json(rows, "monthly_user_retention", "monthly")
+
+        with open(path, encoding='utf-8') as jsonfile:
+            assert json.load(jsonfile) == [{"USER_TYPE": "New Users", "USER_COUNT": 3},
+                                           {"USER_TYPE": "Returning Users", "USER_COUNT": 7}]
+
+    def test_empty_stream_writes_nothing(self, exporter, tmp_path):
+        assert exporter.stream_to_csv(iter([]), "weekly_top_users", "weekly") is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_failed_stream_removes_partial_file(self, exporter, tmp_path):
+        """A query failing mid-stream leaves no truncated export behind"""
+        def rows():
+            yield {"MSISDN": "26658000001", "REQUEST_COUNT": 5}
+            raise Exception("ORA-03113: end-of-file on communication channel")
+
+        assert exporter.stream_to_csv(rows(), "weekly_top_users", "weekly") is None
+        assert list(tmp_path.iterdir()) == []
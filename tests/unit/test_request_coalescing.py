@@ -0,0 +1,150 @@
+import threading
+import pytest
+from unittest.mock import patch
+
+from models.cdc_transactions import CDCTransactions, sms_dedup_window, transaction_lookups
+from resources.utilities.cache import TTLCache
+from resources.utilities.single_flight import SingleFlight
+
+
+SAMPLE_MSISDN = "26653566580"
+SMS_ITEMS = [{"message": "1) 01/01/2025 08:32 26659****0 M50.00"}]
+
+
+@pytest.fixture(autouse=True)
+def clear_sms_dedup_window():
+    sms_dedup_window.clear()
+    yield
+    sms_dedup_window.clear()
+
+
+def run_concurrently(target, count):
+    """Start count threads running target, :return: the threads"""
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def wait_for_waiters(single_flight, count):
+    """Wait until count callers are waiting for the first call"""
+    for _ in range(500):
+        if single_flight.get_stats()["shared"] >= count:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("callers did not join the running call")
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_run(self):
+        single_flight = SingleFlight(timeout=5)
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def lookup():
+            calls.append(1)
+            release.wait(5)
+            return "transactions"
+
+        threads = run_concurrently(lambda: results.append(single_flight.do("key", lookup)), 4)
+        wait_for_waiters(single_flight, 3)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert len(calls) == 1
+        assert sorted(results, key=lambda result: result[1]) == [("transactions", False)] + [("transactions", True)] * 3
+        assert single_flight.get_stats()["in_flight"] == 0
+
+        # nothing is kept once the call returned
+        assert single_flight.do("key", lambda: "again") == ("again", False)
+
+    def test_error_shared(self):
+        single_flight = SingleFlight(timeout=5)
+        release = threading.Event()
+        errors = []
+
+        def lookup():
+            release.wait(5)
+            raise RuntimeError("ORA-03113: end-of-file on communication channel")
+
+        def call():
+            try:
+                single_flight.do("key", lookup)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = run_concurrently(call, 2)
+        wait_for_waiters(single_flight, 1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        assert errors == ["ORA-03113: end-of-file on communication channel"] * 2
+
+
+class TestCoalescedLookups:
+    @patch('models.cdc_transactions.db_access.execute_query')
+    @patch('models.cdc_transactions.cdr_mirror_watermark')
+    def test_duplicate_lookups_share_query(self, mock_watermark, mock_execute_query):
+        mock_watermark.get.return_value = None
+        release = threading.Event()
+        shared_before = transaction_lookups.get_stats()["shared"]
+        results = []
+
+        def query_transactions(msisdn, request_type, query, formatter):
+            release.wait(5)
+            return SMS_ITEMS
+
+        with patch.object(CDCTransactions, "query_transactions", side_effect=query_transactions) as mock_query:
+            threads = run_concurrently(lambda: results.append(CDCTransactions().get_airtime_transfers(SAMPLE_MSISDN)),
+                                       2)
+            for _ in range(500):
+                if transaction_lookups.get_stats()["shared"] > shared_before:
+                    break
+                threading.Event().wait(0.01)
+            release.set()
+            for thread in threads:
+                thread.join(5)
+
+        assert mock_query.call_count == 1
+        assert results == [SMS_ITEMS, SMS_ITEMS]
+        # the duplicate request is still recorded
+        mock_execute_query.assert_called_once()
+        assert mock_execute_query.call_args.args[1]["sms_message"] == SMS_ITEMS[0]["message"]
+
+
+class TestSMSDedup:
+    @patch('models.cdc_transactions.sms_service.send_message')
+    def test_duplicate_sms_suppressed(self, mock_send_message):
+        mock_send_message.return_value = {"success": True}
+        cdc = CDCTransactions()
+
+        first = cdc.send_sms(SAMPLE_MSISDN, "AIRTIME TRANSFERS: ", SMS_ITEMS)
+        second = cdc.send_sms(SAMPLE_MSISDN, "AIRTIME TRANSFERS: ", SMS_ITEMS)
+        other = cdc.send_sms(SAMPLE_MSISDN, "CALL RECORDS: ", SMS_ITEMS)
+
+        assert first["success"] and second["success"] and other["success"]
+        assert "suppressed" in second["message"]
+        assert mock_send_message.call_count == 2
+
+    @patch('models.cdc_transactions.sms_service.send_message')
+    def test_failed_sms_not_suppressed(self, mock_send_message):
+        mock_send_message.return_value = {"success": False, "error": "BulkSMS returned HTTP 503"}
+        cdc = CDCTransactions()
+
+        assert not cdc.send_sms(SAMPLE_MSISDN, "AIRTIME TRANSFERS: ", SMS_ITEMS)["success"]
+        mock_send_message.return_value = {"success": True}
+        assert cdc.send_sms(SAMPLE_MSISDN, "AIRTIME TRANSFERS: ", SMS_ITEMS)["success"]
+
+        assert mock_send_message.call_count == 2
+
+    def test_add_within_window(self):
+        window = TTLCache(max_size=10, ttl=60)
+        assert window.add("key") is True
+        assert window.add("key") is False
+        assert window.add("key", ttl=-1) is False
+        window.invalidate("key")
+        assert window.add("key", ttl=-1) is True
+        assert window.add("key") is True
@@ -0,0 +1,55 @@
+import pytest
+from resources.utilities.request_handler import parse_request, XMLRequestParser, USSDRequest, InvalidRequestError
+
+REQUEST_BODY = b"<msg> <msisdn>26657123456</msisdn> <sessionid>1234567890</sessionid> <phase>2</phase> " \
+               b"<request type='2'>1</request> </msg>"
+
+
+def test_parse_request_fields():
+    request = parse_request(REQUEST_BODY)
+
+    assert isinstance(request, USSDRequest)
+    assert request.msisdn == "26657123456"
+    assert request.session_id == "1234567890"
+    assert request.request_phase == "2"
+    assert request.request_type == "2"
+    assert request.request_input == "1"
+    # dict style access used by the controller
+    assert request["session_id"] == "1234567890"
+    with pytest.raises(KeyError):
+        request["unknown"]
+
+
+def test_request_has_no_instance_dict():
+    with pytest.raises(AttributeError):
+        parse_request(REQUEST_BODY).extra = "value"
+
+
+def test_empty_request_input_is_allowed():
+    request = parse_request(b"<msg><msisdn>1</msisdn><sessionid>2</sessionid><phase>1</phase>"
+                            b"<request type='1'/></msg>")
+    assert request.request_input == ""
+
+
+@pytest.mark.parametrize("body", [
+    b"<msg><msisdn>1</msisdn>",
+    b"<message><msisdn>1</msisdn><sessionid>2</sessionid><phase>1</phase><request type='1'>*1#</request></message>",
+    b"<msg><sessionid>2</sessionid><phase>1</phase><request type='1'>*1#</request></msg>",
+    b"<msg><msisdn>1</msisdn><sessionid>2</sessionid><phase>1</phase><request>*1#</request></msg>",
+    b"<msg><msisdn>1</msisdn><sessionid>2</sessionid><phase>1</phase></msg>",
+])
+def test_invalid_requests_are_rejected(body):
+    with pytest.raises(InvalidRequestError):
+        parse_request(body)
+
+
+def test_entities_are_not_expanded():
+    body = b"<?xml version='1.0'?><!DOCTYPE msg [<!ENTITY x SYSTEM 'file:///etc/passwd'>]>" \
+           b"<msg><msisdn>1</msisdn><sessionid>2</sessionid><phase>1</phase><request type='1'>&x;</request></msg>"
+    assert "root:" not in parse_request(body).request_input
+
+
+def test_xml_request_parser_wraps_parse_request():
+    assert XMLRequestParser(xml_post_data=REQUEST_BODY).get_request_data().to_dict() == \
+        parse_request(REQUEST_BODY).to_dict()
+    assert XMLRequestParser().get_request_data() is None
@@ -0,0 +1,40 @@
+import uuid
+from lxml import etree
+from resources.static.response_templates import RESPONSE_MESSAGE_TEMPLATE
+from resources.utilities.response_handler import XMLResponseBuilder, escape_xml, monotonic_reference
+
+
+def test_response_matches_template():
+    builder = XMLResponseBuilder(session_id="123", message="Welcome", response_type=2)
+    body = builder.get_response_body()
+
+    reference = etree.fromstring(body).find("premium").get("reference")
+    uuid.UUID(reference)
+    assert body == RESPONSE_MESSAGE_TEMPLATE.replace("{SESSION_ID}", "123").replace("{RESPONSE_TYPE}", "2") \
+        .replace("{MESSAGE}", "Welcome").replace("{PREMIUM_REFERENCE}", reference)
+    assert builder.get_response_bytes() == body.encode("utf-8")
+
+
+def test_message_is_escaped():
+    message = "Airtime & data <50% off> for 'you'"
+    body = XMLResponseBuilder(session_id="123", message=message, response_type=3).get_response_bytes()
+
+    document = etree.fromstring(body)
+    assert document.find("response").text == message
+    assert document.find("response").get("type") == "3"
+
+
+def test_escape_xml_returns_plain_text_unchanged():
+    text = "1. Airtime transfers"
+    assert escape_xml(text) is text
+    assert escape_xml('<"&\'>') == "&lt;&quot;&amp;&apos;&gt;"
+
+
+def test_monotonic_reference_is_unique_and_increasing():
+    references = [monotonic_reference() for _ in range(3)]
+    assert len(set(references)) == 3
+    assert references == sorted(references)
+
+    body = XMLResponseBuilder(session_id="1", message="m", response_type=2, reference_mode="monotonic") \
+        .get_response_body()
+    assert etree.fromstring(body).find("premium").get("reference").startswith(references[0].rsplit("-", 1)[0])
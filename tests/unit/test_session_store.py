@@ -0,0 +1,161 @@
+import time
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+
+from models.ussd_session import USSDSession
+from resources.utilities.session_store import MemorySessionStore, SharedSessionStore, SessionWriteBehind, \
+    SessionStoreManager, SessionStore, get_store_address, get_store_authkey
+
+
+SAMPLE_MSISDN = "26653566580"
+
+
+class TestMemorySessionStore:
+    def test_lru_eviction(self):
+        """The least recently used session is evicted once the store is full"""
+        store = MemorySessionStore(max_size=2, ttl=300)
+        store.set("1", {"current_state": "INIT"})
+        store.set("2", {"current_state": "INIT"})
+        store.get("1")
+        store.set("3", {"current_state": "INIT"})
+
+        assert store.get("2") is None
+        assert store.get("1") is not None
+        assert store.get("3") is not None
+
+    def test_ttl_expiry(self):
+        """Expired sessions are treated as misses"""
+        store = MemorySessionStore(max_size=10, ttl=-1)
+        store.set("1", {"current_state": "INIT"})
+        assert store.get("1") is None
+
+
+class TestSharedSessionStore:
+    def test_shared_store_round_trip(self, tmp_path):
+        """Workers share sessions through the store served on a local socket"""
+        address = str(tmp_path / "sessions.sock")
+        served = MemorySessionStore()
+        SessionStoreManager.register("get_store", callable=lambda: served)
+        server = SessionStoreManager(address=address, authkey=b"test").get_server()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        store = SharedSessionStore(address=address, authkey=b"test")
+        store.set("12345", {"current_state": "TRANSACTIONS"})
+
+        assert store.get("12345") == {"current_state": "TRANSACTIONS"}
+        assert served.get("12345") == {"current_state": "TRANSACTIONS"}
+
+    def test_unreachable_store_is_a_miss(self, tmp_path):
+        """A store that cannot be reached falls back to a miss instead of failing the request"""
+        store = SharedSessionStore(address=str(tmp_path / "missing.sock"), authkey=b"test")
+        assert store.get("12345") is None
+
+    def test_authkey_required(self, monkeypatch):
+        """There is no default authkey, a worker without one does not start"""
+        monkeypatch.delenv("USSD_SESSION_STORE_AUTHKEY", raising=False)
+        with pytest.raises(ValueError):
+            SharedSessionStore()
+
+        monkeypatch.setenv("USSD_SESSION_STORE_AUTHKEY", "secret")
+        assert get_store_authkey() == b"secret"
+
+    def test_remote_address_refused(self, monkeypatch):
+        """A TCP address other than loopback needs USSD_SESSION_STORE_ALLOW_REMOTE"""
+        monkeypatch.setenv("USSD_SESSION_STORE_ADDRESS", "127.0.0.1:50000")
+        assert get_store_address() == ("127.0.0.1", 50000)
+
+        monkeypatch.setenv("USSD_SESSION_STORE_ADDRESS", "0.0.0.0:50000")
+        with pytest.raises(ValueError):
+            get_store_address()
+
+        monkeypatch.setenv("USSD_SESSION_STORE_ALLOW_REMOTE", "true")
+        assert get_store_address() == ("0.0.0.0", 50000)
+
+    def test_interface_is_abstract(self):
+        with pytest.raises(TypeError):
+            SessionStore()
+
+
+class TestSessionWriteBehind:
+    @patch('resources.utilities.session_store.exadata_db')
+    def test_batched_flush(self, mock_exadata_db):
+        """Queued session changes reach Oracle in one batch, inserts before updates"""
+        conn = MagicMock()
+        mock_exadata_db.connection.return_value.__enter__.return_value = conn
+        writer = SessionWriteBehind(batch_size=10, flush_interval=0.05, max_queue=10)
+
+        record = {"session_uid": "12345", "current_state": "INIT", "current_state_alias": "N.A",
+                  "current_state_phase": 0, "msisdn": SAMPLE_MSISDN, "user_input": "*123#"}
+        writer.enqueue_insert(record)
+        writer.enqueue_update(dict(record, current_state="TRANSACTIONS"))
+        writer.stop()
+
+        cursor = conn.cursor.return_value
+        assert cursor.executemany.call_count == 2
+        assert "INSERT INTO CDC_USSD_SESSION" in cursor.executemany.call_args_list[0][0][0]
+        assert cursor.executemany.call_args_list[1][0][1][0]["current_state"] == "TRANSACTIONS"
+        conn.commit.assert_called_once()
+
+
+    @patch('resources.utilities.session_store.exadata_db')
+    def test_transient_failure_retried(self, mock_exadata_db):
+        """A batch that fails to reach Oracle is retried instead of being discarded"""
+        conn = MagicMock()
+        mock_exadata_db.connection.return_value.__enter__.side_effect = [RuntimeError("ORA-24459: pool timeout"),
+                                                                        conn]
+        writer = SessionWriteBehind(retries=2, retry_backoff=0)
+
+        writer.flush([("update", {"session_uid": "12345", "current_state": "TRANSACTIONS",
+                                  "current_state_alias": "N.A", "current_state_phase": 1})])
+
+        conn.commit.assert_called_once()
+        assert writer.get_stats() == {"pending": 0, "written": 1, "dropped": 0, "retried": 1}
+
+    @patch('resources.utilities.session_store.exadata_db')
+    def test_rejected_rows_dropped_alone(self, mock_exadata_db):
+        """Rows Oracle rejects are dropped and counted, the rest of the batch is committed"""
+        conn = MagicMock()
+        mock_exadata_db.connection.return_value.__enter__.return_value = conn
+        conn.cursor.return_value.getbatcherrors.side_effect = [[MagicMock(offset=1, message="ORA-00001")], []]
+        writer = SessionWriteBehind(retries=0)
+        record = {"current_state": "INIT", "current_state_alias": "N.A", "current_state_phase": 0,
+                  "msisdn": SAMPLE_MSISDN, "user_input": "*123#"}
+
+        writer.flush([("insert", dict(record, session_uid="1")), ("insert", dict(record, session_uid="2")),
+                      ("update", dict(record, session_uid="1"))])
+
+        assert conn.cursor.return_value.executemany.call_args_list[0].kwargs["batcherrors"] is True
+        conn.commit.assert_called_once()
+        assert writer.dropped == 1
+        assert writer.written == 2
+
+    @patch('resources.utilities.session_store.exadata_db')
+    def test_batch_counted_when_retries_exhausted(self, mock_exadata_db):
+        mock_exadata_db.connection.return_value.__enter__.side_effect = RuntimeError("ORA-12541: TNS:no listener")
+        writer = SessionWriteBehind(retries=1, retry_backoff=0)
+
+        writer.flush([("update", {"session_uid": "12345"}), ("update", {"session_uid": "12346"})])
+
+        assert mock_exadata_db.connection.return_value.__enter__.call_count == 2
+        assert writer.dropped == 2
+
+
+class TestUSSDSessionWithStore:
+    def test_session_hops_skip_oracle(self):
+        """With a store configured, session reads and writes do not wait on Oracle"""
+        writer = MagicMock()
+        with patch('models.ussd_session.session_store', MemorySessionStore()), \
+                patch('models.ussd_session.session_write_behind', writer), \
+                patch('models.ussd_session.USSDSession.execute_query') as mock_execute_query:
+            session = USSDSession(session_uid="12345", msisdn=SAMPLE_MSISDN, user_input="*123#")
+
+            assert session.initialize()["success"] is True
+            assert session.get_current_state()["data"]["current_state"] == "INIT"
+            assert session.set_next_state("TRANSACTIONS", "N.A", 0)["success"] is True
+            assert session.get_current_state()["data"]["current_state"] == "TRANSACTIONS"
+
+            mock_execute_query.assert_not_called()
+
+        writer.enqueue_insert.assert_called_once()
+        writer.enqueue_update.assert_called_once()
@@ -0,0 +1,139 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+
+from resources.utilities.sms_service import SMSService, SMSBatchSender, bulksms_http_pool
+
+
+def bulksms_response(status_code, messages=None, content=b""):
+    response = MagicMock()
+    response.status_code = status_code
+    response.content = content
+    response.json.return_value = [{"id": f"id-{message['to']}", "to": message["to"]} for message in messages or []]
+    return response
+
+
+@pytest.fixture(name="service")
+def get_service():
+    service = SMSService()
+    service.simulation_mode = False
+    service.token_id, service.token_secret, service.api_url = "id", "secret", "https://bulksms.invalid/v1/messages"
+    return service
+
+
+class TestSMSBatchSender:
+    @patch('resources.utilities.sms_service.bulksms_http_pool.session.post')
+    def test_messages_coalesced(self, mock_post, service):
+        """Messages submitted within the window go out in one request, each caller gets its own id"""
+        mock_post.side_effect = lambda url, headers, json, timeout: bulksms_response(201, json)
+        sender = SMSBatchSender(service, max_batch=3, max_wait=1)
+
+        futures = [sender.submit(f"2665356658{i}", f"message {i}") for i in range(3)]
+        results = [future.result(timeout=5) for future in futures]
+
+        mock_post.assert_called_once()
+        assert len(mock_post.call_args[1]["json"]) == 3
+        assert [result["message_id"] for result in results] == [f"id-+2665356658{i}" for i in range(3)]
+        assert sender.get_stats()["fallbacks"] == 0
+        # a hung BulkSMS connection fails before callers stop waiting for the batch
+        assert mock_post.call_args[1]["timeout"] == bulksms_http_pool.timeout
+
+    @patch('resources.utilities.sms_service.bulksms_http_pool.session.post')
+    def test_results_matched_by_position(self, mock_post, service):
+        """BulkSMS may return the numbers normalised, results are matched by their position in the response"""
+        def post(url, headers, json, timeout):
+            response = bulksms_response(201)
+            response.json.return_value = [{"id": f"id-{i}", "to": message["to"].lstrip("+")}
+                                          for i, message in enumerate(json)]
+            return response
+        mock_post.side_effect = post
+        sender = SMSBatchSender(service, max_batch=2, max_wait=1)
+
+        futures = [sender.submit("26653566580", "first"), sender.submit("26653566580", "second")]
+        results = [future.result(timeout=5) for future in futures]
+
+        assert [result["message_id"] for result in results] == ["id-0", "id-1"]
+        mock_post.assert_called_once()
+
+    @patch('resources.utilities.sms_service.bulksms_http_pool.session.post')
+    def test_unreadable_response_not_resent(self, mock_post, service):
+        """A batch that may have been accepted is reported failed without sending the messages again"""
+        response = bulksms_response(201, content=b"<html>gateway</html>")
+        response.json.side_effect = ValueError("Expecting value: line 1 column 1 (char 0)")
+        mock_post.return_value = response
+        sender = SMSBatchSender(service, max_batch=2, max_wait=1)
+
+        futures = [sender.submit("26653566580", "first"), sender.submit("26653566581", "second")]
+        results = [future.result(timeout=5) for future in futures]
+
+        assert not any(result["success"] for result in results)
+        mock_post.assert_called_once()
+        assert sender.get_stats()["fallbacks"] == 0
+
+    @patch('resources.utilities.sms_service.bulksms_http_pool.session.post')
+    def test_rejected_message_falls_back_to_single_send(self, mock_post, service):
+        """Only the message BulkSMS rejected in the batch response is sent again"""
+        def post(url, headers, json, timeout):
+            if not isinstance(json, list):
+                return bulksms_response(201, [json])
+            response = bulksms_response(201, json)
+            response.json.return_value[1]["status"] = {"type": "FAILED"}
+            return response
+        mock_post.side_effect = post
+        sender = SMSBatchSender(service, max_batch=2, max_wait=1)
+
+        futures = [sender.submit("26653566580", "first"), sender.submit("26653566581", "second")]
+        results = [future.result(timeout=5) for future in futures]
+
+        assert all(result["success"] for result in results)
+        assert mock_post.call_count == 2
+        assert mock_post.call_args[1]["json"]["to"] == "+26653566581"
+        assert sender.get_stats()["fallbacks"] == 1
+
+    @patch('resources.utilities.sms_service.bulksms_http_pool.session.post')
+    def test_failed_batch_not_resent(self, mock_post, service):
+        """After a 5xx the batch may have gone through, it is reported failed without sending it again"""
+        mock_post.return_value = bulksms_response(503, content=b'{"title": "Service unavailable"}')
+        sender = SMSBatchSender(service, max_batch=2, max_wait=1)
+
+        futures = [sender.submit("26653566580", "first"), sender.submit("26653566581", "second")]
+        results = [future.result(timeout=5) for future in futures]
+
+        assert [result["error"] for result in results] == ["BulkSMS returned status 503"] * 2
+        mock_post.assert_called_once()
+        assert sender.get_stats()["fallbacks"] == 0
+
+    @patch('resources.utilities.sms_service.bulksms_http_pool.session.post')
+    def test_refused_batch_with_body_falls_back_to_single_sends(self, mock_post, service):
+        """One bad recipient fails the whole batch with a 400, the other messages still go out one by one"""
+        def post(url, headers, json, timeout):
+            if isinstance(json, list) or json["to"] == "+0":
+                return bulksms_response(400, content=b'{"title": "Bad request", "detail": "Invalid recipient +0"}')
+            return bulksms_response(201, [json])
+        mock_post.side_effect = post
+        sender = SMSBatchSender(service, max_batch=3, max_wait=1)
+
+        futures = [sender.submit("26653566580", "first"), sender.submit("0", "second"),
+                   sender.submit("26653566581", "third")]
+        results = [future.result(timeout=5) for future in futures]
+
+        assert [result["success"] for result in results] == [True, False, True]
+        assert mock_post.call_count == 4
+        assert sender.get_stats()["fallbacks"] == 3
+
+    @patch('resources.utilities.sms_service.bulksms_http_pool.session.post')
+    def test_rejected_batch_falls_back_to_single_sends(self, mock_post, service):
+        """A batch refused without a body is retried message by message"""
+        def post(url, headers, json, timeout):
+            if isinstance(json, list):
+                return bulksms_response(400)
+            return bulksms_response(201, [json])
+        mock_post.side_effect = post
+        sender = SMSBatchSender(service, max_batch=2, max_wait=1)
+
+        futures = [sender.submit("26653566580", "first"), sender.submit("26653566581", "second")]
+        results = [future.result(timeout=5) for future in futures]
+
+        assert all(result["success"] for result in results)
+        assert mock_post.call_count == 3
+        assert sender.get_stats()["fallbacks"] == 2
@@ -0,0 +1,140 @@
+import os
+import json
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+from resources.utilities.sms_dispatcher import SMSDispatcher
+from controllers.ussd_session import send_transaction_history, NO_RECENT_TRANSACTIONS_MESSAGE
+
+
+SAMPLE_MSISDN = "26653566580"
+
+
+class TestSMSDispatcher:
+    def test_submit_returns_before_job_runs(self):
+        """Jobs run on the worker pool, the caller only waits for the job to be queued"""
+        release = threading.Event()
+        done = threading.Event()
+
+        def handler(msisdn):
+            release.wait(5)
+            done.set()
+            return {"success": True}
+
+        dispatcher = SMSDispatcher(workers=1, max_queue=10)
+        dispatcher.register("history", handler)
+
+        assert dispatcher.submit("history", msisdn=SAMPLE_MSISDN) is True
+        assert not done.is_set()
+
+        release.set()
+        assert done.wait(5)
+        dispatcher.stop()
+
+        stats = dispatcher.get_stats()
+        assert stats["completed"] == 1
+        assert stats["queue_depth"] == 0
+        assert stats["latency_max"] > 0
+
+    def test_full_queue_rejects(self):
+        """A full queue rejects new jobs instead of blocking the request"""
+        release = threading.Event()
+        dispatcher = SMSDispatcher(workers=1, max_queue=1)
+        dispatcher.register("history", lambda msisdn: release.wait(5))
+
+        results = [dispatcher.submit("history", msisdn=SAMPLE_MSISDN) for _ in range(5)]
+        release.set()
+        dispatcher.stop()
+
+        assert results[0] is True
+        assert False in results
+        assert dispatcher.get_stats()["rejected"] >= 1
+
+    def test_spooled_jobs_replayed(self, tmp_path):
+        """Jobs left in the spool by a previous run are replayed on start"""
+        spool_dir = str(tmp_path)
+        with open(os.path.join(spool_dir, "job-1.json"), "w") as spool_file:
+            json.dump({"job_id": "job-1", "name": "history", "kwargs": {"msisdn": SAMPLE_MSISDN},
+                       "enqueued_at": 0}, spool_file)
+
+        handled = threading.Event()
+        handler = MagicMock(side_effect=lambda msisdn: handled.set())
+        dispatcher = SMSDispatcher(workers=1, max_queue=10, spool_dir=spool_dir)
+        dispatcher.register("history", handler)
+        dispatcher.start()
+
+        assert handled.wait(5)
+        dispatcher.stop()
+
+        handler.assert_called_once_with(msisdn=SAMPLE_MSISDN)
+        assert os.listdir(spool_dir) == []
+
+    def test_shared_spool_runs_job_once(self, tmp_path):
+        """A process starting on a shared spool does not run again a job another process still has queued"""
+        spool_dir = str(tmp_path)
+        release = threading.Event()
+        calls = []
+
+        def handler(msisdn):
+            release.wait(5)
+            calls.append(msisdn)
+
+        # the running process: its only worker is busy, the second job waits in its queue
+        running = SMSDispatcher(workers=1, max_queue=10, spool_dir=spool_dir)
+        running.register("history", handler)
+        running.submit("history", msisdn="busy")
+        running.submit("history", msisdn=SAMPLE_MSISDN)
+
+        # a second process starts on the same spool and replays the queued job
+        starting = SMSDispatcher(workers=1, max_queue=10, spool_dir=spool_dir)
+        starting.register("history", handler)
+        starting.start()
+        release.set()
+        # both stop once the jobs they have queued have run
+        running.stop()
+        starting.stop()
+
+        assert sorted(calls) == sorted(["busy", SAMPLE_MSISDN])
+        assert os.listdir(spool_dir) == []
+
+    def test_interrupted_job_not_replayed(self, tmp_path):
+        """A job claimed by a process that died while running it may have been sent, it is not sent again"""
+        spool_dir = str(tmp_path)
+        with open(os.path.join(spool_dir, "job-1.claimed"), "w") as spool_file:
+            json.dump({"job_id": "job-1", "name": "history", "kwargs": {"msisdn": SAMPLE_MSISDN},
+                       "enqueued_at": 0}, spool_file)
+
+        handler = MagicMock()
+        dispatcher = SMSDispatcher(workers=1, max_queue=10, spool_dir=spool_dir)
+        dispatcher.register("history", handler)
+        dispatcher.start()
+        dispatcher.stop()
+
+        handler.assert_not_called()
+        assert os.listdir(spool_dir) == ["job-1.claimed"]
+
+
+class TestTransactionHistoryJob:
+    @patch('models.cdc_transactions.CDCTransactions.send_sms')
+    @patch('models.cdc_transactions.CDCTransactions.get_bundle_purchases')
+    def test_no_transactions_sent_by_sms(self, mock_get_bundles, mock_send_sms):
+        """The reply no longer waits for the lookup, a subscriber without history is told so by SMS"""
+        mock_get_bundles.return_value = []
+        mock_send_sms.return_value = {"success": True, "message": "Successfully sent SMS to " + SAMPLE_MSISDN}
+
+        assert send_transaction_history(SAMPLE_MSISDN, "2", "12345")["success"] is True
+
+        mock_send_sms.assert_called_once_with(SAMPLE_MSISDN, "BUNDLE PURCHASE: ",
+                                              [{"message": NO_RECENT_TRANSACTIONS_MESSAGE}])
+
+    @patch('models.cdc_transactions.CDCTransactions.send_sms')
+    @patch('models.cdc_transactions.CDCTransactions.get_call_records')
+    def test_transactions_sent_by_sms(self, mock_get_calls, mock_send_sms):
+        items = [{"message": "1) 26662***6: 41sec, Balance: 10min 40sec, Date: 25/03/2025 00:08"}]
+        mock_get_calls.return_value = items
+        mock_send_sms.return_value = {"success": True, "message": "Successfully sent SMS to " + SAMPLE_MSISDN}
+
+        send_transaction_history(SAMPLE_MSISDN, "3", "12345")
+
+        mock_send_sms.assert_called_once_with(SAMPLE_MSISDN, "CALL RECORDS: ", items)
@@ -0,0 +1,157 @@
+import json
+import queue
+import asyncio
+import logging
+import threading
+import pytest
+
+from resources.utilities import structured_logging
+from resources.utilities.structured_logging import (RequestContextFilter, NonBlockingQueueHandler, JSONFormatter,
+                                                    LoggingPipeline, request_context, bind_log_context)
+from resources.utilities.sms_dispatcher import SMSDispatcher
+from controllers.ussd_session.asynchronous import run_blocking
+
+
+SAMPLE_MSISDN = "26653566580"
+
+
+def queued_records(sample_rate=0.0, max_queue=100):
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=max_queue))
+    handler.addFilter(RequestContextFilter(logging.INFO, sample_rate))
+    logger = logging.getLogger("test_structured_logging")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.handlers = [handler]
+    return logger, handler
+
+
+def drain(handler):
+    records = []
+    while not handler.queue.empty():
+        records.append(handler.queue.get_nowait())
+    return records
+
+
+class TestRequestContext:
+    def test_records_carry_request_context(self):
+        logger, handler = queued_records()
+
+        with request_context(request_id="req-1"):
+            bind_log_context(session_id="12345", msisdn=SAMPLE_MSISDN)
+            logger.info("Tariff type: %s", {"tariff_type": "Prepaid"})
+        logger.info("outside")
+
+        inside, outside = drain(handler)
+        entry = json.loads(JSONFormatter().format(inside))
+        assert entry["request_id"] == "req-1"
+        assert entry["session_id"] == "12345"
+        assert entry["msisdn"] == SAMPLE_MSISDN
+        assert entry["message"] == "Tariff type: {'tariff_type': 'Prepaid'}"
+        assert outside.request_id is None
+
+    def test_debug_sampled_per_request(self, monkeypatch):
+        """A request is either logged completely or its DEBUG records are all dropped, INFO is always kept"""
+        logger, handler = queued_records()
+
+        monkeypatch.setattr(structured_logging, "LOG_DEBUG_SAMPLE_RATE", 0.0)
+        with request_context():
+            logger.debug("dropped")
+            logger.info("kept")
+        monkeypatch.setattr(structured_logging, "LOG_DEBUG_SAMPLE_RATE", 1.0)
+        with request_context():
+            logger.debug("sampled")
+
+        assert [record.getMessage() for record in drain(handler)] == ["kept", "sampled"]
+
+    def test_full_queue_drops(self):
+        """Logging never blocks: records beyond the queue size are counted and dropped"""
+        logger, handler = queued_records(max_queue=2)
+
+        for index in range(5):
+            logger.warning("record %d", index)
+
+        assert handler.dropped == 3
+        assert len(drain(handler)) == 2
+
+    def test_exception_rendered_before_queueing(self):
+        logger, handler = queued_records()
+
+        try:
+            raise ValueError("ORA-12541: TNS:no listener")
+        except ValueError:
+            logger.exception("Database error")
+
+        record, = drain(handler)
+        assert record.exc_info is None
+        assert "ORA-12541" in json.loads(JSONFormatter().format(record))["exception"]
+
+
+class TestContextPropagation:
+    def test_dispatcher_job_logs_with_submitter_context(self):
+        seen = []
+        done = threading.Event()
+
+        def handler(msisdn):
+            seen.append(structured_logging.get_log_context().get("request_id"))
+            done.set()
+            return {"success": True}
+
+        dispatcher = SMSDispatcher(workers=1, max_queue=10)
+        dispatcher.register("history", handler)
+        with request_context(request_id="req-2"):
+            dispatcher.submit("history", msisdn=SAMPLE_MSISDN)
+
+        assert done.wait(5)
+        dispatcher.stop()
+        assert seen == ["req-2"]
+
+    def test_run_blocking_keeps_context(self):
+        async def lookup():
+            with request_context(request_id="req-3"):
+                return await run_blocking(lambda: structured_logging.get_log_context()["request_id"])
+
+        assert asyncio.run(lookup()) == "req-3"
+
+
+class TestLoggingPipeline:
+    def test_records_routed_to_rotating_files(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(structured_logging, "LOG_DEBUG_SAMPLE_RATE", 0.0)
+        root_level = logging.getLogger().level
+        pipeline = LoggingPipeline()
+        pipeline.start(log_dir=str(tmp_path))
+        try:
+            with request_context(request_id="req-4"):
+                logging.getLogger("USSD").info("New session request")
+                logging.getLogger("sms_service").info("SMS sent")
+                logging.getLogger("ussd_session").debug("not sampled")
+                logging.getLogger("vxview").error("VXView returned HTTP 500")
+        finally:
+            pipeline.stop()
+            logging.getLogger().setLevel(root_level)
+
+        def entries(name):
+            with open(tmp_path / name, encoding="utf-8") as log_file:
+                return [json.loads(line) for line in log_file]
+
+        assert [entry["message"] for entry in entries("ussd_session.log")] == ["New session request"]
+        assert [entry["message"] for entry in entries("sms.log")] == ["SMS sent"]
+        assert [entry["message"] for entry in entries("app.log")] == ["VXView returned HTTP 500"]
+        assert entries("app.log")[0]["request_id"] == "req-4"
+        assert pipeline.get_stats()["running"] is False
+
+    def test_only_application_debug_records_created(self, tmp_path, monkeypatch):
+        """Sampling DEBUG must not make every library create DEBUG records on the request path"""
+        monkeypatch.setattr(structured_logging, "LOG_DEBUG_SAMPLE_RATE", 0.5)
+        root_level = logging.getLogger().level
+        ussd_level = logging.getLogger("USSD").level
+        pipeline = LoggingPipeline()
+        pipeline.start(log_dir=str(tmp_path))
+        try:
+            assert logging.getLogger().level == logging.INFO
+            assert not logging.getLogger("urllib3.connectionpool").isEnabledFor(logging.DEBUG)
+            assert logging.getLogger("USSD").isEnabledFor(logging.DEBUG)
+        finally:
+            pipeline.stop()
+
+        assert logging.getLogger().level == root_level
+        assert logging.getLogger("USSD").level == ussd_level
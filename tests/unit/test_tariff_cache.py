@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from controllers.integration.vxview.systemapi import SystemAPIIntegrationController, tariff_type_cache
+from resources.utilities.cache import TTLCache
+
+
+SAMPLE_MSISDN = "26653566580"
+
+TARIFF_RESPONSE = """<getTariffTypeResponse><Code>SystemAPI-Success</Code><RatePlanUID>1</RatePlanUID>
+<RatePlanName>Prepaid Plan</RatePlanName><PlatformID>1</PlatformID><PackageType>PREPAID</PackageType>
+<TariffType>Prepaid</TariffType><AccountTypeName>Consumer</AccountTypeName><SubscriberUid>42</SubscriberUid>
+<VoiceOOB>0</VoiceOOB><DataOOB>0</DataOOB><SmsOOB>0</SmsOOB><ActivationDate>2020-01-01</ActivationDate>
+</getTariffTypeResponse>"""
+
+NOT_FOUND_RESPONSE = "<getTariffTypeResponse><Code>SystemAPI-SubscriberNotFound</Code></getTariffTypeResponse>"
+
+
+def vxview_response(body: str):
+    return MagicMock(status_code=200, content=body.encode("utf-8"))
+
+
+@pytest.fixture(autouse=True)
+def clear_tariff_cache():
+    tariff_type_cache.clear()
+    yield
+    tariff_type_cache.clear()
+
+
+class TestTTLCache:
+    def test_expiry_and_eviction(self):
+        """Entries expire after their TTL and the least recently used entry is evicted"""
+        cache = TTLCache(max_size=2, ttl=300, negative_ttl=-1)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get_stats()["evictions"] == 1
+
+        cache.set_negative("d", 4)
+        assert cache.get("d") is None
+        assert cache.get_stats()["expirations"] == 1
+
+
+@pytest.mark.usefixtures("vxview_env")
+class TestTariffTypeCache:
+    @patch('controllers.integration.vxview.systemapi.vxview_http_pool.post')
+    def test_tariff_type_cached_per_msisdn(self, mock_call_api):
+        """Only the first lookup for an msisdn goes to VXView"""
+        mock_call_api.return_value = vxview_response(TARIFF_RESPONSE)
+
+        first = SystemAPIIntegrationController(msisdn=SAMPLE_MSISDN).get_tariff_type()
+        second = SystemAPIIntegrationController(msisdn=SAMPLE_MSISDN).get_tariff_type()
+
+        assert first["data"]["tariff_type"] == "Prepaid"
+        assert second == first
+        mock_call_api.assert_called_once()
+        assert mock_call_api.call_args.kwargs["url"] == "http://vxview.test/SystemAPI"
+        assert tariff_type_cache.get_stats()["hits"] == 1
+
+        assert tariff_type_cache.invalidate(SAMPLE_MSISDN) is True
+        SystemAPIIntegrationController(msisdn=SAMPLE_MSISDN).get_tariff_type()
+        assert mock_call_api.call_count == 2
+
+    @patch('controllers.integration.vxview.systemapi.vxview_http_pool.post')
+    def test_negative_result_cached(self, mock_call_api):
+        """A failure reported by VXView is cached as a negative entry"""
+        mock_call_api.return_value = vxview_response(NOT_FOUND_RESPONSE)
+
+        assert SystemAPIIntegrationController(msisdn=SAMPLE_MSISDN).get_tariff_type()["success"] is False
+        assert SystemAPIIntegrationController(msisdn=SAMPLE_MSISDN).get_tariff_type()["success"] is False
+
+        mock_call_api.assert_called_once()
+        assert tariff_type_cache.get_stats()["negative_hits"] == 1
+
+    def test_invalidate_endpoint(self, test_client):
+        """The admin endpoint drops a single cached msisdn"""
+        tariff_type_cache.set(SAMPLE_MSISDN, {"success": True})
+
+        response = test_client.delete(f"/app/admin/tariff-cache/{SAMPLE_MSISDN}")
+
+        assert response.status_code == 200
+        assert tariff_type_cache.get(SAMPLE_MSISDN) is None
@@ -0,0 +1,78 @@
+import time
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from resources.utilities.tracing import trace_request, span, traced, current_span
+from controllers.ussd_session.asynchronous import run_blocking
+from models.ussd_session_state import USSDSessionState
+
+
+@traced("lookup")
+def lookup(delay=0.0):
+    time.sleep(delay)
+    return current_span()
+
+
+class TestTracing:
+    @patch('resources.utilities.tracing.trace_logger')
+    def test_slow_trace_exported_with_spans(self, mock_trace_logger):
+        with trace_request("ussd_request", slow_seconds=0.01) as root:
+            with span("tariff", msisdn="26653566580") as tariff:
+                child = lookup(0.02)
+
+        mock_trace_logger.warning.assert_called_once()
+        trace = mock_trace_logger.warning.call_args.kwargs["extra"]["trace"]
+        spans = {entry["name"]: entry for entry in trace["spans"]}
+        assert list(spans) == ["ussd_request", "tariff", "lookup"]
+        assert spans["ussd_request"]["parent_id"] is None
+        assert spans["tariff"]["parent_id"] == root.span_id
+        assert spans["lookup"]["parent_id"] == tariff.span_id == child.parent_id
+        assert spans["tariff"]["attributes"] == {"msisdn": "26653566580"}
+        assert spans["lookup"]["duration_ms"] >= 20
+        assert trace["duration_ms"] >= spans["tariff"]["duration_ms"]
+
+    @patch('resources.utilities.tracing.trace_logger')
+    def test_fast_trace_discarded(self, mock_trace_logger):
+        with trace_request("ussd_request", slow_seconds=10):
+            lookup()
+
+        mock_trace_logger.warning.assert_not_called()
+
+    @patch('resources.utilities.tracing.trace_logger')
+    def test_error_recorded(self, mock_trace_logger):
+        with pytest.raises(ValueError):
+            with trace_request("ussd_request", slow_seconds=0):
+                with span("session_db"):
+                    raise ValueError("ORA-00060: deadlock detected")
+
+        trace = mock_trace_logger.warning.call_args.kwargs["extra"]["trace"]
+        assert [entry.get("error") for entry in trace["spans"]] == ["ValueError: ORA-00060: deadlock detected"] * 2
+
+    def test_no_trace_no_spans(self):
+        with span("outside") as outside:
+            assert outside is None
+        assert lookup() is None
+
+    @patch('resources.utilities.database.access.exadata_db')
+    @patch('resources.utilities.tracing.trace_logger')
+    def test_spans_from_io_threads_join_request(self, mock_trace_logger, mock_exadata_db):
+        """Queries offloaded by the async controller are spans of the request that started them"""
+        mock_exadata_db.connection.return_value.__enter__.return_value.cursor.return_value.fetchone.return_value = None
+
+        async def request():
+            with trace_request("ussd_request", slow_seconds=0) as root:
+                await asyncio.gather(run_blocking(lookup),
+                                     run_blocking(USSDSessionState.execute_query,
+                                                  "SELECT NEXT_STATE FROM CDC_USSD_SESSION_STATE\n  WHERE CURRENT_STATE='INIT'"))
+            return root
+
+        root = asyncio.run(request())
+
+        trace = mock_trace_logger.warning.call_args.kwargs["extra"]["trace"]
+        spans = {entry["name"]: entry for entry in trace["spans"]}
+        assert spans["lookup"]["parent_id"] == root.span_id
+        assert spans["USSDSessionState.execute_query"]["parent_id"] == root.span_id
+        assert spans["USSDSessionState.execute_query"]["thread"].startswith("ussd-io")
+        assert spans["USSDSessionState.execute_query"]["attributes"]["statement"] == \
+            "SELECT NEXT_STATE FROM CDC_USSD_SESSION_STATE WHERE CURRENT_STATE='INIT'"
@@ -0,0 +1,133 @@
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from models.cdc_transactions import CDCTransactions, recent_transactions_cache
+from resources.utilities.database.mirror_watermark import MirrorLoadWatermark
+
+
+SAMPLE_MSISDN = "26653566580"
+LOADED_ON = datetime(2025, 3, 25, 2, 0)
+
+AIRTIME_TRANSFERS = [{"OC_RECORDTIMESTAMP": datetime(2025, 3, 24, 8, 32), "OC_OTHERPARTY_NORM": "26659727810",
+                      "OC_ACCOUNT_CHARGE": 50.0}]
+
+
+@pytest.fixture(autouse=True)
+def clear_transactions_cache():
+    recent_transactions_cache.clear()
+    yield
+    recent_transactions_cache.clear()
+
+
+@pytest.fixture
+def watermark():
+    with patch('models.cdc_transactions.cdr_mirror_watermark') as mock_watermark:
+        mock_watermark.get.return_value = LOADED_ON
+        yield mock_watermark
+
+
+@pytest.fixture
+def cdc_db():
+    """Exadata of the lookup and of the request record written on a cache hit"""
+    with patch('models.cdc_transactions.exadata_db') as mock_exadata_db, \
+            patch('models.cdc_transactions.db_access.execute_query') as mock_execute_query:
+        cursor = mock_exadata_db.connection.return_value.__enter__.return_value.cursor.return_value
+        cursor.description = [(column,) for column in AIRTIME_TRANSFERS[0]]
+        cursor.fetchall.return_value = [tuple(row.values()) for row in AIRTIME_TRANSFERS]
+        yield cursor, mock_execute_query
+
+
+def selects(cursor):
+    return [args[0] for args, kwargs in cursor.execute.call_args_list if "SELECT" in args[0]]
+
+
+class TestRecentTransactionsCache:
+    def test_repeat_request_served_from_cache(self, watermark, cdc_db):
+        cursor, mock_execute_query = cdc_db
+        cdc = CDCTransactions()
+
+        first = cdc.get_airtime_transfers(SAMPLE_MSISDN)
+        second = cdc.get_airtime_transfers(SAMPLE_MSISDN)
+
+        assert first == second
+        assert len(selects(cursor)) == 1
+        # the repeat request is still recorded, with its response
+        mock_execute_query.assert_called_once()
+        query, params = mock_execute_query.call_args.args
+        assert query == CDCTransactions.INSERT_PROCESSED_REQUEST_QUERY
+        assert params["msisdn"] == SAMPLE_MSISDN
+        assert params["request_type"] == "AIRTIME_TRANSFER"
+        assert params["sms_message"] == first[0]["message"]
+        assert mock_execute_query.call_args.kwargs["commit"] is True
+
+    def test_cached_per_request_type(self, watermark, cdc_db):
+        cursor, mock_execute_query = cdc_db
+        cdc = CDCTransactions()
+
+        cdc.get_airtime_transfers(SAMPLE_MSISDN)
+        cdc.get_call_records(SAMPLE_MSISDN)
+
+        assert len(selects(cursor)) == 2
+        mock_execute_query.assert_not_called()
+
+    def test_mirror_load_invalidates(self, watermark, cdc_db):
+        cursor, mock_execute_query = cdc_db
+        cdc = CDCTransactions()
+        invalidations = recent_transactions_cache.get_stats()["invalidations"]
+
+        cdc.get_airtime_transfers(SAMPLE_MSISDN)
+        watermark.get.return_value = datetime(2025, 3, 26, 2, 0)
+        cdc.get_airtime_transfers(SAMPLE_MSISDN)
+        cdc.get_airtime_transfers(SAMPLE_MSISDN)
+
+        assert len(selects(cursor)) == 2
+        assert recent_transactions_cache.get_stats()["invalidations"] == invalidations + 1
+
+    def test_no_transactions_cached(self, watermark, cdc_db):
+        cursor, mock_execute_query = cdc_db
+        cursor.fetchall.return_value = []
+        cdc = CDCTransactions()
+
+        assert cdc.get_bundle_purchases(SAMPLE_MSISDN) == []
+        assert cdc.get_bundle_purchases(SAMPLE_MSISDN) == []
+
+        assert len(selects(cursor)) == 1
+        assert mock_execute_query.call_args.args[0] == CDCTransactions.INSERT_REQUEST_QUERY
+
+    def test_not_cached_without_watermark(self, watermark, cdc_db):
+        cursor, mock_execute_query = cdc_db
+        watermark.get.return_value = None
+        cdc = CDCTransactions()
+
+        cdc.get_airtime_transfers(SAMPLE_MSISDN)
+        cdc.get_airtime_transfers(SAMPLE_MSISDN)
+
+        assert len(selects(cursor)) == 2
+        assert len(recent_transactions_cache) == 0
+
+
+class TestMirrorLoadWatermark:
+    @patch('resources.utilities.database.mirror_watermark.db_access.execute_query')
+    def test_polled_once_per_interval(self, mock_execute_query):
+        mock_execute_query.return_value = [{"TABLE_NAME": "CALL_RECORDS", "LOADED_ON": LOADED_ON}]
+        watermark = MirrorLoadWatermark(poll_seconds=300)
+
+        assert watermark.get("CALL_RECORDS") == LOADED_ON
+        assert watermark.get("AIRTIME_TRANSFER") is None
+        mock_execute_query.assert_called_once()
+
+        mock_execute_query.return_value = [{"TABLE_NAME": "CALL_RECORDS", "LOADED_ON": datetime(2025, 3, 26)}]
+        watermark.refresh(force=True)
+        assert watermark.get("CALL_RECORDS") == datetime(2025, 3, 26)
+        assert watermark.get_stats()["loads"] == 1
+
+    @patch('resources.utilities.database.mirror_watermark.db_access.execute_query')
+    def test_unavailable_watermark_disables_caching(self, mock_execute_query):
+        mock_execute_query.side_effect = RuntimeError("ORA-00942: table or view does not exist")
+        watermark = MirrorLoadWatermark(poll_seconds=0)
+
+        assert watermark.get("CALL_RECORDS") is None
+        # retried on the next lookup once the poll interval is over
+        assert watermark.get("CALL_RECORDS") is None
+        assert watermark.get_stats()["poll_errors"] == 2
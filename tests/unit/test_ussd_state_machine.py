@@ -0,0 +1,72 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+from models.ussd_session_state import USSDStateMachine, USSDSessionState
+
+
+# rows as returned by USSDStateMachine.LOAD_QUERY, see db_script.sql
+MENU_ROWS = [
+    ("INIT", 5, "TRANSACTIONS", "Transaction History", "Y", "N.A", 0),
+    ("TRANSACTIONS", 1, "AIRTIME_TRANSACTIONS", "Your airtime transfer history will be sent to you shortly via SMS.", "N", "N.A", 0),
+    ("TRANSACTIONS", 2, "BUNDLE_TRANSACTIONS", "Your bundle purchase history will be sent to you shortly via SMS.", "N", "N.A", 0),
+    ("TRANSACTIONS", 3, "CALL_TRANSACTIONS", "Your call data records will be sent to you shortly via SMS.", "N", "N.A", 0),
+]
+
+
+@pytest.fixture(name="menu_db")
+def get_menu_db():
+    conn = MagicMock()
+    conn.cursor.return_value.fetchall.return_value = MENU_ROWS
+    with patch('models.ussd_session_state.exadata_db') as mock_exadata_db:
+        mock_exadata_db.connection.return_value.__enter__.return_value = conn
+        yield mock_exadata_db
+
+
+def current_state(state):
+    return {"success": True, "data": {"session_uid": "12345", "current_state": state}}
+
+
+class TestUSSDStateMachine:
+    def test_resolve_transitions(self, menu_db):
+        """Transitions resolve from the compiled table, INIT uses the state default"""
+        machine = USSDStateMachine(ttl=300)
+        assert machine.load() == 4
+
+        assert machine.resolve("INIT")[0] == "TRANSACTIONS"
+        assert machine.resolve("TRANSACTIONS", "2")[0] == "BUNDLE_TRANSACTIONS"
+        assert machine.resolve("TRANSACTIONS", " 03")[0] == "CALL_TRANSACTIONS"
+        assert machine.resolve("TRANSACTIONS", "9") is None
+
+    def test_refresh_on_ttl(self, menu_db):
+        """The table is loaded once and only reloaded after the TTL expires"""
+        machine = USSDStateMachine(ttl=300)
+        machine.refresh_if_stale()
+        machine.refresh_if_stale()
+        assert menu_db.connection.call_count == 1
+
+        machine.ttl = 0
+        machine.refresh_if_stale()
+        assert menu_db.connection.call_count == 2
+
+    def test_session_state_uses_compiled_table(self, menu_db):
+        """USSDSessionState resolves the next state without querying the database"""
+        with patch('models.ussd_session_state.ussd_state_machine', USSDStateMachine(ttl=300)) as machine:
+            machine.load()
+            menu_db.reset_mock()
+
+            with patch('models.ussd_session_state.USSDSessionState.execute_query') as mock_execute_query:
+                result = USSDSessionState(session_uid="12345", user_selection="1") \
+                    .get_next_state(session_current_state=current_state("TRANSACTIONS"))
+
+                mock_execute_query.assert_not_called()
+
+        assert result["success"] is True
+        assert result["data"]["next_state"] == "AIRTIME_TRANSACTIONS"
+        menu_db.connection.assert_not_called()
+
+    def test_reload_endpoint(self, test_client, menu_db):
+        """The admin endpoint reloads the state machine"""
+        with patch('views.blueprints.admin.ussd_state_machine', USSDStateMachine(ttl=300)):
+            response = test_client.post("/app/admin/state-machine/reload")
+        assert response.status_code == 200
+        assert b'"transitions": 4' in response.data
@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from xml.sax.saxutils import escape
+
+from controllers.integration.vxview.soap import tariff_type_decoder, subscriber_info_decoder, TariffType
+from controllers.integration.vxview.systemapi import SystemAPIIntegrationController, tariff_type_cache
+
+SUBSCRIBER_INFO = "<getSubscriberInfoResult><Code>SystemAPI-Success</Code><SubscriberUID>42</SubscriberUID>" \
+                  "<IMSI>651010000000001</IMSI><AccountNumber>ACC1</AccountNumber><AccountType>Prepaid</AccountType>" \
+                  "<SubscriberName>Thabo</SubscriberName><Surname>M &amp; Sons</Surname><IDNumber>1</IDNumber>" \
+                  "<ICCID>8926601</ICCID></getSubscriberInfoResult>"
+
+
+def soap_envelope(result: str):
+    """VXView returns the operation result as escaped XML inside the SOAP body"""
+    return ("<soap:Envelope xmlns:soap='http://schemas.xmlsoap.org/soap/envelope/'><soap:Body>"
+            "<ns2:getSubscriberInfoResponse xmlns:ns2='http://service.api.system.vasx.com/'>"
+            f"<return>{escape(result)}</return></ns2:getSubscriberInfoResponse></soap:Body></soap:Envelope>"
+            ).encode("utf-8")
+
+
+def test_decode_escaped_soap_payload():
+    record = subscriber_info_decoder.decode(soap_envelope(SUBSCRIBER_INFO))
+
+    assert record.success
+    assert record.subscriber_uid == "42"
+    assert record.surname == "M & Sons"
+    assert record.to_dict()["iccid"] == "8926601"
+    assert "code" not in record.to_dict()
+
+
+def test_missing_elements_are_none():
+    record = tariff_type_decoder.decode(b"<getTariffTypeResponse><Code>SystemAPI-Success</Code>"
+                                        b"<TariffType>Prepaid</TariffType></getTariffTypeResponse>")
+
+    assert record == TariffType(code="SystemAPI-Success", tariff_type="Prepaid")
+    assert record.rateplan_name is None
+
+
+def test_undecodable_body():
+    assert tariff_type_decoder.decode(b"<html>Bad gateway") is None
+    assert tariff_type_decoder.decode(b"<empty/>") == TariffType()
+
+
+@pytest.mark.usefixtures("vxview_env")
+@patch('controllers.integration.vxview.systemapi.vxview_http_pool.post')
+def test_http_error_does_not_crash(mock_post):
+    """A non 200 response used to fail with AttributeError on None.find"""
+    mock_post.return_value = MagicMock(status_code=503, content=b"")
+    tariff_type_cache.clear()
+
+    assert SystemAPIIntegrationController(msisdn="26653566580").get_tariff_type()["success"] is False
+    assert SystemAPIIntegrationController(msisdn="26653566580").get_subscriber_info()["success"] is False
+    assert tariff_type_cache.get("26653566580") is None
+    # both lookups reached VXView and got the 503
+    assert mock_post.call_count == 2
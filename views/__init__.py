@@ -1,13 +1,31 @@
 import os
+import atexit
 import config
 
 from flask import Flask
 from resources.utilities.database.oracle import exadata_db
+from resources.utilities.structured_logging import logging_pipeline
+from resources.utilities.database.profiler import statement_profiler
+from resources.utilities.sms_dispatcher import sms_dispatcher
 
 app = Flask(__name__)
 exadata_db.init(app=app)
 
 
+def start_background_services():
+    """
+    Start the logging pipeline and the SMS dispatcher (replaying its spool) and register the shutdown hooks. Called
+    by the server entry points (application.py, wsgi.py, asgi.py) rather than at import, so tests and tools importing
+    the app write nothing to logs/.
+    """
+    # registered first so it runs last and still writes what the other shutdown hooks log
+    logging_pipeline.start()
+    atexit.register(logging_pipeline.stop)
+    atexit.register(statement_profiler.dump)
+    atexit.register(exadata_db.close)
+    sms_dispatcher.start()
+
+
 def create_app():
     with app.app_context():
         # TODO: register application blueprints
@@ -21,4 +39,16 @@ def create_app():
         from views.blueprints.health_check import health_check_bp
         app.register_blueprint(blueprint=health_check_bp)
 
+        # prometheus scrape endpoint
+        from views.blueprints.metrics import metrics_bp
+        app.register_blueprint(blueprint=metrics_bp)
+
+        # 4. admin blueprint
+        from views.blueprints.admin import admin_bp
+        app.register_blueprint(blueprint=admin_bp)
+
+        # compile the ussd menu state machine once at startup
+        from models.ussd_session_state import ussd_state_machine
+        ussd_state_machine.refresh_if_stale()
+
         return app
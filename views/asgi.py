@@ -0,0 +1,92 @@
+"""
+ASGI application: the USSD endpoint is served natively on the event loop, every other route (health check,
+metrics, admin) is handed to the Flask application
+"""
+import logging
+from asgiref.wsgi import WsgiToAsgi
+from controllers.ussd_session.asynchronous import AsyncUSSDSessionController
+from resources.static.response_templates import APPLICATION_ERRORED, REQUEST_INPUT_INCOMPLETE
+from resources.utilities.metrics import USSD_REQUEST_LATENCY
+from resources.utilities.request_handler import parse_request, InvalidRequestError
+from resources.utilities.response_handler import XMLResponseBuilder
+from resources.utilities.structured_logging import request_context, bind_log_context
+from resources.utilities.tracing import trace_request
+
+# the gateway posts a few hundred bytes, anything much larger is not a USSD request
+MAX_REQUEST_BODY = 64 * 1024
+RESPONSE_HEADERS = [(b"content-type", b"text/html; charset=utf-8")]
+
+
+async def read_body(receive):
+    __body = b""
+    while True:
+        __message = await receive()
+        __body += __message.get("body", b"")
+        if len(__body) > MAX_REQUEST_BODY:
+            return None
+        if not __message.get("more_body", False):
+            return __body
+
+
+async def send_response(send, body: bytes, status: int = 200):
+    await send({"type": "http.response.start", "status": status,
+                "headers": RESPONSE_HEADERS + [(b"content-length", str(len(body)).encode())]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def ussd(receive, send, request_id: str = None):
+    """Async counterpart of views.blueprints.ussd.ussd"""
+    with USSD_REQUEST_LATENCY.time(), request_context(request_id=request_id), trace_request("ussd_request"):
+        __body = await read_body(receive)
+        __request_data = None
+        if __body:
+            try:
+                __request_data = parse_request(__body)
+            except InvalidRequestError as e:
+                logging.error(f"Rejected USSD request: {str(e)}")
+
+        if __request_data is not None:
+            bind_log_context(session_id=__request_data.session_id, msisdn=__request_data.msisdn)
+            try:
+                __response = await AsyncUSSDSessionController(request=__request_data).process_request()
+                if not __response:
+                    # Processing failed
+                    __response = XMLResponseBuilder(session_id=__request_data.session_id, response_type=3,
+                                                    message=APPLICATION_ERRORED["data"]["message"]).get_response_bytes()
+                return await send_response(send, __response)
+            except Exception as e:
+                logging.exception(e, exc_info=True)
+                return await send_response(send, b"Internal Server Error", status=500)
+
+        # Required inputs not provided
+        __response_xml = XMLResponseBuilder(session_id="000", response_type=3,
+                                            message=REQUEST_INPUT_INCOMPLETE["data"]["message"])
+        return await send_response(send, __response_xml.get_response_bytes())
+
+
+async def lifespan(receive, send):
+    while True:
+        __message = await receive()
+        if __message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif __message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def create_asgi_app(flask_app):
+    """
+    :param flask_app: application from views.create_app
+    :return: ASGI application
+    """
+    __wsgi_app = WsgiToAsgi(flask_app)
+
+    async def application(scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await lifespan(receive, send)
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].rstrip("/") == "":
+            __headers = dict(scope.get("headers") or [])
+            return await ussd(receive, send, request_id=(__headers.get(b"x-request-id") or b"").decode() or None)
+        return await __wsgi_app(scope, receive, send)
+
+    return application
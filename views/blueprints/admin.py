@@ -0,0 +1,116 @@
+from flask import Blueprint, make_response, json, request
+from resources.static.response_templates import EXECUTION_FAIL, ACCESS_FORBIDDEN, ACCESS_UNAUTHORIZED
+from models.ussd_session_state import ussd_state_machine
+from controllers.integration.vxview.systemapi import tariff_type_cache, vxview_http_pool
+from resources.utilities.sms_dispatcher import sms_dispatcher
+from resources.utilities.sms_service import sms_batch_sender, bulksms_http_pool
+from resources.utilities.structured_logging import logging_pipeline
+from resources.utilities.database.profiler import statement_profiler
+from resources.utilities.session_store import session_write_behind
+from models.cdc_transactions import (recent_transactions_cache, cdr_mirror_watermark, transaction_lookups,
+                                     sms_dedup_window)
+import os
+import hmac
+import logging
+import ipaddress
+
+admin_bp = Blueprint(name="admin", import_name=__name__, url_prefix="/app/admin")
+
+# addresses and networks allowed to call the admin endpoints, local only by default. Behind a reverse proxy the
+# proxy's address is the one checked, keep the proxy from forwarding /app/admin.
+ADMIN_ALLOWED_IPS = [ipaddress.ip_network(address.strip(), strict=False)
+                     for address in os.environ.get("ADMIN_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+                     if address.strip()]
+# when set, requests must also carry it in an X-Admin-Token header
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN") or None
+
+
+@admin_bp.before_request
+def authorize_admin_request():
+    try:
+        __address = ipaddress.ip_address(request.remote_addr or "")
+    except ValueError:
+        __address = None
+    if __address is None or not any(__address in network for network in ADMIN_ALLOWED_IPS):
+        logging.warning(f"Admin request to {request.path} from {request.remote_addr} rejected, address not allowed")
+        return make_response(json.dumps(ACCESS_FORBIDDEN), 403)
+
+    if ADMIN_API_TOKEN and not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_API_TOKEN):
+        logging.warning(f"Admin request to {request.path} from {request.remote_addr} rejected, invalid token")
+        return make_response(json.dumps(ACCESS_UNAUTHORIZED), 401)
+    return None
+
+
+@admin_bp.route("/state-machine/reload", methods=["POST"], strict_slashes=False)
+def reload_state_machine():
+    try:
+        ussd_state_machine.load()
+    except Exception as e:
+        logging.exception(e, exc_info=True)
+        return make_response(json.dumps(EXECUTION_FAIL), 500)
+    return make_response(json.dumps({"success": True, "data": ussd_state_machine.get_stats()}), 200)
+
+
+@admin_bp.route("/tariff-cache", methods=["GET"], strict_slashes=False)
+def tariff_cache_stats():
+    return make_response(json.dumps({"success": True, "data": tariff_type_cache.get_stats()}), 200)
+
+
+@admin_bp.route("/tariff-cache/<msisdn>", methods=["DELETE"], strict_slashes=False)
+def invalidate_tariff_cache(msisdn):
+    return make_response(json.dumps({"success": True, "data": {"invalidated": tariff_type_cache.invalidate(msisdn)}}), 200)
+
+
+@admin_bp.route("/transactions-cache", methods=["GET"], strict_slashes=False)
+def transactions_cache_stats():
+    __stats = recent_transactions_cache.get_stats()
+    __stats["mirror_watermark"] = cdr_mirror_watermark.get_stats()
+    __stats["coalesced_lookups"] = transaction_lookups.get_stats()
+    __stats["sms_dedup"] = sms_dedup_window.get_stats()
+    return make_response(json.dumps({"success": True, "data": __stats}), 200)
+
+
+@admin_bp.route("/transactions-cache/<msisdn>", methods=["DELETE"], strict_slashes=False)
+def invalidate_transactions_cache(msisdn):
+    __invalidated = [recent_transactions_cache.invalidate((msisdn, request_type))
+                     for request_type in ("AIRTIME_TRANSFER", "BUNDLE_PURCHASE", "CALL_RECORDS")]
+    return make_response(json.dumps({"success": True, "data": {"invalidated": any(__invalidated)}}), 200)
+
+
+@admin_bp.route("/http-pools", methods=["GET"], strict_slashes=False)
+def http_pool_stats():
+    return make_response(json.dumps({"success": True, "data": {"vxview": vxview_http_pool.get_stats(),
+                                                               "bulksms": bulksms_http_pool.get_stats()}}), 200)
+
+
+@admin_bp.route("/sms-dispatcher", methods=["GET"], strict_slashes=False)
+def sms_dispatcher_stats():
+    __stats = sms_dispatcher.get_stats()
+    __stats["batching"] = sms_batch_sender.get_stats() if sms_batch_sender else None
+    return make_response(json.dumps({"success": True, "data": __stats}), 200)
+
+
+@admin_bp.route("/session-write-behind", methods=["GET"], strict_slashes=False)
+def session_write_behind_stats():
+    return make_response(json.dumps({"success": True, "data": session_write_behind.get_stats()}), 200)
+
+
+@admin_bp.route("/logging", methods=["GET"], strict_slashes=False)
+def logging_stats():
+    return make_response(json.dumps({"success": True, "data": logging_pipeline.get_stats()}), 200)
+
+
+@admin_bp.route("/db-profile", methods=["GET"], strict_slashes=False)
+def db_profile_stats():
+    """Statements by time spent on Exadata, ?limit=20&order_by=mean_seconds"""
+    __order_by = request.args.get("order_by", "total_seconds")
+    if __order_by not in ("total_seconds", "mean_seconds", "max_seconds", "calls", "rows", "acquire_seconds"):
+        return make_response(json.dumps(EXECUTION_FAIL), 400)
+    __stats = statement_profiler.get_stats(limit=request.args.get("limit", 50, type=int), order_by=__order_by)
+    return make_response(json.dumps({"success": True, "data": __stats}), 200)
+
+
+@admin_bp.route("/db-profile", methods=["DELETE"], strict_slashes=False)
+def reset_db_profile():
+    statement_profiler.reset()
+    return make_response(json.dumps({"success": True, "data": {"reset": True}}), 200)
@@ -0,0 +1,9 @@
+from flask import Blueprint, make_response
+from resources.utilities.metrics import generate_metrics
+
+metrics_bp = Blueprint(name="metrics", import_name=__name__)
+
+@metrics_bp.route("/metrics", methods=["GET"], strict_slashes=False)
+def metrics():
+    __body, __content_type = generate_metrics()
+    return make_response(__body, 200, {"Content-Type": __content_type})
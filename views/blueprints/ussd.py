@@ -1,37 +1,56 @@
+import logging
 from flask import json, make_response, request, Blueprint
 
 from controllers.ussd_session import USSDSessionController
 from resources.utilities.response_handler import XMLResponseBuilder
 from resources.static.response_templates import APPLICATION_ERRORED
 from resources.static.response_templates import REQUEST_INPUT_INCOMPLETE
-from resources.utilities.request_handler import XMLRequestParser
+from resources.utilities.request_handler import parse_request, InvalidRequestError
+from resources.utilities.metrics import USSD_REQUEST_LATENCY
+from resources.utilities.structured_logging import request_context, bind_log_context
+from resources.utilities.tracing import trace_request
 
 ussd_bp = Blueprint(name="ussd", import_name=__name__, url_prefix="/")
 
 @ussd_bp.route("/", methods=["POST"], strict_slashes=False)
+@USSD_REQUEST_LATENCY.time()
 def ussd():
+    with request_context(request_id=request.headers.get("X-Request-ID")), trace_request("ussd_request"):
+        return handle_ussd_request()
+
+
+def handle_ussd_request():
     if request.data:
         try:
-            __session_handler = USSDSessionController(request_data=request.data)
-            __response = __session_handler.process_request()
+            # parse once, the parsed request is shared with the controller and the failure path
+            __request_data = parse_request(request.data)
+        except InvalidRequestError as e:
+            logging.error(f"Rejected USSD request: {str(e)}")
+            __request_data = None
+
+        if __request_data is not None:
+            bind_log_context(session_id=__request_data.session_id, msisdn=__request_data.msisdn)
+            try:
+                __session_handler = USSDSessionController(request=__request_data)
+                __response = __session_handler.process_request()
+
+                if __response:
+                    return make_response(__response)
 
-            if __response:
-                return make_response(__response)
-            
-            # Processing failed
-            __request_data = XMLRequestParser(xml_post_data=request.data).get_request_data()
-            __response_xml = XMLResponseBuilder(session_id=__request_data["session_id"],
-                                                response_type=3,
-                                                message=APPLICATION_ERRORED["data"]["message"])
+                # Processing failed
+                __response_xml = XMLResponseBuilder(session_id=__request_data.session_id,
+                                                    response_type=3,
+                                                    message=APPLICATION_ERRORED["data"]["message"])
 
-            return make_response(__response_xml.get_response_body())
+                return make_response(__response_xml.get_response_bytes())
 
-        except Exception as e:
-            return make_response("Internal Server Error", 500)
+            except Exception as e:
+                logging.exception(e, exc_info=True)
+                return make_response("Internal Server Error", 500)
 
     # Required inputs not provided
     __response_xml = XMLResponseBuilder(session_id="000",
                                         response_type=3,
                                         message=REQUEST_INPUT_INCOMPLETE["data"]["message"])
     
-    return make_response(__response_xml.get_response_body())
\ No newline at end of file
+    return make_response(__response_xml.get_response_bytes())
\ No newline at end of file
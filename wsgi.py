@@ -7,6 +7,7 @@ import site
 sys.path.insert(0, "/var/www/html/python-applications/customer-data-connect/")
 site.addsitedir("/var/www/html/python-applications/customer-data-connect/venv/lib64/python3.6/site-packages/")
 
-from views import create_app
+from views import create_app, start_background_services
 
+start_background_services()
 application = create_app()
\ No newline at end of file